@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Throughput and memory of format_for_together.py on a synthetic corpus.
+
+    python bench_format_for_together.py --records 200000 --workers 1 4
+
+Each run is a fresh process, so the reported peak RSS is that run's own. Peak
+RSS should stay flat as --records grows.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+
+import format_for_together
+
+PHRASES = [
+    "I'm looking for financing for my business.", "What rates do you offer?",
+    "How quickly can I get approved?", "We usually fund within 48 hours.",
+    "Do you need collateral?", "Our term loans start at competitive rates.",
+    "Can you tell me about your revenue?", "We do about forty thousand a month.",
+]
+
+def write_corpus(path, records, seed=0):
+    """sales-conversations-shaped records: turns under "0".."19", None after the last."""
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        for _ in range(records):
+            turns = rng.randint(1, 20)
+            record = {}
+            for i in range(20):
+                speaker = "Customer" if i % 2 == 0 else "Salesman"
+                record[str(i)] = f"{speaker}: {rng.choice(PHRASES)}" if i < turns else None
+            f.write(json.dumps(record) + '\n')
+
+def _run(input_path, output_path, workers, chunk_bytes, results):
+    start = time.perf_counter()
+    written = format_for_together.format_conversations_for_together(
+        input_path, output_path, workers=workers, chunk_bytes=chunk_bytes, verbose=False)
+    elapsed = time.perf_counter() - start
+    # Linux reports ru_maxrss in KiB
+    results.put((written, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024))
+
+def run(input_path, output_path, workers, chunk_bytes):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_run, args=(input_path, output_path, workers, chunk_bytes, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, nargs="+", default=[50000, 200000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--chunk-mb", type=float, default=format_for_together.DEFAULT_CHUNK_BYTES / 2**20)
+    args = parser.parse_args()
+
+    print(f"JSON codec: {'orjson' if format_for_together.orjson else 'json'}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for records in args.records:
+            input_path = os.path.join(tmp, f"train_{records}.jsonl")
+            write_corpus(input_path, records)
+            size = os.path.getsize(input_path)
+            for workers in args.workers:
+                written, elapsed, peak_rss = run(input_path, os.path.join(tmp, "out.jsonl"), workers,
+                                              int(args.chunk_mb * 2**20))
+                print(f"{records:>9} records ({size / 2**20:.0f} MiB), {workers:>2} workers: "
+                      f"{records / elapsed:>9.0f} records/sec, {written} written, "
+                      f"peak RSS {peak_rss / 2**20:.0f} MiB")
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,130 @@
 #!/usr/bin/env python3
 
-from datasets import load_dataset
-import pandas as pd
+import argparse
 import json
 import os
 
+from datasets import load_dataset
+from huggingface_hub import HfApi
+
+DATASET_NAME = "goendalf666/sales-conversations"
+OUTPUT_DIR = "sales-conversations-data"
+# Records which splits were exported from which revision of the dataset
+MANIFEST_FILE = ".download_manifest.json"
+FORMATS = ("jsonl", "parquet", "csv")
+# Rows serialized per Arrow record batch
+BATCH_ROWS = 10000
+
+def dataset_revision(name):
+    """The commit sha of the dataset on the Hub, or None if it cannot be reached."""
+    try:
+        return HfApi().dataset_info(name).sha
+    except Exception as e:
+        print(f"Could not check the latest revision of {name}: {e}")
+        return None
+
+def read_manifest(output_dir):
+    """{"revision": ..., "splits": {name: {"rows": ..., "formats": [...]}}}, empty if missing or outdated."""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"revision": None, "splits": {}}
+    if not isinstance(manifest.get("splits"), dict):
+        # Written before revisions were recorded; export again once
+        return {"revision": None, "splits": {}}
+    return manifest
+
+def write_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def export_split(split_data, path, fmt):
+    """Write a split from its Arrow table in batches, to a temp file that is renamed when complete."""
+    tmp_path = path + ".tmp"
+    if fmt == "jsonl":
+        # One vectorized pandas.to_json call per batch of rows; None is written as null
+        with open(tmp_path, 'wb') as f:
+            split_data.to_json(f, lines=True, force_ascii=False, batch_size=BATCH_ROWS)
+    elif fmt == "parquet":
+        split_data.to_parquet(tmp_path, batch_size=BATCH_ROWS)
+    elif fmt == "csv":
+        with open(tmp_path, 'wb') as f:
+            split_data.to_csv(f, index=False, batch_size=BATCH_ROWS)
+    os.replace(tmp_path, path)
+
+def pending_formats(manifest, revision, split_name, formats, output_dir, force=False):
+    """The formats of a split that are missing or were exported from another revision."""
+    exported = manifest["splits"].get(split_name, {})
+    current = revision is not None and manifest.get("revision") == revision
+    return [
+        fmt for fmt in formats
+        if force
+        or not current
+        or fmt not in exported.get("formats", [])
+        or not os.path.exists(os.path.join(output_dir, f"{split_name}.{fmt}"))
+    ]
+
 def main():
+    parser = argparse.ArgumentParser(description=f"Download {DATASET_NAME} and export its splits")
+    parser.add_argument("--splits", nargs="+", help="Splits to export (default: all)")
+    parser.add_argument("--format", nargs="+", default=["jsonl"], choices=FORMATS, dest="formats",
+                        help="Output formats (default: jsonl)")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--force", action="store_true", help="Export even if the files are up to date")
+    args = parser.parse_args()
+
+    manifest = read_manifest(args.output_dir)
+    # Checked before loading, so an up-to-date export skips the download and Arrow conversion
+    revision = dataset_revision(DATASET_NAME)
+    if revision is not None and manifest.get("revision") == revision:
+        split_names = args.splits or list(manifest["splits"])
+        if split_names and all(name in manifest["splits"] and not pending_formats(
+                manifest, revision, name, args.formats, args.output_dir, args.force) for name in split_names):
+            print(f"Skipping download, {', '.join(split_names)} already exported from revision {revision[:12]}")
+            return
+
     print("Loading dataset from Hugging Face...")
-    ds = load_dataset("goendalf666/sales-conversations")
-    
+    # Pinned, so the exported data is the revision recorded in the manifest
+    ds = load_dataset(DATASET_NAME, revision=revision)
+
     print("Dataset loaded successfully!")
     print(f"Dataset structure: {ds}")
-    
+
+    unknown = set(args.splits or []) - set(ds.keys())
+    if unknown:
+        parser.error(f"Unknown splits {', '.join(sorted(unknown))}; available: {', '.join(ds.keys())}")
+
     # Create output directory
-    os.makedirs("sales-conversations-data", exist_ok=True)
-    
-    # Process each split (train, validation, test if they exist)
-    for split_name in ds.keys():
+    os.makedirs(args.output_dir, exist_ok=True)
+    if manifest.get("revision") != revision:
+        # Exports from another revision are stale; unknown revisions are never treated as current
+        manifest = {"revision": revision, "splits": {}}
+
+    for split_name in args.splits or ds.keys():
         split_data = ds[split_name]
+        formats = pending_formats(manifest, revision, split_name, args.formats, args.output_dir, args.force)
+        if not formats:
+            print(f"Skipping {split_name} split, already exported from this revision of the dataset")
+            continue
+
         print(f"Processing {split_name} split with {len(split_data)} examples...")
-        
-        # Convert to pandas DataFrame for easier manipulation
-        df = split_data.to_pandas()
-        
-        # Save as JSONL for Together AI
-        jsonl_path = f"sales-conversations-data/{split_name}.jsonl"
-        with open(jsonl_path, 'w', encoding='utf-8') as f:
-            for _, row in df.iterrows():
-                json.dump(row.to_dict(), f, ensure_ascii=False)
-                f.write('\n')
-        
-        print(f"Saved {split_name} split to {jsonl_path}")
-        
-        # Also save as CSV for convenience
-        csv_path = f"sales-conversations-data/{split_name}.csv"
-        df.to_csv(csv_path, index=False)
-        print(f"Saved {split_name} split to {csv_path}")
-    
+        for fmt in formats:
+            path = os.path.join(args.output_dir, f"{split_name}.{fmt}")
+            export_split(split_data, path, fmt)
+            print(f"Saved {split_name} split to {path}")
+
+        previous = manifest["splits"].get(split_name, {}).get("formats", [])
+        manifest["splits"][split_name] = {
+            "rows": len(split_data),
+            "formats": sorted(set(previous) | set(formats)),
+        }
+        write_manifest(args.output_dir, manifest)
+
     print("\nDataset download and conversion completed!")
-    print("Files saved in ./sales-conversations-data/")
+    print(f"Files saved in ./{args.output_dir}/")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
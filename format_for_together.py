@@ -1,67 +1,171 @@
 #!/usr/bin/env python3
 
+import argparse
 import json
-import pandas as pd
-
-def format_conversations_for_together():
-    """Convert the sales conversations to Together AI chat format"""
-    
-    # Read the original data
-    with open('sales-conversations-data/train.jsonl', 'r') as f:
-        data = [json.loads(line) for line in f]
-    
-    formatted_conversations = []
-    
-    for record in data:
-        # Extract non-null conversation turns
-        conversation_turns = []
-        for i in range(20):  # 0-19 columns
-            if record[str(i)] is not None:
-                conversation_turns.append(record[str(i)])
-        
-        if len(conversation_turns) < 2:  # Skip if not enough turns
-            continue
-            
-        # Format as chat messages
-        messages = []
-        for i, turn in enumerate(conversation_turns):
-            if i % 2 == 0:  # Even indices are customers
-                if turn.startswith("Customer: "):
-                    content = turn.replace("Customer: ", "", 1)
-                else:
-                    content = turn
-                messages.append({
-                    "role": "user",
-                    "content": content
-                })
-            else:  # Odd indices are salesmen
-                if turn.startswith("Salesman: "):
-                    content = turn.replace("Salesman: ", "", 1)
-                else:
-                    content = turn
-                messages.append({
-                    "role": "assistant", 
-                    "content": content
-                })
-        
-        if messages:  # Only add if we have messages
-            formatted_conversations.append({
-                "messages": messages
-            })
-    
-    # Save formatted data
-    with open('sales-conversations-data/train_together_format.jsonl', 'w') as f:
-        for conversation in formatted_conversations:
-            json.dump(conversation, f, ensure_ascii=False)
-            f.write('\n')
-    
-    print(f"Formatted {len(formatted_conversations)} conversations for Together AI")
-    print("Saved to: sales-conversations-data/train_together_format.jsonl")
-    
-    # Show a sample
-    if formatted_conversations:
-        print("\nSample conversation:")
-        print(json.dumps(formatted_conversations[0], indent=2, ensure_ascii=False))
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# orjson is several times faster than json when it is installed. Both write
+# compact JSON (no spaces after separators), so the output file is the same
+# either way; it holds the same records as the original json.dump output but is
+# not byte-identical to it.
+try:
+    import orjson
+
+    def loads(line):
+        return orjson.loads(line)
+
+    def dumps(obj):
+        return orjson.dumps(obj)
+except ImportError:
+    orjson = None
+
+    def loads(line):
+        return json.loads(line)
+
+    def dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+
+# Needed only for Parquet input (download_dataset.py --format parquet)
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+INPUT_PATH = 'sales-conversations-data/train.jsonl'
+OUTPUT_PATH = 'sales-conversations-data/train_together_format.jsonl'
+# Bytes of input converted per task; bounds memory per worker
+DEFAULT_CHUNK_BYTES = 4 << 20
+
+SPEAKER_PREFIXES = ("Customer: ", "Salesman: ")
+
+def format_record(record):
+    """Together AI chat format for one conversation, or None if it has fewer than 2 turns."""
+    # Turns are stored under the string keys "0", "1", ... with None after the last turn
+    conversation_turns = [record[key] for key in sorted((key for key in record if key.isdigit()), key=int)
+                          if record[key] is not None]
+
+    if len(conversation_turns) < 2:  # Skip if not enough turns
+        return None
+
+    # Format as chat messages; even indices are customers, odd indices are salesmen
+    messages = []
+    for i, turn in enumerate(conversation_turns):
+        prefix = SPEAKER_PREFIXES[i % 2]
+        messages.append({
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": turn[len(prefix):] if turn.startswith(prefix) else turn
+        })
+    return {"messages": messages}
+
+def convert_records(records):
+    """Formatted output (bytes, newline terminated lines) for an iterable of input records."""
+    output = []
+    for record in records:
+        conversation = format_record(record)
+        if conversation is not None:
+            output.append(dumps(conversation) + b'\n')
+    return b''.join(output), len(output)
+
+def convert_lines(lines):
+    return convert_records(loads(line) for line in lines if line.strip())
+
+def convert_range(path, start, end):
+    """Convert the lines in bytes [start, end) of path. Workers read their own input."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return convert_lines(f.read(end - start).splitlines())
+
+def convert_row_group(path, index):
+    """Convert one row group of a Parquet file, reading only that group's columns."""
+    return convert_records(pq.ParquetFile(path).read_row_group(index).to_pylist())
+
+def is_parquet(path):
+    return path.endswith('.parquet')
+
+def iter_line_ranges(path, chunk_bytes):
+    """(start, end) byte ranges of about chunk_bytes, each ending on a line boundary."""
+    with open(path, 'rb') as f:
+        start = 0
+        while True:
+            f.seek(start + chunk_bytes)
+            f.readline()
+            end = min(f.tell(), os.fstat(f.fileno()).st_size)
+            if end <= start:
+                return
+            yield start, end
+            start = end
+
+def iter_tasks(path, chunk_bytes):
+    """(function, args) per chunk: byte ranges of JSONL, or row groups of Parquet."""
+    if is_parquet(path):
+        if pq is None:
+            raise RuntimeError("Reading Parquet input requires pyarrow (pip install pyarrow)")
+        for index in range(pq.ParquetFile(path).num_row_groups):
+            yield convert_row_group, (path, index)
+    else:
+        for start, end in iter_line_ranges(path, chunk_bytes):
+            yield convert_range, (path, start, end)
+
+def iter_converted(path, chunk_bytes, workers):
+    """Converted chunks in input order, with at most 2 * workers chunks in flight."""
+    tasks = iter_tasks(path, chunk_bytes)
+    if workers <= 1:
+        for function, args in tasks:
+            yield function(*args)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        for function, args in tasks:
+            in_flight.append(executor.submit(function, *args))
+            if len(in_flight) >= 2 * workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+def format_conversations_for_together(input_path=INPUT_PATH, output_path=OUTPUT_PATH, workers=1,
+                                      chunk_bytes=DEFAULT_CHUNK_BYTES, verbose=True):
+    """
+    Convert the sales conversations to Together AI chat format.
+
+    The input (JSONL, or Parquet from download_dataset.py --format parquet) is
+    converted in chunks of whole lines or row groups and written as it goes, so
+    memory does not grow with the input. With workers > 1, chunks are converted
+    across a process pool and written back in input order. Returns the number
+    of conversations written.
+    """
+    count = 0
+    sample = None
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'wb') as f_out:
+        for converted, converted_count in iter_converted(input_path, chunk_bytes, workers):
+            if sample is None and converted:
+                sample = converted[:converted.index(b'\n')]
+            f_out.write(converted)
+            count += converted_count
+    # Readers never see a half-written file
+    os.replace(tmp_path, output_path)
+
+    if verbose:
+        print(f"Formatted {count} conversations for Together AI")
+        print(f"Saved to: {output_path}")
+
+        # Show a sample
+        if sample:
+            print("\nSample conversation:")
+            print(json.dumps(json.loads(sample), indent=2, ensure_ascii=False))
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the sales conversations to Together AI chat format")
+    parser.add_argument("--input", default=INPUT_PATH, help="JSONL or .parquet file")
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--workers", type=int, default=1, help="Conversion processes (default: 1, no pool)")
+    parser.add_argument("--chunk-mb", type=float, default=DEFAULT_CHUNK_BYTES / 2**20, help="Input per task")
+    args = parser.parse_args()
+    format_conversations_for_together(args.input, args.output, workers=args.workers,
+                                      chunk_bytes=int(args.chunk_mb * 2**20))
 
 if __name__ == "__main__":
-    format_conversations_for_together()
\ No newline at end of file
+    main()
@@ -0,0 +1,97 @@
+# src/components/on-call-coaching/batching.py
+"""
+Cross-call micro-batching of embedding requests.
+
+Background workers for different calls each need a handful of texts encoded
+at about the same time. Encoding them one request at a time repeats the
+model's fixed per-call cost; collecting the requests that arrive within a few
+milliseconds and encoding them together costs little more than one of them.
+"""
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+# How long the first request of a batch waits for others to join it
+DEFAULT_WINDOW_SECONDS = 0.005
+# Texts per batched encode; a full batch runs without waiting out the window
+DEFAULT_MAX_BATCH = 64
+
+
+class MicroBatcher:
+    """
+    Runs encode(texts) -> array of vectors over texts pooled from concurrent
+    callers. encode() blocks the caller until its own vectors are ready.
+    """
+
+    def __init__(self, encode, window_seconds=DEFAULT_WINDOW_SECONDS, max_batch=DEFAULT_MAX_BATCH):
+        self._encode = encode
+        self._window = window_seconds
+        self._max_batch = max_batch
+        self._condition = threading.Condition()
+        # (texts, future) per caller, in arrival order
+        self._pending = []
+        self._pending_texts = 0
+        self._thread = None
+        self._batched_requests = 0
+        self._counters = {"requests": 0, "texts": 0, "batches": 0, "failed": 0, "max_batch_seen": 0}
+
+    def encode(self, texts):
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        future = Future()
+        with self._condition:
+            # Started on first use, so a pre-forked master does not own the thread
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+            self._pending.append((texts, future))
+            self._pending_texts += len(texts)
+            self._counters["requests"] += 1
+            self._condition.notify()
+        return future.result()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                deadline = time.monotonic() + self._window
+                while self._pending_texts < self._max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch, self._pending, self._pending_texts = self._pending, [], 0
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch):
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        try:
+            vectors = self._encode(texts)
+        except Exception as e:
+            with self._condition:
+                self._counters["failed"] += 1
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        with self._condition:
+            self._counters["batches"] += 1
+            self._counters["texts"] += len(texts)
+            self._batched_requests += len(batch)
+            self._counters["max_batch_seen"] = max(self._counters["max_batch_seen"], len(batch))
+        start = 0
+        for request_texts, future in batch:
+            future.set_result(vectors[start:start + len(request_texts)])
+            start += len(request_texts)
+
+    def stats(self):
+        with self._condition:
+            batches = self._counters["batches"]
+            return {
+                **self._counters,
+                "avg_requests_per_batch": round(self._batched_requests / batches, 2) if batches else 0,
+                "pending": len(self._pending),
+            }
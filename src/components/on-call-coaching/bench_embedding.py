@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# src/components/on-call-coaching/bench_embedding.py
+"""
+Compare embedding backends and stored vector precisions against torch/float32.
+
+    python bench_embedding.py --index-dir .catalogue_index/default --queries 300
+    python bench_embedding.py --threads 2 --min-overlap 0.9
+
+Queries are encoded one at a time, as on the server hot path, and each
+combination's top-k over the catalogue is compared with the torch/float32
+top-k (overlap@k). Each backend's resident memory is measured in a fresh
+process, so torch does not inflate the ONNX numbers. Exits with status 1 if
+any combination's overlap is below --min-overlap.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+from bench_ingest import synthetic_document
+from catalogue import DEFAULT_MODEL_NAME, chunk_text
+from embedding import EMBEDDING_BACKENDS, load_encoder, onnxruntime
+from offline_tools import DEFAULT_CORPUS_PATH, FALLBACK_CONVERSATIONS, current_rss_bytes, iter_corpus_conversations
+from retrieval import DOCUMENTS_FILE, EMBEDDINGS_FILE, VECTOR_DTYPES, NumpyRetriever, quantize_vectors
+
+
+def load_catalogue(index_dir, baseline):
+    """Catalogue chunks and their normalized float32 vectors, from a built index or synthesized."""
+    if index_dir:
+        with open(os.path.join(index_dir, DOCUMENTS_FILE), 'r', encoding='utf-8') as f:
+            documents = json.load(f)
+        return documents, np.load(os.path.join(index_dir, EMBEDDINGS_FILE))
+    documents = list(dict.fromkeys(chunk_text(synthetic_document(200), chunk_size=200)))
+    return documents, baseline.encode(documents, batch_size=64, convert_to_numpy=True, normalize_embeddings=True)
+
+def load_queries(corpus_path, count):
+    if corpus_path and os.path.exists(corpus_path):
+        conversations = iter_corpus_conversations(corpus_path)
+    else:
+        conversations = FALLBACK_CONVERSATIONS
+    queries = []
+    for turns in conversations:
+        for turn in turns:
+            queries.append(turn.partition(": ")[2] or turn)
+            if len(queries) == count:
+                return queries
+    # Short fallback corpus: repeat it
+    return [queries[i % len(queries)] for i in range(count)]
+
+def encode_one_by_one(encoder, queries):
+    vectors, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        vectors.append(encoder.encode([query], convert_to_numpy=True, normalize_embeddings=True)[0])
+        latencies.append(time.perf_counter() - start)
+    return np.asarray(vectors, dtype=np.float32), np.asarray(latencies) * 1000
+
+def top_k_sets(retriever, vectors, top_k):
+    return [{document for document, _ in retriever.query(vector, top_k=top_k)} for vector in vectors]
+
+def _measure_rss(model_name, backend, threads, model_dir, results):
+    before = current_rss_bytes()
+    encoder = load_encoder(model_name, backend, threads=threads, model_dir=model_dir)
+    encoder.encode(["warm up"], convert_to_numpy=True, normalize_embeddings=True)
+    results.put((before, current_rss_bytes()))
+
+def backend_rss(model_name, backend, threads, model_dir):
+    """(process RSS, RSS added by loading the model) in a fresh process, in bytes."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_measure_rss, args=(model_name, backend, threads, model_dir, results))
+    process.start()
+    before, after = results.get()
+    process.join()
+    return after, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--index-dir", help="Catalogue index to search (default: a synthetic catalogue)")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS_PATH, help="sales-conversations JSONL to take queries from")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads for every backend")
+    parser.add_argument("--onnx-dir", help="Local directory with tokenizer.json and the .onnx files")
+    parser.add_argument("--min-overlap", type=float, default=0.9)
+    args = parser.parse_args()
+
+    backends = [backend for backend in args.backends if backend == "torch" or onnxruntime is not None]
+    if len(backends) < len(args.backends):
+        print("onnxruntime or tokenizers is not installed, skipping the ONNX backends")
+
+    baseline = load_encoder(args.model, "torch", threads=args.threads)
+    documents, matrix = load_catalogue(args.index_dir, baseline)
+    queries = load_queries(args.corpus, args.queries)
+    reference = NumpyRetriever(np.asarray(matrix, dtype=np.float32), documents)
+    # Warm up before timing so lazy initialisation is not counted
+    encode_one_by_one(baseline, queries[:5])
+    baseline_vectors, baseline_latencies = encode_one_by_one(baseline, queries)
+    truth = top_k_sets(reference, baseline_vectors, args.top_k)
+    print(f"{len(documents)} catalogue chunks, {len(queries)} queries, top_k={args.top_k}, "
+          f"threads={args.threads or 'default'}")
+
+    failed = False
+    for backend in backends:
+        if backend == "torch":
+            vectors, latencies = baseline_vectors, baseline_latencies
+        else:
+            encoder = load_encoder(args.model, backend, threads=args.threads, model_dir=args.onnx_dir)
+            encode_one_by_one(encoder, queries[:5])
+            vectors, latencies = encode_one_by_one(encoder, queries)
+        rss, model_rss = backend_rss(args.model, backend, args.threads, args.onnx_dir)
+        print(f"\n{backend}: encode p50={np.percentile(latencies, 50):.2f}ms "
+              f"p99={np.percentile(latencies, 99):.2f}ms "
+              f"({np.percentile(baseline_latencies, 50) / np.percentile(latencies, 50):.2f}x torch), "
+              f"RSS {rss / 2**20:.0f} MiB ({model_rss / 2**20:.0f} MiB for the model)")
+
+        for dtype in VECTOR_DTYPES:
+            stored, scales = quantize_vectors(matrix, dtype)
+            retriever = NumpyRetriever(stored, documents, scales)
+            overlap = np.mean([len(found & expected) / args.top_k
+                               for found, expected in zip(top_k_sets(retriever, vectors, args.top_k), truth)])
+            failed |= overlap < args.min_overlap
+            print(f"  {dtype:>8}: overlap@{args.top_k}={overlap:.3f}"
+                  f"{'  BELOW THRESHOLD' if overlap < args.min_overlap else ''}, "
+                  f"vectors {retriever.nbytes / 2**20:.2f} MiB "
+                  f"({retriever.nbytes / reference.nbytes:.0%} of float32)")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
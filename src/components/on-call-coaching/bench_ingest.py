@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# src/components/on-call-coaching/bench_ingest.py
+"""
+Compare per-chunk and batched catalogue ingestion on a synthetic document.
+
+    python bench_ingest.py --pages 1000 --batch-size 64
+"""
+import argparse
+import random
+import time
+
+import chromadb
+from sentence_transformers import SentenceTransformer
+
+from catalogue import DEFAULT_EMBED_BATCH_SIZE, DEFAULT_MODEL_NAME, chunk_id, chunk_text, embed_and_store
+
+VOCABULARY = (
+    "loan capital funding merchant cash advance term line credit equipment financing "
+    "rate factor approval revenue business owner payment daily weekly monthly bank "
+    "statement underwriting collateral renewal qualify months minimum score program "
+    "invoice inventory expansion payroll seasonal working small growth fast simple"
+).split()
+
+
+def synthetic_document(pages, words_per_page=450, seed=0):
+    rng = random.Random(seed)
+    return "\n".join(
+        " ".join(rng.choice(VOCABULARY) for _ in range(words_per_page))
+        for _ in range(pages)
+    )
+
+def embed_one_by_one(collection, model, chunks, ids):
+    """The original ingestion path: one encode and one add per chunk."""
+    for chunk, id_ in zip(chunks, ids):
+        collection.add(
+            documents=[chunk],
+            embeddings=[model.encode(chunk).tolist()],
+            ids=[id_]
+        )
+
+def run(label, ingest, model, chunks, ids):
+    client = chromadb.EphemeralClient()
+    collection = client.get_or_create_collection(name=f"bench_{label}")
+    start = time.perf_counter()
+    ingest(collection, model, chunks, ids)
+    elapsed = time.perf_counter() - start
+    assert collection.count() == len(chunks)
+    print(f"{label:>10}: {len(chunks)} chunks in {elapsed:.2f}s -> {len(chunks) / elapsed:.1f} chunks/sec")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_EMBED_BATCH_SIZE)
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    args = parser.parse_args()
+
+    model = SentenceTransformer(args.model)
+    chunks = list(dict.fromkeys(chunk_text(synthetic_document(args.pages), chunk_size=args.chunk_size)))
+    ids = [chunk_id(chunk) for chunk in chunks]
+    print(f"Synthetic catalogue: {args.pages} pages, {len(chunks)} chunks of {args.chunk_size} words")
+
+    # Warm up the model so neither path pays for lazy initialisation
+    model.encode(chunks[:2])
+
+    before = run("per-chunk", embed_one_by_one, model, chunks, ids)
+    after = run("batched", lambda c, m, ch, i: embed_and_store(c, m, ch, i, batch_size=args.batch_size, progress=False),
+                model, chunks, ids)
+    print(f"Speedup: {before / after:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# src/components/on-call-coaching/bench_retrieval.py
+"""
+Compare retriever backends on query latency (p50/p99) and recall@k.
+
+    python bench_retrieval.py --chunks 5000 --queries 500 --top-k 3
+    python bench_retrieval.py --index-dir .catalogue_index
+
+Recall is measured against exact search over the same vectors.
+"""
+import argparse
+import time
+
+import chromadb
+import numpy as np
+
+from catalogue import index_collection_name
+from retrieval import ChromaRetriever, HnswRetriever, NumpyRetriever, hnswlib
+
+
+def synthetic_index(chunks, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    # Clustered vectors look more like real catalogue embeddings than uniform noise
+    centres = rng.standard_normal((max(chunks // 50, 1), dim))
+    matrix = centres[rng.integers(len(centres), size=chunks)] + 0.5 * rng.standard_normal((chunks, dim))
+    matrix = (matrix / np.linalg.norm(matrix, axis=1, keepdims=True)).astype(np.float32)
+    return matrix, [f"chunk {i}" for i in range(chunks)]
+
+def make_queries(matrix, count, seed=1):
+    rng = np.random.default_rng(seed)
+    queries = matrix[rng.integers(len(matrix), size=count)] + 0.3 * rng.standard_normal((count, matrix.shape[1]))
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+def chroma_retriever(matrix, documents):
+    collection = chromadb.EphemeralClient().get_or_create_collection(name="bench_retrieval")
+    batch = 1000
+    for start in range(0, len(matrix), batch):
+        collection.add(
+            documents=documents[start:start + batch],
+            embeddings=matrix[start:start + batch],
+            ids=[str(i) for i in range(start, min(start + batch, len(matrix)))]
+        )
+    return ChromaRetriever(collection)
+
+def measure(retriever, queries, truth, top_k):
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = retriever.query(query, top_k=top_k)
+        latencies.append(time.perf_counter() - start)
+        hits += len({document for document, _ in results} & expected)
+    latencies = np.array(latencies) * 1e6
+    return {
+        "p50_us": float(np.percentile(latencies, 50)),
+        "p99_us": float(np.percentile(latencies, 99)),
+        f"recall@{top_k}": hits / (len(queries) * top_k),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--index-dir", help="Benchmark a built index instead of synthetic vectors")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.index_dir:
+        exact = NumpyRetriever.load(args.index_dir)
+        matrix, documents = np.asarray(exact.matrix), exact.documents
+        client = chromadb.PersistentClient(path=f"{args.index_dir}/chroma")
+        backends = {"chroma": ChromaRetriever(client.get_collection(name=index_collection_name(args.index_dir)))}
+    else:
+        matrix, documents = synthetic_index(args.chunks, args.dim)
+        exact = NumpyRetriever(matrix, documents)
+        backends = {"chroma": chroma_retriever(matrix, documents)}
+    backends["numpy"] = exact
+    if hnswlib is not None:
+        backends["hnsw"] = HnswRetriever.build(matrix, documents)
+    else:
+        print("hnswlib is not installed, skipping the hnsw backend")
+
+    queries = make_queries(matrix, args.queries)
+    truth = [{document for document, _ in exact.query(query, top_k=args.top_k)} for query in queries]
+
+    print(f"{len(matrix)} vectors x {matrix.shape[1]} dims, {len(queries)} queries, top_k={args.top_k}")
+    for name, retriever in backends.items():
+        # Warm up caches and lazy initialisation before timing
+        for query in queries[:10]:
+            retriever.query(query, top_k=args.top_k)
+        result = measure(retriever, queries, truth, args.top_k)
+        print(f"{name:>7}: " + ", ".join(f"{key}={value:.3f}" if "recall" in key else f"{key}={value:.1f}"
+                                         for key, value in result.items()))
+
+if __name__ == "__main__":
+    main()
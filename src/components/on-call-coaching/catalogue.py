@@ -0,0 +1,427 @@
+# src/components/on-call-coaching/catalogue.py
+"""
+Product catalogue ingestion and the persistent on-disk vector index.
+
+The index is built ahead of time with:
+
+    python catalogue.py build-index --catalogue "UCS Product Guide 2025.pdf"
+
+and opened by the server at startup without re-embedding anything. Each named
+catalogue has its own index in <index dir>/<name>; --catalogue-dir builds one
+for every catalogue file in a directory. Chunks are
+stored under ids derived from their content hash, so a rebuild after the
+catalogue changes only embeds chunks whose text actually changed.
+
+Ingestion is a streaming pipeline: PDF pages are extracted in parallel across a
+process pool, split into overlapping sentence-aware chunks as they arrive, and
+embedded batch by batch, so only a handful of pages are held in memory.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import PyPDF2
+import numpy as np
+
+from embedding import EMBEDDING_BACKENDS, load_encoder
+from retrieval import export_vectors
+
+DEFAULT_CATALOGUE_PATH = "UCS Product Guide 2025.pdf"
+DEFAULT_INDEX_DIR = ".catalogue_index"
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+COLLECTION_NAME = "product_catalogue"
+MANIFEST_FILE = "manifest.json"
+# Bumped when the on-disk layout changes, so older indexes are rebuilt
+INDEX_FORMAT_VERSION = 3
+# Chunks encoded and written to Chroma per round-trip
+DEFAULT_EMBED_BATCH_SIZE = 64
+DEFAULT_CHUNK_SIZE = 500
+# Words repeated from the end of one chunk at the start of the next
+DEFAULT_CHUNK_OVERLAP = 50
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+# Name of the catalogue at PRODUCT_CATALOGUE_PATH, used by calls that do not pick one
+DEFAULT_CATALOGUE_NAME = "default"
+CATALOGUE_EXTENSIONS = (".pdf", ".txt")
+# Catalogue names double as index directory names
+CATALOGUE_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+
+# --- Reading and chunking ---
+def read_file(filepath):
+    return "".join(text for _, text in iter_pages(filepath))
+
+def read_pdf(path):
+    return "".join(text for _, text in iter_pdf_pages(path))
+
+def iter_pages(filepath, workers=None):
+    """Yield (page_number, text) pairs for a PDF or plain-text catalogue."""
+    if filepath.endswith('.pdf'):
+        yield from iter_pdf_pages(filepath, workers=workers)
+    else:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            yield 1, f.read()
+
+# Each pool process opens the PDF once and extracts pages by index
+_worker_reader = None
+
+def _open_worker_reader(path):
+    global _worker_reader
+    _worker_reader = PyPDF2.PdfReader(path)
+
+def _extract_page(index):
+    return _worker_reader.pages[index].extract_text() or ""
+
+def iter_pdf_pages(path, workers=None):
+    """
+    Yield (page_number, text) for each page of a PDF, in order.
+
+    Pages are extracted across a process pool with a bounded number of pages
+    in flight, so memory does not grow with the length of the document.
+    """
+    workers = workers or os.cpu_count() or 1
+    page_count = len(PyPDF2.PdfReader(path).pages)
+    if workers == 1 or page_count < 2:
+        _open_worker_reader(path)
+        for index in range(page_count):
+            yield index + 1, _extract_page(index)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_open_worker_reader,
+                             initargs=(path,)) as executor:
+        in_flight = deque()
+        next_index = 0
+        while in_flight or next_index < page_count:
+            while next_index < page_count and len(in_flight) < 2 * workers:
+                in_flight.append((next_index, executor.submit(_extract_page, next_index)))
+                next_index += 1
+            index, future = in_flight.popleft()
+            yield index + 1, future.result()
+
+def chunk_text(text, chunk_size=DEFAULT_CHUNK_SIZE):
+    words = text.split()
+    return [' '.join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
+
+def iter_chunks(pages, chunk_size=DEFAULT_CHUNK_SIZE, overlap=DEFAULT_CHUNK_OVERLAP):
+    """
+    Turn a stream of (page_number, text) pairs into overlapping chunks.
+
+    Chunks end on sentence boundaries where possible and hold up to chunk_size
+    words; the trailing sentences of each chunk, up to overlap words, are
+    repeated at the start of the next one. Each chunk is yielded as a dict with
+    "text", "page_start" and "page_end".
+    """
+    # Sentences of the chunk being built, as (page_number, words)
+    buffer = deque()
+    buffered_words = 0
+    # Words added since the last chunk was emitted, i.e. not just overlap
+    fresh_words = 0
+
+    def emit():
+        return {
+            "text": " ".join(word for _, words in buffer for word in words),
+            "page_start": buffer[0][0],
+            "page_end": buffer[-1][0],
+        }
+
+    def carry_over():
+        nonlocal buffered_words
+        kept = deque()
+        kept_words = 0
+        while buffer and kept_words + len(buffer[-1][1]) <= overlap:
+            sentence = buffer.pop()
+            kept.appendleft(sentence)
+            kept_words += len(sentence[1])
+        buffer.clear()
+        buffer.extend(kept)
+        buffered_words = kept_words
+
+    for page_number, text in pages:
+        for sentence in SENTENCE_BOUNDARY.split(text):
+            words = sentence.split()
+            # Sentences longer than a chunk are split on word boundaries
+            for start in range(0, len(words), chunk_size):
+                piece = words[start:start + chunk_size]
+                if buffered_words + len(piece) > chunk_size and fresh_words:
+                    yield emit()
+                    carry_over()
+                    fresh_words = 0
+                # Drop carried-over sentences that no longer fit alongside this one
+                while buffer and buffered_words + len(piece) > chunk_size:
+                    buffered_words -= len(buffer.popleft()[1])
+                buffer.append((page_number, piece))
+                buffered_words += len(piece)
+                fresh_words += len(piece)
+
+    # The tail is only emitted if it holds more than overlap from the previous chunk
+    if fresh_words:
+        yield emit()
+
+def chunk_id(chunk):
+    """Stable id for a chunk, derived from its content."""
+    return hashlib.sha256(chunk.encode('utf-8')).hexdigest()[:32]
+
+def embed_and_store(collection, model, chunks, ids, metadatas=None,
+                    batch_size=DEFAULT_EMBED_BATCH_SIZE, progress=True):
+    """Encode chunks in batches and write each batch to the collection in one add."""
+    total = len(chunks)
+    for start in range(0, total, batch_size):
+        batch = chunks[start:start + batch_size]
+        embeddings = np.asarray(
+            # Unit vectors, which ChromaRetriever's distance to cosine conversion relies on
+            model.encode(batch, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True),
+            dtype=np.float32,
+        )
+        collection.add(
+            documents=batch,
+            embeddings=embeddings,
+            ids=ids[start:start + batch_size],
+            metadatas=metadatas[start:start + batch_size] if metadatas else None
+        )
+        if progress:
+            done = min(start + batch_size, total)
+            print(f"[Index] Embedded {done}/{total} chunks ({100 * done // total}%)")
+
+
+# --- Named catalogues ---
+def is_valid_catalogue_name(name):
+    return bool(name) and CATALOGUE_NAME_PATTERN.match(name) is not None
+
+def catalogue_index_dir(index_root, name):
+    return os.path.join(index_root, name)
+
+def discover_catalogues(directory):
+    """
+    Map catalogue name to path for each catalogue file in directory, named by
+    file stem. Files whose stem is not a valid catalogue name are ignored.
+    """
+    catalogues = {}
+    for filename in sorted(os.listdir(directory)):
+        stem, extension = os.path.splitext(filename)
+        path = os.path.join(directory, filename)
+        if extension.lower() in CATALOGUE_EXTENSIONS and is_valid_catalogue_name(stem) and os.path.isfile(path):
+            catalogues[stem] = path
+    return catalogues
+
+
+# --- Persistent index ---
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def index_key(catalogue_sha256, model_name):
+    """Identifies an index by the catalogue contents, the embedding model and the layout version."""
+    key = f"{catalogue_sha256}:{model_name}:{INDEX_FORMAT_VERSION}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+
+def _read_manifest(index_dir):
+    try:
+        with open(os.path.join(index_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_manifest(index_dir, manifest):
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def _chroma_client(index_dir):
+    # Imported here since chromadb is slow to import and the server opens the index after startup
+    import chromadb
+    return chromadb.PersistentClient(path=os.path.join(index_dir, "chroma"))
+
+def _get_collection(client, name):
+    try:
+        return client.get_collection(name=name)
+    except Exception:
+        # Chroma raises ValueError or NotFoundError depending on the version
+        return None
+
+def index_collection_name(index_dir):
+    """Name of the Chroma collection an index's manifest points at."""
+    manifest = _read_manifest(index_dir) or {}
+    return manifest.get("collection", COLLECTION_NAME)
+
+def drop_collection(index_dir, name):
+    """Delete a collection that a rebuild replaced, once nothing queries it any more."""
+    client = _chroma_client(index_dir)
+    if _get_collection(client, name) is not None:
+        client.delete_collection(name=name)
+
+def open_index(index_dir=DEFAULT_INDEX_DIR, catalogue_path=DEFAULT_CATALOGUE_PATH,
+               model_name=DEFAULT_MODEL_NAME):
+    """
+    Open a previously built index for reading.
+
+    Returns the Chroma collection, or None if the index is missing or was built
+    from a different catalogue or embedding model.
+    """
+    manifest = _read_manifest(index_dir)
+    if manifest is None:
+        return None
+    if manifest.get("key") != index_key(file_sha256(catalogue_path), model_name):
+        return None
+    return _chroma_client(index_dir).get_collection(name=manifest.get("collection", COLLECTION_NAME))
+
+def build_index(model, index_dir=DEFAULT_INDEX_DIR, catalogue_path=DEFAULT_CATALOGUE_PATH,
+                model_name=DEFAULT_MODEL_NAME, chunk_size=DEFAULT_CHUNK_SIZE,
+                overlap=DEFAULT_CHUNK_OVERLAP, batch_size=DEFAULT_EMBED_BATCH_SIZE, workers=None,
+                report=print, drop_previous=True):
+    """
+    Build or incrementally update the index for a catalogue.
+
+    Pages are streamed through chunking into the embedding stage. Every build
+    writes a new collection: chunks already in the previous one are copied
+    over with their vectors and only new chunks are embedded, so the previous
+    collection is never modified and can keep serving queries until the caller
+    swaps over. It is deleted at the end unless drop_previous is false, in
+    which case the caller drops it with drop_collection. Progress messages go
+    to report. Returns the new Chroma collection.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    catalogue_sha256 = file_sha256(catalogue_path)
+
+    client = _chroma_client(index_dir)
+    previous_name = index_collection_name(index_dir)
+    previous = _get_collection(client, previous_name)
+    if previous is not None and (previous.metadata or {}).get("model") != model_name:
+        # Vectors from another model are not comparable, start over
+        previous = None
+    name = f"{COLLECTION_NAME}-{time.time_ns()}"
+    collection = client.create_collection(name=name, metadata={"model": model_name})
+
+    existing = set(previous.get(include=[])["ids"]) if previous is not None else set()
+    seen = set()
+    # Pending new chunks, and unchanged chunks copied from the previous collection
+    new_batch = ([], [], [])
+    unchanged_batch = ([], [])
+    embedded = 0
+
+    def flush_new():
+        nonlocal embedded
+        texts, ids, metadatas = new_batch
+        if texts:
+            embed_and_store(collection, model, texts, ids, metadatas, batch_size=batch_size, progress=False)
+            embedded += len(texts)
+            report(f"[Index] Embedded {embedded} new chunks (through page {metadatas[-1]['page_end']})")
+            for part in new_batch:
+                part.clear()
+
+    def flush_unchanged():
+        ids, metadatas = unchanged_batch
+        if ids:
+            records = previous.get(ids=ids, include=["embeddings", "documents"])
+            # Chroma does not promise to return records in the order asked for
+            stored = dict(zip(records["ids"], zip(records["embeddings"], records["documents"])))
+            collection.add(
+                ids=ids,
+                embeddings=np.asarray([stored[id_][0] for id_ in ids], dtype=np.float32),
+                documents=[stored[id_][1] for id_ in ids],
+                metadatas=metadatas,
+            )
+            for part in unchanged_batch:
+                part.clear()
+
+    try:
+        chunks = iter_chunks(iter_pages(catalogue_path, workers=workers), chunk_size=chunk_size, overlap=overlap)
+        for chunk in chunks:
+            id_ = chunk_id(chunk["text"])
+            if id_ in seen:
+                continue
+            seen.add(id_)
+            metadata = {"page_start": chunk["page_start"], "page_end": chunk["page_end"]}
+            if id_ in existing:
+                unchanged_batch[0].append(id_)
+                unchanged_batch[1].append(metadata)
+                if len(unchanged_batch[0]) >= batch_size:
+                    flush_unchanged()
+            else:
+                new_batch[0].append(chunk["text"])
+                new_batch[1].append(id_)
+                new_batch[2].append(metadata)
+                if len(new_batch[0]) >= batch_size:
+                    flush_new()
+        flush_new()
+        flush_unchanged()
+        export_vectors(collection, index_dir)
+    except BaseException:
+        # The previous collection and vector files are still the live index
+        client.delete_collection(name=name)
+        raise
+
+    stale = len(existing - seen)
+    report(f"[Index] {len(seen)} chunks: {embedded} embedded, "
+           f"{len(seen) - embedded} unchanged, {stale} removed")
+
+    _write_manifest(index_dir, {
+        "key": index_key(catalogue_sha256, model_name),
+        "catalogue": os.path.basename(catalogue_path),
+        "catalogue_sha256": catalogue_sha256,
+        "model": model_name,
+        "collection": name,
+        "chunk_size": chunk_size,
+        "chunk_overlap": overlap,
+        "chunks": len(seen),
+        "built_at": datetime.now().isoformat(),
+    })
+    if drop_previous:
+        drop_collection(index_dir, previous_name)
+    return collection
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Product catalogue index tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build-index", help="Build or update the persistent catalogue index")
+    build.add_argument("--catalogue", default=os.getenv("PRODUCT_CATALOGUE_PATH", DEFAULT_CATALOGUE_PATH))
+    build.add_argument("--name", default=DEFAULT_CATALOGUE_NAME, help="Name of the --catalogue index")
+    build.add_argument("--catalogue-dir", default=os.getenv("CATALOGUE_DIR"),
+                       help="Also build an index for every catalogue file in this directory")
+    build.add_argument("--index-dir", default=os.getenv("CATALOGUE_INDEX_DIR", DEFAULT_INDEX_DIR),
+                       help="Root directory holding one index per catalogue")
+    build.add_argument("--model", default=os.getenv("EMBEDDING_MODEL_NAME", DEFAULT_MODEL_NAME))
+    # Defaults match the server's, so the index is built with the backend that will query it
+    build.add_argument("--embedding-backend", default=os.getenv("EMBEDDING_BACKEND", "torch"),
+                       choices=EMBEDDING_BACKENDS)
+    build.add_argument("--onnx-dir", default=os.getenv("EMBEDDING_ONNX_DIR"),
+                       help="Local directory with tokenizer.json and the .onnx files")
+    build.add_argument("--threads", type=int, default=int(os.getenv("EMBEDDING_THREADS", "0")) or None,
+                       help="Intra-op threads for the embedding model")
+    build.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    build.add_argument("--overlap", type=int, default=DEFAULT_CHUNK_OVERLAP)
+    build.add_argument("--batch-size", type=int, default=DEFAULT_EMBED_BATCH_SIZE)
+    build.add_argument("--workers", type=int, default=None, help="PDF extraction processes (default: CPU count)")
+    args = parser.parse_args()
+
+    if args.command == "build-index":
+        catalogues = {args.name: args.catalogue} if os.path.exists(args.catalogue) else {}
+        if args.catalogue_dir:
+            catalogues.update(discover_catalogues(args.catalogue_dir))
+        if not catalogues:
+            parser.error(f"No catalogues found at {args.catalogue} or in --catalogue-dir")
+
+        model = load_encoder(args.model, args.embedding_backend, threads=args.threads, model_dir=args.onnx_dir)
+        for name, path in catalogues.items():
+            index_dir = catalogue_index_dir(args.index_dir, name)
+            print(f"[Index] Building index {name!r} for {path} with {args.model} "
+                  f"({args.embedding_backend}) in {index_dir}")
+            build_index(model, index_dir=index_dir, catalogue_path=path,
+                        model_name=args.model, chunk_size=args.chunk_size, overlap=args.overlap,
+                        batch_size=args.batch_size, workers=args.workers)
+        print("[Index] Done")
+
+if __name__ == "__main__":
+    main()
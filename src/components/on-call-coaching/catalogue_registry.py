@@ -0,0 +1,207 @@
+# src/components/on-call-coaching/catalogue_registry.py
+"""
+Per-tenant product catalogues, loaded and reloaded while the server runs.
+
+Each catalogue has its own index in <index root>/<name>. Queries look up the
+retriever in a dict that is replaced on every change and never mutated, so a
+reload never blocks or disturbs queries in flight: the new retriever is only
+swapped in once its index has been fully updated. Reloads are incremental, as
+build_index only embeds chunks whose text changed.
+
+The numpy and hnsw backends read files that build_index replaces atomically.
+For the chroma backend build_index writes a new collection and leaves the one
+being queried untouched; it is dropped once the new retriever is swapped in.
+"""
+import os
+import threading
+import time
+
+from catalogue import (
+    build_index,
+    catalogue_index_dir,
+    discover_catalogues,
+    drop_collection,
+    file_sha256,
+    index_collection_name,
+    is_valid_catalogue_name,
+    open_index,
+)
+from logs import log
+from retrieval import open_retriever
+
+DEFAULT_POLL_SECONDS = 10.0
+
+
+class _Catalogue:
+    __slots__ = ("name", "path", "sha256", "fingerprint", "retriever", "loaded_at")
+
+    def __init__(self, name, path, sha256, fingerprint, retriever):
+        self.name = name
+        self.path = path
+        self.sha256 = sha256
+        self.fingerprint = fingerprint
+        self.retriever = retriever
+        self.loaded_at = time.time()
+
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class CatalogueRegistry:
+    """
+    Retrievers by catalogue name.
+
+    load_model() returns the embedding model; it is only called when an index
+    has to be built or updated.
+    """
+
+    def __init__(self, index_root, model_name, backend, load_model, vector_dtype="float32"):
+        self._index_root = index_root
+        self._model_name = model_name
+        self._backend = backend
+        self._vector_dtype = vector_dtype
+        self._load_model = load_model
+        # name -> _Catalogue; replaced as a whole on every change
+        self._catalogues = {}
+        # Serializes index builds and swaps; queries never take it
+        self._reload_lock = threading.Lock()
+        self._watch_thread = None
+        self._watch_stop = threading.Event()
+        self._counters = {"loaded": 0, "removed": 0, "failed": 0}
+        # name -> fingerprint of a file that failed to load, not retried until it changes
+        self._failed = {}
+
+    def get(self, name):
+        """The retriever for a catalogue, or None if it is not loaded."""
+        catalogue = self._catalogues.get(name)
+        return catalogue.retriever if catalogue is not None else None
+
+    def names(self):
+        return sorted(self._catalogues)
+
+    def load(self, name, path):
+        """
+        Load or reload a catalogue from path, building or updating its index if
+        needed. Returns False if the loaded catalogue is already up to date.
+        """
+        if not is_valid_catalogue_name(name):
+            raise ValueError(f"Invalid catalogue name {name!r}")
+        with self._reload_lock:
+            current = self._catalogues.get(name)
+            fingerprint = _fingerprint(path)
+            if current is not None and current.path == path and current.fingerprint == fingerprint:
+                return False
+            sha256 = file_sha256(path)
+            if current is not None and current.path == path and current.sha256 == sha256:
+                # Touched but not changed
+                self._swap(name, _Catalogue(name, path, sha256, fingerprint, current.retriever))
+                return False
+
+            index_dir = catalogue_index_dir(self._index_root, name)
+            collection = open_index(index_dir, path, self._model_name)
+            replaced = None
+            if collection is None:
+                log.info("catalogue_indexing", catalogue=name, path=path)
+                replaced = index_collection_name(index_dir)
+                # One extraction process: forking a pool from this multi-threaded server is not safe
+                collection = build_index(self._load_model(), index_dir, path, self._model_name, workers=1,
+                                         report=lambda message: log.info("catalogue_index_progress",
+                                                                         catalogue=name, message=message),
+                                         drop_previous=False)
+            retriever = open_retriever(self._backend, index_dir, collection, self._vector_dtype)
+            self._swap(name, _Catalogue(name, path, sha256, fingerprint, retriever))
+            if replaced is not None and replaced != collection.name:
+                drop_collection(index_dir, replaced)
+            self._counters["loaded"] += 1
+            log.info("catalogue_loaded", catalogue=name, sha256=sha256[:12])
+            return True
+
+    def add(self, name, retriever, path=None):
+        """Serve a retriever that was built elsewhere, such as an in-memory index for load tests."""
+        if not is_valid_catalogue_name(name):
+            raise ValueError(f"Invalid catalogue name {name!r}")
+        with self._reload_lock:
+            self._swap(name, _Catalogue(name, path, "", None, retriever))
+            self._counters["loaded"] += 1
+            log.info("catalogue_loaded", catalogue=name, sha256="")
+
+    def remove(self, name):
+        """Stop serving a catalogue. Its index stays on disk, so adding it back is incremental."""
+        with self._reload_lock:
+            if name not in self._catalogues:
+                return False
+            catalogues = dict(self._catalogues)
+            del catalogues[name]
+            self._catalogues = catalogues
+            self._counters["removed"] += 1
+            log.info("catalogue_removed", catalogue=name)
+            return True
+
+    def _swap(self, name, catalogue):
+        catalogues = dict(self._catalogues)
+        catalogues[name] = catalogue
+        self._catalogues = catalogues
+
+    def sync(self, directory, keep=()):
+        """
+        Make the loaded catalogues match the files in directory: load new and
+        changed ones and remove deleted ones, except names in keep.
+        """
+        result = {"loaded": [], "removed": [], "failed": []}
+        found = discover_catalogues(directory)
+        for name, path in found.items():
+            fingerprint = None
+            try:
+                fingerprint = _fingerprint(path)
+                if self._failed.get(name) == fingerprint:
+                    continue
+                if self.load(name, path):
+                    result["loaded"].append(name)
+                self._failed.pop(name, None)
+            except Exception as e:
+                # One broken file must not stop the other tenants' catalogues
+                log.error("catalogue_load_failed", catalogue=name, path=path, error=str(e))
+                with self._reload_lock:
+                    self._counters["failed"] += 1
+                    self._failed[name] = fingerprint
+                result["failed"].append(name)
+        for name in self.names():
+            if name not in found and name not in keep and self.remove(name):
+                result["removed"].append(name)
+        return result
+
+    def watch(self, directory, interval=DEFAULT_POLL_SECONDS, keep=()):
+        """Poll directory on a background thread and sync() when files change."""
+        if self._watch_thread is not None:
+            return False
+
+        def run():
+            while not self._watch_stop.wait(interval):
+                try:
+                    self.sync(directory, keep=keep)
+                except Exception as e:
+                    log.error("catalogue_sync_failed", directory=directory, error=str(e))
+
+        self._watch_thread = threading.Thread(target=run, name="catalogue-watcher", daemon=True)
+        self._watch_thread.start()
+        return True
+
+    def stop_watching(self):
+        self._watch_stop.set()
+
+    def stats(self):
+        # Not under the reload lock, which is held for the whole of an index build
+        catalogues = self._catalogues
+        return {
+            **dict(self._counters),
+            "catalogues": {
+                name: {
+                    "path": catalogue.path,
+                    "sha256": catalogue.sha256[:12],
+                    "loaded_at": catalogue.loaded_at,
+                }
+                for name, catalogue in sorted(catalogues.items())
+            },
+        }
@@ -0,0 +1,104 @@
+# src/components/on-call-coaching/embedding.py
+"""
+Sentence embedding backends for CPU inference.
+
+- "torch": the sentence-transformers model (default)
+- "onnx": the model's ONNX export run with onnxruntime
+- "onnx-int8": the dynamically quantized int8 ONNX export
+
+The ONNX backends only need onnxruntime and tokenizers (optional dependencies),
+not torch, so they start faster and use far less memory. The exports are
+downloaded from the model's Hugging Face repository, or read from a local
+directory holding tokenizer.json and the .onnx file.
+"""
+import os
+
+import numpy as np
+
+try:
+    import onnxruntime
+    from tokenizers import Tokenizer
+except ImportError:
+    onnxruntime = None
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+ONNX_FILES = {
+    "onnx": "onnx/model.onnx",
+    # Runs on any AVX2 CPU; the repository also has AVX-512 VNNI and ARM64 variants
+    "onnx-int8": "onnx/model_quint8_avx2.onnx",
+}
+# all-MiniLM-L6-v2 was trained on sequences of up to 256 word pieces
+DEFAULT_MAX_SEQ_LENGTH = 256
+
+
+class OnnxEncoder:
+    """Mean-pooled sentence embeddings from an ONNX transformer, with SentenceTransformer's encode()."""
+
+    def __init__(self, session, tokenizer, max_seq_length=DEFAULT_MAX_SEQ_LENGTH):
+        self._session = session
+        self._tokenizer = tokenizer
+        self._tokenizer.enable_truncation(max_length=max_seq_length)
+        self._tokenizer.enable_padding()
+        self._input_names = {node.name for node in session.get_inputs()}
+
+    @classmethod
+    def load(cls, model_name, backend="onnx", threads=None, model_dir=None, file_name=None):
+        if onnxruntime is None:
+            raise RuntimeError("The ONNX embedding backends require onnxruntime and tokenizers "
+                               "(pip install onnxruntime tokenizers)")
+        file_name = file_name or ONNX_FILES[backend]
+        if model_dir:
+            model_path = os.path.join(model_dir, os.path.basename(file_name))
+            tokenizer_path = os.path.join(model_dir, "tokenizer.json")
+        else:
+            from huggingface_hub import hf_hub_download
+
+            repo_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+            model_path = hf_hub_download(repo_id, file_name)
+            tokenizer_path = hf_hub_download(repo_id, "tokenizer.json")
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        return cls(session, Tokenizer.from_file(tokenizer_path))
+
+    # Unit vectors by default: the SentenceTransformer model ends in a Normalize layer the ONNX export lacks,
+    # and the retrievers' cosine scores assume unit vectors
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, normalize_embeddings=True, **kwargs):
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            encodings = self._tokenizer.encode_batch(list(sentences[start:start + batch_size]))
+            mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+            inputs = {
+                "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+                "attention_mask": mask,
+                "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+            }
+            hidden = self._session.run(None, {name: value for name, value in inputs.items()
+                                              if name in self._input_names})[0]
+            # Mean over real tokens, as in the sentence-transformers pooling layer
+            weights = mask[:, :, None].astype(np.float32)
+            batches.append((hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9))
+        embeddings = np.concatenate(batches).astype(np.float32) if batches else np.zeros((0, 0), np.float32)
+        if normalize_embeddings and len(embeddings):
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings[0] if single else embeddings
+
+
+def load_encoder(model_name, backend="torch", threads=None, model_dir=None, file_name=None):
+    """Load an embedding model for a backend from EMBEDDING_BACKENDS."""
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return SentenceTransformer(model_name)
+    if backend in ONNX_FILES:
+        return OnnxEncoder.load(model_name, backend, threads=threads, model_dir=model_dir, file_name=file_name)
+    raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {', '.join(EMBEDDING_BACKENDS)}")
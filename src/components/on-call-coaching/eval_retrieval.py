@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# src/components/on-call-coaching/eval_retrieval.py
+"""
+Sweep retrieval settings over sales-conversation prefixes: recall, MRR, latency, memory.
+
+    python eval_retrieval.py --queries 2000 --chunk-sizes 250 500 --overlaps 0 50 \
+        --weightings 0.7:3 1:1 0:1 --backends numpy numpy-int8 hnsw --top-k 3 5 --workers 4
+    python eval_retrieval.py --labels labels.jsonl --output eval-results.json
+
+Each query is a conversation prefix ending on a customer turn, embedded the
+way the server does it: one vector per turn (the last MAX_TURNS turns),
+combined by weighted_query_embedding. Relevance is by catalogue page, so it
+does not depend on the chunking being evaluated. A retrieved chunk is
+relevant if its pages include a relevant page.
+
+- With --labels, each JSONL line is {"turns": ["Customer: ...", ...], "pages": [3, 4]}
+- Otherwise relevance is heuristic: the pages most similar (TF-IDF) to the
+  salesman's actual reply, which the retriever never sees.
+
+Turns and chunks are encoded in batches across --workers processes. Query
+latency (weighting plus retriever.query) is measured in this process, one
+query at a time, as on the hot path.
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import re
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+from catalogue import DEFAULT_CATALOGUE_PATH, DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, DEFAULT_EMBED_BATCH_SIZE, \
+    DEFAULT_MODEL_NAME, iter_chunks, iter_pages
+from embedding import EMBEDDING_BACKENDS, load_encoder
+from offline_tools import DEFAULT_CORPUS_PATH, FALLBACK_CONVERSATIONS, current_rss_bytes, iter_corpus_conversations
+from retrieval import DEFAULT_DECAY, DEFAULT_LATEST_WEIGHT, VECTOR_DTYPES, HnswRetriever, NumpyRetriever, \
+    hnswlib, quantize_vectors, weighted_query_embedding
+from sessions import MAX_TURNS
+
+# Retriever backends, with the numpy backend's stored vector dtypes as "numpy-<dtype>"
+SWEEP_BACKENDS = ("chroma", "numpy", "hnsw") + tuple(f"numpy-{dtype}" for dtype in VECTOR_DTYPES[1:])
+# Words a plain-text catalogue is split into per pseudo-page, so it has pages to judge relevance by
+TEXT_PAGE_WORDS = 300
+WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOP_WORDS = set("""
+a about all also am an and any are as at be because been but by can could do does for from get got had has
+have how i if in into is it its just let like me more most my no not now of on or our out so some than that
+the their them then there these they this to up us was we well were what when which who will with would you
+your yes okay ok sure great thanks thank hi hello really right
+""".split())
+
+# ============================================================================
+# QUERIES AND RELEVANCE
+# ============================================================================
+
+def strip_speaker(turn):
+    """Transcripts reach the server without the corpus's "Customer: " prefix."""
+    speaker, separator, text = turn.partition(": ")
+    return text if separator and speaker in ("Customer", "Salesman") else turn
+
+def is_customer(turn, index):
+    # Unlabelled corpus turns alternate, starting with the customer
+    speaker, separator, _ = turn.partition(": ")
+    return speaker == "Customer" if separator and speaker in ("Customer", "Salesman") else index % 2 == 0
+
+def iter_prefixes(conversations):
+    """(prefix turns, salesman reply) for every customer turn answered by the salesman."""
+    for turns in conversations:
+        for end in range(len(turns) - 1):
+            if is_customer(turns[end], end) and not is_customer(turns[end + 1], end + 1):
+                yield turns[max(0, end + 1 - MAX_TURNS):end + 1], turns[end + 1]
+
+def load_queries(corpus_path, count, seed=0):
+    conversations = iter_corpus_conversations(corpus_path) if corpus_path and os.path.exists(corpus_path) \
+        else FALLBACK_CONVERSATIONS
+    # Sample from a bounded pool rather than taking whole conversations from the top of the file
+    pool = list(itertools.islice(iter_prefixes(conversations), count * 5))
+    random.Random(seed).shuffle(pool)
+    return [{"turns": [strip_speaker(turn) for turn in turns], "reply": strip_speaker(reply)}
+            for turns, reply in pool[:count]]
+
+def load_labels(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    # A prefix without relevant pages has no recall to measure
+    return [{"turns": [strip_speaker(turn) for turn in record["turns"][-MAX_TURNS:]], "pages": set(record["pages"])}
+            for record in records if record["turns"] and record["pages"]]
+
+def tokens(text):
+    return [word for word in WORD.findall(text.lower()) if word not in STOP_WORDS and len(word) > 2]
+
+def heuristic_relevance(queries, pages, relevant_pages, min_similarity):
+    """Give each query the pages most similar to its salesman reply; drop queries with none."""
+    page_terms = [Counter(tokens(text)) for _, text in pages]
+    document_frequency = Counter(term for terms in page_terms for term in terms)
+    idf = {term: math.log(len(pages) / count) + 1 for term, count in document_frequency.items()}
+
+    def unit_vector(terms):
+        weights = {term: (1 + math.log(count)) * idf[term] for term, count in terms.items() if term in idf}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        return {term: weight / norm for term, weight in weights.items()} if norm else {}
+
+    page_vectors = [unit_vector(terms) for terms in page_terms]
+    labelled = []
+    for query in queries:
+        reply = unit_vector(Counter(tokens(query["reply"])))
+        similarities = sorted(
+            ((sum(weight * page_vector.get(term, 0.0) for term, weight in reply.items()), page_number)
+             for (page_number, _), page_vector in zip(pages, page_vectors)),
+            reverse=True,
+        )
+        relevant = {page_number for similarity, page_number in similarities[:relevant_pages]
+                    if similarity >= min_similarity}
+        if relevant:
+            labelled.append({"turns": query["turns"], "pages": relevant})
+    return labelled
+
+def load_pages(catalogue_path):
+    """(page_number, text) pairs; a plain-text catalogue is split into pseudo-pages."""
+    pages = [(number, text) for number, text in iter_pages(catalogue_path) if text.strip()]
+    if len(pages) == 1:
+        words = pages[0][1].split()
+        pages = [(index // TEXT_PAGE_WORDS + 1, " ".join(words[index:index + TEXT_PAGE_WORDS]))
+                 for index in range(0, len(words), TEXT_PAGE_WORDS)]
+    return pages
+
+# ============================================================================
+# ENCODING
+# ============================================================================
+
+# Each pool process loads the encoder once
+_worker_encoder = None
+
+def _load_worker_encoder(model_name, backend, threads, model_dir):
+    global _worker_encoder
+    _worker_encoder = load_encoder(model_name, backend, threads=threads, model_dir=model_dir)
+
+def _encode_batch(texts):
+    start = time.perf_counter()
+    vectors = _worker_encoder.encode(texts, batch_size=len(texts), convert_to_numpy=True, normalize_embeddings=True)
+    return np.asarray(vectors, dtype=np.float32), time.perf_counter() - start
+
+def encode_texts(texts, args):
+    """{text: unit vector} for unique texts, encoded in batches across args.workers processes."""
+    texts = list(dict.fromkeys(texts))
+    batches = [texts[start:start + args.batch_size] for start in range(0, len(texts), args.batch_size)]
+    encoder_args = (args.model, args.embedding_backend, args.threads, args.onnx_dir)
+    start = time.perf_counter()
+    if args.workers <= 1:
+        _load_worker_encoder(*encoder_args)
+        results = [_encode_batch(batch) for batch in batches]
+    else:
+        # spawn: torch and onnxruntime thread pools do not survive fork
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=get_context("spawn"),
+                                 initializer=_load_worker_encoder, initargs=encoder_args) as executor:
+            results = list(executor.map(_encode_batch, batches))
+    elapsed = time.perf_counter() - start
+    encode_seconds = sum(seconds for _, seconds in results)
+    print(f"Encoded {len(texts)} texts in {elapsed:.1f}s "
+          f"({1000 * encode_seconds / max(len(texts), 1):.2f} ms/text per process, {args.workers} workers)")
+    return {text: vector for batch, (vectors, _) in zip(batches, results) for text, vector in zip(batch, vectors)}
+
+# ============================================================================
+# SWEEP
+# ============================================================================
+
+def parse_weighting(value):
+    """"decay:latest_weight", e.g. "0.7:3"; "0:1" uses the latest turn only."""
+    try:
+        decay, _, latest_weight = value.partition(":")
+        return float(decay), float(latest_weight or 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected decay:latest_weight, got {value!r}")
+
+def build_chunks(pages, chunk_size, overlap):
+    """Unique chunk texts (first occurrence, as build_index keeps them) and the pages each covers."""
+    chunk_pages = {}
+    for chunk in iter_chunks(iter(pages), chunk_size=chunk_size, overlap=overlap):
+        chunk_pages.setdefault(chunk["text"], set(range(chunk["page_start"], chunk["page_end"] + 1)))
+    return chunk_pages
+
+def build_retriever(backend, matrix, documents):
+    """(retriever, index bytes or None if unknown) for a SWEEP_BACKENDS name."""
+    if backend == "chroma":
+        from bench_retrieval import chroma_retriever
+
+        before = current_rss_bytes()
+        retriever = chroma_retriever(matrix, documents)
+        return retriever, max(current_rss_bytes() - before, 0)
+    if backend == "hnsw":
+        retriever = HnswRetriever.build(matrix, documents)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.bin")
+            retriever.index.save_index(path)
+            return retriever, os.path.getsize(path)
+    dtype = backend.partition("-")[2] or "float32"
+    stored, scales = quantize_vectors(matrix, dtype)
+    retriever = NumpyRetriever(stored, documents, scales)
+    return retriever, retriever.nbytes
+
+def evaluate(retriever, queries, query_vectors, chunk_pages, top_k):
+    recalls, reciprocal_ranks, latencies = [], [], []
+    for query, (turn_vectors, decay, latest_weight) in zip(queries, query_vectors):
+        start = time.perf_counter()
+        hits = retriever.query(weighted_query_embedding(turn_vectors, decay=decay, latest_weight=latest_weight),
+                               top_k=top_k)
+        latencies.append(time.perf_counter() - start)
+        found = set()
+        reciprocal_rank = 0.0
+        for rank, (document, _) in enumerate(hits, 1):
+            relevant = chunk_pages[document] & query["pages"]
+            if relevant and not reciprocal_rank:
+                reciprocal_rank = 1.0 / rank
+            found |= relevant
+        recalls.append(len(found) / len(query["pages"]))
+        reciprocal_ranks.append(reciprocal_rank)
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "recall": float(np.mean(recalls)),
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--catalogue", default=DEFAULT_CATALOGUE_PATH, help="PDF or text catalogue")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS_PATH, help="sales-conversations JSONL to take prefixes from")
+    parser.add_argument("--labels", help="JSONL of labelled prefixes; replaces the heuristic relevance")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--relevant-pages", type=int, default=2, help="Heuristic: pages judged relevant per query")
+    parser.add_argument("--min-similarity", type=float, default=0.1, help="Heuristic: minimum reply/page TF-IDF cosine")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[250, DEFAULT_CHUNK_SIZE])
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[0, DEFAULT_CHUNK_OVERLAP])
+    parser.add_argument("--weightings", type=parse_weighting, nargs="+",
+                        default=[(DEFAULT_DECAY, DEFAULT_LATEST_WEIGHT), (1.0, 1.0), (0.0, 1.0)],
+                        help="decay:latest_weight pairs for weighted_query_embedding")
+    parser.add_argument("--backends", nargs="+", default=["numpy"], choices=SWEEP_BACKENDS)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[3, 5])
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--embedding-backend", default="torch", choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--onnx-dir", help="Local directory with tokenizer.json and the .onnx files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Encoding processes")
+    parser.add_argument("--threads", type=int, default=1, help="Intra-op threads per encoding process")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_EMBED_BATCH_SIZE)
+    parser.add_argument("--output", help="Write every result as JSON")
+    args = parser.parse_args()
+
+    backends = [backend for backend in args.backends if backend != "hnsw" or hnswlib is not None]
+    if len(backends) < len(args.backends):
+        print("hnswlib is not installed, skipping the hnsw backend")
+
+    pages = load_pages(args.catalogue)
+    if not pages:
+        parser.error(f"No text could be extracted from {args.catalogue}")
+    if args.labels:
+        queries = load_labels(args.labels)
+        if not queries:
+            parser.error(f"{args.labels} has no prefix with both turns and relevant pages")
+    else:
+        prefixes = load_queries(args.corpus, args.queries)
+        if not prefixes:
+            parser.error("No conversation prefix qualifies: none ends on a customer turn that the salesman answers")
+        queries = heuristic_relevance(prefixes, pages, args.relevant_pages, args.min_similarity)
+        if not queries:
+            parser.error("No query has a relevant page; lower --min-similarity or pass --labels")
+    print(f"{len(pages)} catalogue pages, {len(queries)} queries with relevant pages "
+          f"({'labelled' if args.labels else 'heuristic'}), "
+          f"{sum(len(query['pages']) for query in queries) / len(queries):.1f} relevant pages per query")
+
+    configurations = list(itertools.product(args.chunk_sizes, args.overlaps))
+    chunkings = {(size, overlap): build_chunks(pages, size, overlap)
+                 for size, overlap in configurations if overlap < size}
+    # Checked before encoding, which loads the model and can take minutes
+    if not chunkings:
+        parser.error("Every overlap is at least its chunk size; pass an --overlaps value below --chunk-sizes")
+    if not backends:
+        parser.error("No retriever backend left to evaluate")
+
+    # Turns and chunks repeat across prefixes and configurations; each is encoded once
+    vectors = encode_texts(
+        [turn for query in queries for turn in query["turns"]]
+        + [text for chunk_pages in chunkings.values() for text in chunk_pages], args)
+
+    results = []
+    print(f"\n{'chunk':>5} {'overlap':>7} {'chunks':>6} {'weighting':>9} {'backend':>13} {'k':>3} "
+          f"{'recall':>7} {'mrr':>6} {'p50 ms':>7} {'p99 ms':>7} {'index MiB':>9}")
+    for (chunk_size, overlap), chunk_pages in chunkings.items():
+        documents = list(chunk_pages)
+        matrix = np.asarray([vectors[text] for text in documents], dtype=np.float32)
+        for backend in backends:
+            retriever, index_bytes = build_retriever(backend, matrix, documents)
+            for (decay, latest_weight), top_k in itertools.product(args.weightings, args.top_k):
+                query_vectors = [([vectors[turn] for turn in query["turns"]], decay, latest_weight)
+                                 for query in queries]
+                # Warm up caches and lazy initialisation before timing
+                evaluate(retriever, queries[:10], query_vectors[:10], chunk_pages, top_k)
+                result = {
+                    "chunk_size": chunk_size, "overlap": overlap, "chunks": len(documents),
+                    "decay": decay, "latest_weight": latest_weight, "backend": backend, "top_k": top_k,
+                    **evaluate(retriever, queries, query_vectors, chunk_pages, top_k),
+                    "index_bytes": index_bytes,
+                }
+                results.append(result)
+                print(f"{chunk_size:>5} {overlap:>7} {len(documents):>6} {f'{decay:g}:{latest_weight:g}':>9} "
+                      f"{backend:>13} {top_k:>3} {result['recall']:>7.3f} {result['mrr']:>6.3f} "
+                      f"{result['p50_ms']:>7.3f} {result['p99_ms']:>7.3f} {index_bytes / 2**20:>9.2f}")
+
+    for top_k in args.top_k:
+        best = max((result for result in results if result["top_k"] == top_k), key=lambda r: (r["mrr"], r["recall"]),
+                   default=None)
+        if best is None:
+            print(f"\nNo configuration was evaluated at k={top_k}")
+            continue
+        print(f"\nBest MRR at k={top_k}: chunk_size={best['chunk_size']} overlap={best['overlap']} "
+              f"weighting={best['decay']:g}:{best['latest_weight']:g} backend={best['backend']} "
+              f"(recall {best['recall']:.3f}, mrr {best['mrr']:.3f})")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"queries": len(queries), "labelled": bool(args.labels), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
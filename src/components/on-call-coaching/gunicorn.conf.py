@@ -0,0 +1,40 @@
+# src/components/on-call-coaching/gunicorn.conf.py
+"""
+Gunicorn settings for the coaching server: gunicorn -c gunicorn.conf.py script:app
+
+The app is imported once in the master and the torch embedding model is loaded
+there before workers are forked, so workers share the weights copy-on-write. The
+catalogue index is opened by each worker in the background after the fork.
+"""
+import os
+
+from streaming import DEFAULT_SERVER_THREADS
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+# Call sessions and talking point streams live in process memory, so every
+# webhook for a call must reach the same worker. Keep one worker unless calls
+# are routed to workers by CallSid.
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+# Each open talking point stream holds a thread; script.py caps streams at
+# GUNICORN_THREADS - STREAM_RESERVED_THREADS so the Twilio webhooks always have
+# threads left, and refuses further dashboards with a 503. An idle stream thread
+# costs about 20 KB, so the default of 256 threads (248 streams) takes around
+# 5 MB; scale GUNICORN_THREADS with the number of dashboards watching calls.
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", str(DEFAULT_SERVER_THREADS)))
+timeout = 120
+preload_app = True
+
+
+def on_starting(server):
+    # Runs in the master before the port is bound and before any worker exists
+    import script
+    # onnxruntime sessions own thread pools that do not survive fork; the ONNX models are small anyway
+    if script.EMBEDDING_BACKEND == "torch":
+        script.load_embedding_model()
+
+
+def post_fork(server, worker):
+    # Threads and database handles do not survive fork, so warm-up runs per worker
+    import script
+    script.warmup.start()
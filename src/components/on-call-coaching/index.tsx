@@ -10,7 +10,8 @@ const PhoneCallComponent = () => {
   const [error, setError] = useState("");
   const [loading, setLoading] = useState(false);
   const [isLoadingPoints, setIsLoadingPoints] = useState(false);
-  const intervalRef = useRef(null);
+  const eventSourceRef = useRef(null);
+  const pollTimerRef = useRef(null);
 
   // Flask API base URL - change this for production
   // Flask API base URL - change this for production
@@ -35,6 +36,8 @@ const getApiUrl = () => {
 };
 
 const API_BASE_URL = getApiUrl();
+// How often to fetch talking points when the server refuses a stream
+const TALKING_POINTS_POLL_MS = 5000;
   const toE164 = (phoneNumber) => {
     // Remove all non-digits
     const cleaned = phoneNumber.replace(/\D/g, "");
@@ -72,7 +75,7 @@ const API_BASE_URL = getApiUrl();
       if (data.success) {
         setIsCallActive(true);
         setCallSid(data.call_sid);
-        startPollingTalkingPoints();
+        subscribeToTalkingPoints(data.call_sid);
       } else {
         setError(data.error || "Failed to initiate call");
       }
@@ -84,20 +87,60 @@ const API_BASE_URL = getApiUrl();
     }
   };
 
-  const startPollingTalkingPoints = () => {
-    // Immediately fetch talking points
-    fetchTalkingPoints();
+  const closeTalkingPointsStream = () => {
+    if (eventSourceRef.current) {
+      eventSourceRef.current.close();
+      eventSourceRef.current = null;
+    }
+    if (pollTimerRef.current) {
+      clearInterval(pollTimerRef.current);
+      pollTimerRef.current = null;
+    }
+  };
+
+  const subscribeToTalkingPoints = (sid) => {
+    closeTalkingPointsStream();
+
+    // The server pushes talking points as they are generated; EventSource
+    // reconnects on its own and resumes from the last event id it received
+    const source = new EventSource(
+      `${API_BASE_URL}/talking_points/stream?call_sid=${encodeURIComponent(sid)}`
+    );
+
+    source.addEventListener("partial", (event) => {
+      const data = JSON.parse(event.data);
+      setTalkingPoints((previous) => ({
+        ...(previous || {}),
+        points: data.points,
+      }));
+    });
+
+    source.addEventListener("talking_points", (event) => {
+      setTalkingPoints(JSON.parse(event.data));
+    });
+
+    source.addEventListener("end", () => {
+      closeTalkingPointsStream();
+    });
+
+    // The server refuses streams beyond its cap with a 503, after which
+    // EventSource gives up for good; poll for talking points instead
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED) {
+        closeTalkingPointsStream();
+        pollTimerRef.current = setInterval(() => fetchTalkingPoints(sid), TALKING_POINTS_POLL_MS);
+      }
+    };
 
-    // Then poll every 3 seconds
-    intervalRef.current = setInterval(() => {
-      fetchTalkingPoints();
-    }, 3000);
+    eventSourceRef.current = source;
   };
 
-  const fetchTalkingPoints = async () => {
+  const fetchTalkingPoints = async (sid = callSid) => {
     try {
       setIsLoadingPoints(true);
-      const response = await fetch(`${API_BASE_URL}/talking_points`);
+      const response = await fetch(
+        `${API_BASE_URL}/talking_points?call_sid=${encodeURIComponent(sid)}`
+      );
       const data = await response.json();
 
       if (data.success && data.talking_points) {
@@ -131,10 +174,7 @@ const API_BASE_URL = getApiUrl();
         setCallSid("");
         setTalkingPoints(null);
 
-        if (intervalRef.current) {
-          clearInterval(intervalRef.current);
-          intervalRef.current = null;
-        }
+        closeTalkingPointsStream();
       } else {
         setError(data.error || "Failed to end call");
       }
@@ -148,8 +188,8 @@ const API_BASE_URL = getApiUrl();
 
   useEffect(() => {
     return () => {
-      if (intervalRef.current) {
-        clearInterval(intervalRef.current);
+      if (eventSourceRef.current) {
+        eventSourceRef.current.close();
       }
     };
   }, []);
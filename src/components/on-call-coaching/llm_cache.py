@@ -0,0 +1,140 @@
+# src/components/on-call-coaching/llm_cache.py
+"""
+Cache of generated talking points, so repeated openers and objections skip the LLM.
+
+The exact tier is an LRU with a TTL, keyed on a normalized hash of the tenant,
+model, retrieved chunk ids and the last few turns. The optional semantic tier
+reuses an entry for the same tenant, model and chunks when the latest
+utterance's embedding is within a cosine similarity threshold. Entries are
+always partitioned by tenant.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL_SECONDS = 60 * 60
+# Turns from the end of the conversation that take part in the key
+DEFAULT_KEY_TURNS = 3
+# Semantic entries kept per tenant
+DEFAULT_SEMANTIC_MAX_ENTRIES = 256
+
+_NON_WORD = re.compile(r"[^a-z0-9']+")
+
+
+def normalize_text(text):
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+def context_key(model, chunk_ids):
+    """Identifies the retrieved context independently of the conversation."""
+    payload = json.dumps([model, sorted(chunk_ids)])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def exact_key(tenant, model, chunk_ids, turns, key_turns=DEFAULT_KEY_TURNS):
+    """Normalized hash of everything that determines a temperature-0 response."""
+    recent = [[turn["role"], normalize_text(turn["content"])] for turn in turns[-key_turns:]]
+    payload = json.dumps([tenant, model, sorted(chunk_ids), recent])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class TalkingPointCache:
+    """Thread-safe two-tier cache with hit/miss/eviction counters."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 semantic_threshold=None, semantic_max_entries=DEFAULT_SEMANTIC_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic_threshold = semantic_threshold
+        self.semantic_max_entries = semantic_max_entries
+        self._lock = threading.Lock()
+        # key -> (expires_at, tenant, value)
+        self._entries = OrderedDict()
+        # tenant -> deque of (expires_at, context_key, unit embedding, value)
+        self._semantic = {}
+        self._counters = {
+            "hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    def get(self, tenant, key, context=None, embedding=None):
+        """Return a cached value or None. context and embedding enable the semantic tier."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, entry_tenant, value = entry
+                if expires_at <= now:
+                    del self._entries[key]
+                    self._counters["expirations"] += 1
+                elif entry_tenant == tenant:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return value
+
+            if self.semantic_threshold is not None and context is not None and embedding is not None:
+                value = self._semantic_lookup(tenant, context, embedding, now)
+                if value is not None:
+                    self._counters["semantic_hits"] += 1
+                    return value
+
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, tenant, key, value, context=None, embedding=None):
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (expires_at, tenant, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+            if self.semantic_threshold is not None and context is not None and embedding is not None:
+                entries = self._semantic.get(tenant)
+                if entries is None:
+                    entries = self._semantic[tenant] = deque()
+                if len(entries) >= self.semantic_max_entries:
+                    entries.popleft()
+                    self._counters["evictions"] += 1
+                entries.append((expires_at, context, _unit(embedding), value))
+
+    def _semantic_lookup(self, tenant, context, embedding, now):
+        entries = self._semantic.get(tenant)
+        if not entries:
+            return None
+        while entries and entries[0][0] <= now:
+            entries.popleft()
+            self._counters["expirations"] += 1
+        candidates = [entry for entry in entries if entry[1] == context and entry[0] > now]
+        if not candidates:
+            return None
+        similarities = np.stack([entry[2] for entry in candidates]) @ _unit(embedding)
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.semantic_threshold:
+            return candidates[best][3]
+        return None
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["semantic_hits"] + self._counters["misses"]
+            hits = self._counters["hits"] + self._counters["semantic_hits"]
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "semantic_entries": sum(len(entries) for entries in self._semantic.values()),
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
@@ -0,0 +1,168 @@
+# src/components/on-call-coaching/llm_client.py
+"""
+Shared, rate-limit-aware access to the LLM for every call.
+
+All completions go through one LLMPool, which caps how many requests are in
+flight, optionally spaces them to a requests-per-minute budget, and retries
+rate-limited and transient failures with exponential backoff and full jitter,
+honouring the server's Retry-After when it sends one.
+"""
+import random
+import threading
+import time
+
+from logs import log
+
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BASE_DELAY_SECONDS = 0.5
+DEFAULT_MAX_DELAY_SECONDS = 8.0
+# HTTP statuses worth retrying: timeouts, rate limits and server errors
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+# Client-side failures that never reached a response
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout", "RemoteProtocolError"}
+
+
+def _status_and_retry_after(error):
+    """(HTTP status, Retry-After seconds) from an SDK error, looking through wrapping exceptions."""
+    while error is not None:
+        response = getattr(error, "response", None)
+        status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+        if status is not None:
+            retry_after = None
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (AttributeError, TypeError, ValueError):
+                pass
+            return status, retry_after
+        if type(error).__name__ in RETRYABLE_ERRORS:
+            return None, None
+        error = error.__cause__ or error.__context__
+    return None, None
+
+def is_retryable(error):
+    seen = error
+    while seen is not None:
+        if type(seen).__name__ in RETRYABLE_ERRORS:
+            return True
+        seen = seen.__cause__ or seen.__context__
+    status, _ = _status_and_retry_after(error)
+    return status in RETRYABLE_STATUSES
+
+
+class LLMPool:
+    """
+    Wraps client.chat.completions.create / create_partial for concurrent use.
+
+    get_client() returns the (instructor-patched) client and is called per
+    request, so the client can be created lazily or swapped.
+    """
+
+    def __init__(self, get_client, max_concurrency=DEFAULT_MAX_CONCURRENCY, requests_per_minute=None,
+                 max_retries=DEFAULT_MAX_RETRIES, base_delay=DEFAULT_BASE_DELAY_SECONDS,
+                 max_delay=DEFAULT_MAX_DELAY_SECONDS):
+        self._get_client = get_client
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._max_retries = max_retries
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+        # Set by a 429 so every caller backs off, not just the one that was limited
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._counters = {"requests": 0, "retries": 0, "rate_limited": 0, "failed": 0, "max_in_flight": 0}
+        self._wait_seconds_total = 0.0
+
+    def create(self, **kwargs):
+        """chat.completions.create with pooling, rate limiting and retries."""
+        return self._call(lambda client: client.chat.completions.create(**kwargs))
+
+    def create_partial(self, **kwargs):
+        """
+        chat.completions.create_partial, yielding partial responses. Only
+        retried if the stream fails before its first partial.
+        """
+        attempt = 0
+        while True:
+            started = False
+            self._acquire()
+            try:
+                for partial in self._get_client().chat.completions.create_partial(**kwargs):
+                    started = True
+                    yield partial
+                return
+            except Exception as e:
+                delay = None if started else self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            finally:
+                self._release()
+            # Back off without holding a concurrency slot
+            time.sleep(delay)
+            attempt += 1
+
+    def _call(self, request):
+        attempt = 0
+        while True:
+            self._acquire()
+            try:
+                return request(self._get_client())
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            finally:
+                self._release()
+            time.sleep(delay)
+            attempt += 1
+
+    def _acquire(self):
+        start = time.monotonic()
+        self._slots.acquire()
+        with self._lock:
+            now = time.monotonic()
+            begin = max(now, self._next_start, self._paused_until)
+            self._next_start = begin + self._interval
+            self._in_flight += 1
+            self._counters["requests"] += 1
+            self._counters["max_in_flight"] = max(self._counters["max_in_flight"], self._in_flight)
+        if begin > now:
+            time.sleep(begin - now)
+        with self._lock:
+            self._wait_seconds_total += time.monotonic() - start
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _retry_delay(self, error, attempt):
+        """Count the failure; return how long to wait before retrying, or None to give up."""
+        retryable = is_retryable(error)
+        status, retry_after = _status_and_retry_after(error)
+        with self._lock:
+            if status == 429:
+                self._counters["rate_limited"] += 1
+            if not retryable or attempt >= self._max_retries:
+                self._counters["failed"] += 1
+                return None
+            self._counters["retries"] += 1
+            # Full jitter spreads out callers that failed together
+            delay = random.uniform(0, min(self._max_delay, self._base_delay * 2 ** attempt))
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, self._max_delay))
+            if status == 429:
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        log.warning("llm_retry", status=status or type(error).__name__, retry=attempt + 1, delay_seconds=round(delay, 2))
+        return delay
+
+    def stats(self):
+        with self._lock:
+            requests = self._counters["requests"]
+            return {
+                **self._counters,
+                "in_flight": self._in_flight,
+                "avg_wait_ms": round(1000 * self._wait_seconds_total / requests, 3) if requests else 0.0,
+            }
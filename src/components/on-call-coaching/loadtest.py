@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+# src/components/on-call-coaching/loadtest.py
+"""
+Offline replay load test for the coaching server.
+
+Replays Twilio webhook sequences (call status events, partial and final
+transcripts on both tracks) against the Flask app in-process, at a configurable
+number of concurrent calls. Groq and Twilio are replaced by local stand-ins: a
+fixed-latency fake LLM that returns valid TalkingPoints, and the mock Twilio
+API from mock_twilio.py. Results are written as JSON so runs can be compared
+across commits.
+
+    python loadtest.py --calls 100 --concurrency 20 --output loadtest.json
+    python loadtest.py --recording calls.jsonl --concurrency 10
+    python loadtest.py --calls 0 --dial-burst 200 --twilio-cps 20
+
+--dial-burst first posts that many calls to /make_calls and waits for them to
+be dialed, checking the pacing against --twilio-cps and connection reuse.
+
+--stub-encoder replaces the embedding model with hashed bag-of-words vectors
+and --fixture-catalogue serves a small built-in catalogue from memory, so the
+load test runs without downloading a model, the catalogue PDF or Chroma:
+
+    python loadtest.py --stub-encoder --fixture-catalogue --calls 20
+
+Calls are synthesized from sales-conversations-data/train.jsonl when it exists.
+A recording is a JSONL file of {"t": seconds_from_call_start, "path": ...,
+"form": {...}} events; events are grouped into calls by form["CallSid"].
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import threading
+import time
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+
+from mock_twilio import MockTwilio
+from offline_tools import DEFAULT_CORPUS_PATH, FALLBACK_CONVERSATIONS, current_rss_bytes, iter_corpus_conversations
+from retrieval import NumpyRetriever
+
+# --- Local stand-ins for external services ---
+class FakeLLM:
+    """Mimics the instructor-patched Groq client with a fixed response latency."""
+
+    def __init__(self, talking_points_model, latency_seconds):
+        self._talking_points_model = talking_points_model
+        self._latency = latency_seconds
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            create=self._create, create_partial=self._create_partial,
+        ))
+
+    def on(self, *args, **kwargs):
+        pass
+
+    def _respond(self, response_model, messages):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self._latency)
+        if response_model is self._talking_points_model:
+            return response_model(
+                points=["Acknowledge the concern", "Explain the relevant product", "Ask a qualifying question"],
+                reasoning="Fake LLM response for load testing",
+            )
+        # The rolling summarizer's model
+        return response_model(summary=messages[-1]["content"][-400:])
+
+    def _create(self, response_model, messages, **kwargs):
+        return self._respond(response_model, messages)
+
+    def _create_partial(self, response_model, messages, **kwargs):
+        final = self._respond(response_model, messages)
+        for count in range(1, len(final.points) + 1):
+            yield response_model(points=final.points[:count], reasoning="")
+        yield final
+
+
+def import_app(llm_latency_seconds, twilio_cps=None, stub_encoder=False, fixture_catalogue=False):
+    """
+    Import the server with placeholder credentials and swap in the stand-ins.
+    Its Twilio requests go to a local mock, available as script.mock_twilio.
+    """
+    if fixture_catalogue:
+        # Nothing on disk for warm-up to load or index
+        os.environ["PRODUCT_CATALOGUE_PATH"] = ""
+        os.environ.pop("CATALOGUE_DIR", None)
+    os.environ.setdefault("TWILIO_SID", "ACloadtest")
+    os.environ.setdefault("TWILIO_AUTH_TOKEN", "loadtest")
+    os.environ.setdefault("TWILIO_NUMBER", "+15550000000")
+    os.environ.setdefault("GROQ_API_KEY", "loadtest")
+    # The mock rejects dials above the CPS limit, so pacing mistakes show up as failed dials
+    mock_twilio = MockTwilio(auth_token=os.environ["TWILIO_AUTH_TOKEN"], cps=twilio_cps).start()
+    os.environ["TWILIO_API_BASE_URL"] = mock_twilio.url
+    if twilio_cps:
+        os.environ["TWILIO_CPS"] = str(twilio_cps)
+    import script
+
+    script.groq_client = FakeLLM(script.TalkingPoints, llm_latency_seconds)
+    script.mock_twilio = mock_twilio
+    if stub_encoder:
+        script.sbert = StubEncoder()
+    if fixture_catalogue:
+        vectors = script.load_embedding_model().encode(FIXTURE_CATALOGUE, convert_to_numpy=True,
+                                                       normalize_embeddings=True)
+        script.catalogues.add(script.DEFAULT_CATALOGUE_NAME,
+                              NumpyRetriever(np.asarray(vectors, dtype=np.float32), FIXTURE_CATALOGUE))
+    # Load the model and index up front so start-up is not measured as call latency
+    script.warmup.start()
+    if not script.warmup.wait():
+        raise RuntimeError(f"Server warm-up failed: {script.warmup.error}")
+    return script
+
+
+class StubEncoder:
+    """Hashed bag-of-words unit vectors in place of the sentence-transformers model."""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def encode(self, sentences, batch_size=None, convert_to_numpy=True, normalize_embeddings=True, **kwargs):
+        vectors = np.zeros((len(sentences), self.dim), dtype=np.float32)
+        for row, text in enumerate(sentences):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode('utf-8')) % self.dim] += 1.0
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms > 0, norms, 1)
+        return vectors
+
+# Served as the default catalogue by --fixture-catalogue
+FIXTURE_CATALOGUE = [
+    "The Standard plan includes up to ten seats, email support and monthly reporting.",
+    "The Premium plan adds priority phone support, a dedicated account manager and custom integrations.",
+    "Annual billing is discounted by fifteen percent compared with paying month to month.",
+    "Every plan starts with a thirty day free trial and can be cancelled at any time.",
+    "Data is encrypted at rest and in transit, and the platform is SOC 2 Type II certified.",
+    "Onboarding takes about two weeks and includes training sessions for the whole team.",
+    "Volume pricing is available for teams of more than fifty seats.",
+    "The API supports webhooks, single sign-on and exports to the major CRM systems.",
+]
+
+
+# --- Webhook sequences ---
+def transcription_event(call_sid, track, transcript, final, stability=None):
+    form = {
+        "CallSid": call_sid,
+        "TranscriptionEvent": "transcription-content",
+        "Track": track,
+        "TranscriptionData": json.dumps({"transcript": transcript, "confidence": 0.9}),
+        "Final": "true" if final else "false",
+    }
+    if stability is not None:
+        form["Stability"] = str(stability)
+    return form
+
+def synthesize_call(call_sid, turns, turn_gap_seconds):
+    """Webhook events for one conversation, with partials before each final."""
+    events = []
+    t = 0.0
+    for status in ("initiated", "ringing", "answered"):
+        events.append({"t": t, "path": "/call_status", "form": {"CallSid": call_sid, "CallStatus": status}})
+    for index, turn in enumerate(turns):
+        speaker, separator, text = turn.partition(": ")
+        if not separator:
+            # Unlabelled turns alternate, starting with the customer
+            speaker, text = ("Customer" if index % 2 == 0 else "Salesman"), turn
+        track = "inbound" if speaker.lower() == "customer" else "outbound"
+        words = text.split()
+        # Partials grow in thirds of the utterance with rising stability
+        for step, stability in ((1, 0.3), (2, 0.7), (3, 0.9)):
+            t += turn_gap_seconds / 4
+            partial = " ".join(words[:max(1, len(words) * step // 3)])
+            events.append({"t": t, "path": "/transcription",
+                           "form": transcription_event(call_sid, track, partial, False, stability)})
+        t += turn_gap_seconds / 4
+        events.append({"t": t, "path": "/transcription", "form": transcription_event(call_sid, track, text, True)})
+    t += turn_gap_seconds
+    events.append({"t": t, "path": "/call_status",
+                   "form": {"CallSid": call_sid, "CallStatus": "completed", "CallDuration": str(int(t))}})
+    return events
+
+def synthesize_calls(corpus_path, calls, turn_gap_seconds):
+    conversations = []
+    if corpus_path and os.path.exists(corpus_path):
+        conversations = list(itertools.islice(iter_corpus_conversations(corpus_path), calls))
+    if not conversations:
+        print(f"Corpus {corpus_path} not found or empty, using built-in conversations")
+        conversations = FALLBACK_CONVERSATIONS
+    # Reuse conversations if the corpus has fewer than requested
+    return [
+        synthesize_call(f"CALOADTEST{index:024d}", turns, turn_gap_seconds)
+        for index, turns in zip(range(calls), itertools.cycle(conversations))
+    ]
+
+def load_recording(path):
+    by_call = defaultdict(list)
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            event = json.loads(line)
+            by_call[event["form"].get("CallSid")].append(event)
+    return [sorted(events, key=lambda event: event["t"]) for events in by_call.values()]
+
+
+# --- Measurement ---
+def percentiles(values):
+    if not values:
+        return {}
+    values = np.asarray(values)
+    return {
+        "count": int(len(values)),
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class ReplayRun:
+    """Replays calls against the app and measures final-to-talking-point latency."""
+
+    def __init__(self, server, speed):
+        self.server = server
+        self.speed = speed
+        self._lock = threading.Lock()
+        # call_sid -> post times of finals not yet answered by talking points
+        self._pending_finals = defaultdict(list)
+        self.e2e_ms = []
+        self.status_counts = defaultdict(int)
+        self.exceptions = 0
+        self.requests = 0
+        self._wrap_publish()
+
+    def _wrap_publish(self):
+        broker = self.server.broker
+        publish = broker.publish
+
+        def timed_publish(call_sid, event, data):
+            if event == "talking_points":
+                now = time.perf_counter()
+                with self._lock:
+                    for posted_at in self._pending_finals.pop(call_sid, []):
+                        self.e2e_ms.append(1000 * (now - posted_at))
+            return publish(call_sid, event, data)
+
+        broker.publish = timed_publish
+
+    def replay_call(self, events):
+        client = self.server.app.test_client()
+        start = time.perf_counter()
+        for event in events:
+            delay = start + event["t"] / self.speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            form = event["form"]
+            if form.get("Final") == "true":
+                with self._lock:
+                    self._pending_finals[form["CallSid"]].append(time.perf_counter())
+            try:
+                response = client.post(event["path"], data=form)
+                status = response.status_code
+            except Exception as e:
+                print(f"Request to {event['path']} failed: {e}")
+                with self._lock:
+                    self.exceptions += 1
+                continue
+            with self._lock:
+                self.requests += 1
+                self.status_counts[status] += 1
+
+    def drain(self, timeout):
+        """Wait for background talking point generation and summaries to finish."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            # Talking point runs schedule summaries, so both must be idle at once
+            if (self.server.utterance_worker.stats()["active_calls"] == 0
+                    and self.server.summarizer.stats()["in_flight"] == 0):
+                return True
+            time.sleep(0.05)
+        return False
+
+    def unanswered_finals(self):
+        with self._lock:
+            return sum(len(times) for times in self._pending_finals.values())
+
+
+def dial_burst(server, count):
+    """Post count calls to /make_calls in one batch and wait until all are dialed or failed."""
+    client = server.app.test_client()
+    calls = [{"sales_agent_number": f"+1555{index:07d}", "customer_number": f"+1666{index:07d}",
+              "idempotency_key": f"loadtest-{index}"} for index in range(count)]
+    started = time.perf_counter()
+    response = client.post("/make_calls", json={"calls": calls})
+    accepted_ms = 1000 * (time.perf_counter() - started)
+    if response.status_code != 202:
+        raise RuntimeError(f"/make_calls returned {response.status_code}: {response.get_data(as_text=True)}")
+    status_url = response.get_json()["status_url"]
+    while True:
+        batch = client.get(status_url).get_json()
+        if batch["done"]:
+            break
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    # Posting the same keys again must not dial again
+    client.post("/make_calls", json={"calls": calls})
+    time.sleep(0.5)
+    mock = server.mock_twilio.stats()
+    return {
+        "calls": count,
+        "accepted_ms": round(accepted_ms, 3),
+        "seconds": round(elapsed, 3),
+        "calls_per_second": round(count / elapsed, 3),
+        "counts": batch["counts"],
+        "mock_twilio": mock,
+        "duplicate_dials": mock["creates"] - batch["counts"].get("dialed", 0),
+        "control_plane": server.twilio_control.stats(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline replay load test for the coaching server")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS_PATH, help="sales-conversations JSONL to synthesize calls from")
+    parser.add_argument("--recording", help="Replay recorded webhook events instead of synthesizing calls")
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10, help="Calls replayed at the same time")
+    parser.add_argument("--turn-gap-ms", type=float, default=800, help="Time between finals within a call")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="Fake LLM response time")
+    parser.add_argument("--drain-timeout", type=float, default=60)
+    parser.add_argument("--dial-burst", type=int, default=0, help="Calls to dial through /make_calls first")
+    parser.add_argument("--twilio-cps", type=float, default=None,
+                        help="Mock Twilio's calls-per-second limit, and the server's (default: server default, no mock limit)")
+    parser.add_argument("--stub-encoder", action="store_true",
+                        help="Embed with hashed bag-of-words vectors instead of loading the model")
+    parser.add_argument("--fixture-catalogue", action="store_true",
+                        help="Serve a small built-in catalogue instead of loading or indexing catalogue files")
+    parser.add_argument("--output", default="loadtest-results.json")
+    args = parser.parse_args()
+
+    server = import_app(args.llm_latency_ms / 1000, twilio_cps=args.twilio_cps,
+                        stub_encoder=args.stub_encoder, fixture_catalogue=args.fixture_catalogue)
+    dialing = None
+    if args.dial_burst:
+        print(f"Dialing {args.dial_burst} calls through /make_calls")
+        dialing = dial_burst(server, args.dial_burst)
+        print(json.dumps({key: dialing[key] for key in ("seconds", "calls_per_second", "counts", "duplicate_dials")}))
+    if args.recording:
+        calls = load_recording(args.recording)[:args.calls or None]
+    else:
+        calls = synthesize_calls(args.corpus, args.calls, args.turn_gap_ms / 1000)
+    webhooks = sum(len(events) for events in calls)
+    print(f"Replaying {len(calls)} calls ({webhooks} webhooks) at concurrency {args.concurrency}")
+
+    run = ReplayRun(server, args.speed)
+    rss_before = current_rss_bytes()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(run.replay_call, calls))
+    replay_seconds = time.perf_counter() - started
+    drained = run.drain(args.drain_timeout)
+    total_seconds = time.perf_counter() - started
+    rss_after = current_rss_bytes()
+
+    queue = server.utterance_worker.stats()
+    summarizer = server.summarizer.stats()
+    errors = run.exceptions + sum(count for status, count in run.status_counts.items() if status >= 400)
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "config": vars(args),
+        "calls": len(calls),
+        "webhooks": webhooks,
+        "replay_seconds": round(replay_seconds, 3),
+        "total_seconds": round(total_seconds, 3),
+        "drained": drained,
+        "throughput": {
+            "webhooks_per_second": round(run.requests / replay_seconds, 2),
+            "calls_per_second": round(len(calls) / total_seconds, 3),
+        },
+        "final_to_talking_points_ms": percentiles(run.e2e_ms),
+        "unanswered_finals": run.unanswered_finals(),
+        "memory": {
+            "rss_before_mb": round(rss_before / 2**20, 1),
+            "rss_after_mb": round(rss_after / 2**20, 1),
+            "growth_per_call_kb": round((rss_after - rss_before) / 1024 / max(len(calls), 1), 1),
+            "sessions_retained": len(server.sessions),
+        },
+        "errors": {
+            "count": errors,
+            "rate": round(errors / max(run.requests + run.exceptions, 1), 4),
+            "by_status": {str(status): count for status, count in sorted(run.status_counts.items())},
+            "exceptions": run.exceptions,
+            "worker_failed": queue["failed"],
+            "worker_rejected": queue["rejected"],
+            "summarizer_failed": summarizer["failed"],
+        },
+        "llm_calls": server.groq_client.calls,
+        "dialing": dialing,
+        "queue": queue,
+        "summarizer": summarizer,
+        "stage_latency": server.metrics.percentiles(),
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps({key: results[key] for key in ("throughput", "final_to_talking_points_ms", "memory", "errors")},
+                     indent=2))
+    print(f"Results written to {args.output}")
+    server.utterance_worker.shutdown(wait=False)
+
+if __name__ == "__main__":
+    main()
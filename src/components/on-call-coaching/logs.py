@@ -0,0 +1,141 @@
+# src/components/on-call-coaching/logs.py
+"""
+Queued structured logging for the request path.
+
+log.info("dial_status", status="busy") checks the level and appends a tuple
+to a bounded queue; a background thread formats and writes the records. A
+webhook therefore never waits on stdout, and records below the level cost a
+comparison. If the writer falls behind, records are dropped and counted
+rather than blocking the caller.
+
+The server modules share one logger, log, configured by LOG_LEVEL and
+LOG_FORMAT.
+"""
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+FORMATS = ("json", "text")
+DEFAULT_MAX_QUEUE = 10000
+# Records formatted per write to the stream
+WRITE_BATCH = 256
+
+
+class QueuedLogger:
+    """Leveled event logger with keyword fields, written by a background thread."""
+
+    def __init__(self, level="info", fmt="json", stream=None, max_queue=DEFAULT_MAX_QUEUE):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown log format {fmt!r}, expected one of {', '.join(FORMATS)}")
+        self._format = fmt
+        self._stream = stream
+        self._max_queue = max_queue
+        self._level = LEVELS[self._check_level(level)]
+        self._lock = threading.Lock()
+        self._queue = None
+        # The writer thread belongs to the process that started it; a forked worker starts its own
+        self._pid = None
+        self._counters = {"written": 0, "dropped": 0, "failed": 0}
+        atexit.register(self.flush)
+
+    @staticmethod
+    def _check_level(level):
+        level = str(level).lower()
+        if level not in LEVELS:
+            raise ValueError(f"Unknown log level {level!r}, expected one of {', '.join(LEVELS)}")
+        return level
+
+    @property
+    def level(self):
+        return next(name for name, number in LEVELS.items() if number == self._level)
+
+    def set_level(self, level):
+        self._level = LEVELS[self._check_level(level)]
+
+    def enabled(self, level):
+        """For callers that would do work to build a record's fields."""
+        return LEVELS[level] >= self._level
+
+    def debug(self, event, **fields):
+        if self._level <= 10:
+            self._put("debug", event, fields)
+
+    def info(self, event, **fields):
+        if self._level <= 20:
+            self._put("info", event, fields)
+
+    def warning(self, event, **fields):
+        if self._level <= 30:
+            self._put("warning", event, fields)
+
+    def error(self, event, **fields):
+        self._put("error", event, fields)
+
+    def _put(self, level, event, fields):
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait((time.time(), level, event, fields))
+        except queue.Full:
+            with self._lock:
+                self._counters["dropped"] += 1
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A queue inherited across fork may hold a lock taken by a thread that no longer exists
+            self._queue = queue.Queue(self._max_queue)
+            threading.Thread(target=self._run, args=(self._queue,), name="log-writer", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self, records):
+        while True:
+            batch = [records.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(records.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                stream = self._stream or sys.stdout
+                stream.write("".join(self._render(*record) for record in batch))
+                stream.flush()
+                written, failed = len(batch), 0
+            except Exception:
+                written, failed = 0, len(batch)
+            with self._lock:
+                self._counters["written"] += written
+                self._counters["failed"] += failed
+            for _ in batch:
+                records.task_done()
+
+    def _render(self, timestamp, level, event, fields):
+        when = datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec="milliseconds")
+        if self._format == "json":
+            return json.dumps({"ts": when, "level": level, "event": event, **fields},
+                              ensure_ascii=False, default=str) + "\n"
+        details = " ".join(f"{key}={value}" for key, value in fields.items())
+        return f"{when} {level.upper():<7} {event}{' ' + details if details else ''}\n"
+
+    def flush(self, timeout=2.0):
+        """Wait up to timeout seconds for queued records to be written."""
+        records = self._queue if self._pid == os.getpid() else None
+        deadline = time.monotonic() + timeout
+        while records is not None and records.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def stats(self):
+        with self._lock:
+            queued = self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0
+            return {**self._counters, "level": self.level, "queued": queued}
+
+
+# Shared by the server modules; LOG_LEVEL=debug adds request detail
+log = QueuedLogger(level=os.getenv("LOG_LEVEL", "info"), fmt=os.getenv("LOG_FORMAT", "json"))
@@ -0,0 +1,169 @@
+# src/components/on-call-coaching/metrics.py
+"""
+Latency histograms for the coaching hot path, exported in Prometheus text format.
+
+Each stage is recorded twice: in an aggregate histogram labelled by stage and
+track, which is what p50/p95/p99 are computed from, and in a per-call histogram
+that also carries call_sid. Per-call series are kept for a bounded number of
+recent calls so memory stays flat.
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from sub-millisecond webhook work to multi-second LLM calls
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Calls whose per-call series are retained, least recently updated dropped first
+MAX_CALL_SERIES = 200
+
+_labels = threading.local()
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = 0
+        while index < len(BUCKETS) and value > BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation within buckets, like histogram_quantile."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = BUCKETS[index - 1] if index else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else BUCKETS[-1]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return BUCKETS[-1]
+
+
+class StageMetrics:
+    """Thread-safe registry of stage latency histograms."""
+
+    def __init__(self, max_call_series=MAX_CALL_SERIES):
+        self._lock = threading.Lock()
+        # (stage, track) -> histogram
+        self._stages = {}
+        # call_sid -> {(stage, track) -> histogram}
+        self._calls = OrderedDict()
+        self._max_call_series = max_call_series
+
+    @contextmanager
+    def labels(self, call_sid="", track=""):
+        """Set the call_sid and track labels for spans recorded by this thread."""
+        previous = getattr(_labels, "value", ("", ""))
+        _labels.value = (call_sid or "", track or "")
+        try:
+            yield
+        finally:
+            _labels.value = previous
+
+    @contextmanager
+    def span(self, stage):
+        """Time the enclosed block as a stage, using the thread's current labels."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def observe(self, stage, seconds, call_sid=None, track=None):
+        default_call_sid, default_track = getattr(_labels, "value", ("", ""))
+        call_sid = default_call_sid if call_sid is None else call_sid
+        track = default_track if track is None else track
+        key = (stage, track)
+        with self._lock:
+            histogram = self._stages.get(key)
+            if histogram is None:
+                histogram = self._stages[key] = _Histogram()
+            histogram.observe(seconds)
+
+            if call_sid:
+                series = self._calls.get(call_sid)
+                if series is None:
+                    series = self._calls[call_sid] = {}
+                    while len(self._calls) > self._max_call_series:
+                        self._calls.popitem(last=False)
+                else:
+                    self._calls.move_to_end(call_sid)
+                histogram = series.get(key)
+                if histogram is None:
+                    histogram = series[key] = _Histogram()
+                histogram.observe(seconds)
+
+    def percentiles(self):
+        """p50/p95/p99 in milliseconds per stage, across tracks."""
+        with self._lock:
+            merged = {}
+            for (stage, _), histogram in self._stages.items():
+                total = merged.get(stage)
+                if total is None:
+                    total = merged[stage] = _Histogram()
+                total.counts = [a + b for a, b in zip(total.counts, histogram.counts)]
+                total.sum += histogram.sum
+                total.count += histogram.count
+            return {
+                stage: {
+                    "count": histogram.count,
+                    **{f"p{int(q * 100)}_ms": round(1000 * histogram.quantile(q), 3) for q in (0.5, 0.95, 0.99)},
+                }
+                for stage, histogram in merged.items()
+            }
+
+    def render(self):
+        """Prometheus text exposition of all histograms."""
+        lines = [
+            "# HELP coaching_stage_seconds Latency of coaching pipeline stages.",
+            "# TYPE coaching_stage_seconds histogram",
+        ]
+        with self._lock:
+            for (stage, track), histogram in sorted(self._stages.items()):
+                lines.extend(_render_histogram("coaching_stage_seconds", {"stage": stage, "track": track}, histogram))
+            lines.append("# HELP coaching_call_stage_seconds Latency of coaching pipeline stages per call.")
+            lines.append("# TYPE coaching_call_stage_seconds histogram")
+            for call_sid, series in self._calls.items():
+                for (stage, track), histogram in sorted(series.items()):
+                    lines.extend(_render_histogram(
+                        "coaching_call_stage_seconds",
+                        {"stage": stage, "call_sid": call_sid, "track": track},
+                        histogram,
+                    ))
+        return "\n".join(lines) + "\n"
+
+
+def render_gauges(name, help_text, values):
+    """Prometheus text for a flat dict of numeric values, as one gauge per key."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for key, value in sorted(values.items()):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f'{name}{{name="{key}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _render_histogram(name, labels, histogram):
+    label_text = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    lines = []
+    cumulative = 0
+    for bound, count in zip(BUCKETS, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{label_text},le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum{{{label_text}}} {histogram.sum}")
+    lines.append(f"{name}_count{{{label_text}}} {histogram.count}")
+    return lines
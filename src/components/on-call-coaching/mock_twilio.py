@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# src/components/on-call-coaching/mock_twilio.py
+"""
+A local stand-in for the Twilio Calls REST API, for testing the control plane.
+
+    python mock_twilio.py --port 8099 --cps 1
+    TWILIO_API_BASE_URL=http://127.0.0.1:8099 python script.py
+
+It answers Calls.json (create) and Calls/<sid>.json (update) like Twilio,
+checks Basic auth against the account in the path, and keeps every request.
+With --cps it rejects call creations above that rate with Twilio's 429 (code
+20429), so a client that does not pace itself fails visibly. The rate is a
+token bucket holding one second of calls, so network jitter in a correctly
+paced client is tolerated.
+GET /_requests returns what was received, and GET /_stats returns counts and
+the highest creation rate seen in any one second.
+"""
+import argparse
+import base64
+import itertools
+import json
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+CALLS_PATH = re.compile(r"^/2010-04-01/Accounts/(?P<account>[^/]+)/Calls(?:/(?P<sid>[^/]+))?\.json$")
+
+
+class MockTwilio:
+    """In-process mock Twilio API on a background thread; url is its base URL."""
+
+    def __init__(self, host="127.0.0.1", port=0, auth_token=None, cps=None, latency_seconds=0.0):
+        self.auth_token = auth_token
+        self.cps = cps
+        self.latency_seconds = latency_seconds
+        self.lock = threading.Lock()
+        self.requests = []
+        self._sids = itertools.count(1)
+        # Creation times within the last second, for the max_creates_per_second stat
+        self._recent_creates = deque()
+        self._tokens = float(cps or 0)
+        self._refilled_at = time.monotonic()
+        self.max_creates_per_second = 0
+        self.rejected = 0
+        self.connections = 0
+        self.server = ThreadingHTTPServer((host, port), _handler(self))
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-twilio", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def creates(self):
+        with self.lock:
+            return [request for request in self.requests if request["action"] == "create"]
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": len(self.requests),
+                "creates": sum(request["action"] == "create" for request in self.requests),
+                "updates": sum(request["action"] == "update" for request in self.requests),
+                "rejected": self.rejected,
+                "connections": self.connections,
+                "max_creates_per_second": self.max_creates_per_second,
+            }
+
+    def _authorized(self, account, header):
+        if self.auth_token is None:
+            return True
+        expected = base64.b64encode(f"{account}:{self.auth_token}".encode()).decode()
+        return header == f"Basic {expected}"
+
+    def _admit_create(self):
+        """False if this creation would exceed cps."""
+        now = time.monotonic()
+        with self.lock:
+            if self.cps is not None:
+                self._tokens = min(self.cps, self._tokens + (now - self._refilled_at) * self.cps)
+                self._refilled_at = now
+                if self._tokens < 1:
+                    self.rejected += 1
+                    return False
+                self._tokens -= 1
+            while self._recent_creates and now - self._recent_creates[0] >= 1.0:
+                self._recent_creates.popleft()
+            self._recent_creates.append(now)
+            self.max_creates_per_second = max(self.max_creates_per_second, len(self._recent_creates))
+            return True
+
+    def handle(self, method, path, headers, body):
+        """(status, payload) for one request."""
+        if method == "GET" and path == "/_requests":
+            with self.lock:
+                return 200, list(self.requests)
+        if method == "GET" and path == "/_stats":
+            return 200, self.stats()
+        match = CALLS_PATH.match(path)
+        if method != "POST" or not match:
+            return 404, {"code": 20404, "message": "The requested resource was not found", "status": 404}
+        if not self._authorized(match["account"], headers.get("Authorization")):
+            return 401, {"code": 20003, "message": "Authenticate", "status": 401}
+        params = {key: values if len(values) > 1 else values[0] for key, values in parse_qs(body).items()}
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+        if match["sid"] is None:
+            if not params.get("To") or not params.get("From") or not params.get("Url"):
+                return 400, {"code": 21201, "message": "To, From and Url are required", "status": 400}
+            if not self._admit_create():
+                return 429, {"code": 20429, "message": "Too Many Requests", "status": 429}
+            sid = f"CA{next(self._sids):032d}"
+            action, status = "create", "queued"
+        else:
+            sid, action, status = match["sid"], "update", params.get("Status", "in-progress")
+        with self.lock:
+            self.requests.append({"t": time.time(), "action": action, "sid": sid, "params": params})
+        return (201 if action == "create" else 200), {
+            "sid": sid, "account_sid": match["account"], "status": status,
+            "to": params.get("To"), "from": params.get("From"),
+        }
+
+
+def _handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, so clients can reuse connections as they would with Twilio
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            with mock.lock:
+                mock.connections += 1
+
+        def _respond(self, method):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length).decode() if length else ""
+            status, payload = mock.handle(method, self.path, self.headers, body)
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._respond("GET")
+
+        def do_POST(self):
+            self._respond("POST")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--auth-token", help="Reject requests without this account's Basic auth")
+    parser.add_argument("--cps", type=float, help="Reject call creations above this rate with a 429")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay before each response")
+    args = parser.parse_args()
+    mock = MockTwilio(args.host, args.port, auth_token=args.auth_token, cps=args.cps,
+                      latency_seconds=args.latency_ms / 1000)
+    print(f"Mock Twilio API listening on {mock.url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(mock.stats(), indent=2))
+
+if __name__ == "__main__":
+    main()
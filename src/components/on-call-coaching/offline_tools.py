@@ -0,0 +1,41 @@
+# src/components/on-call-coaching/offline_tools.py
+"""Corpus access and memory measurement shared by the load test, benchmarks and retrieval eval."""
+import json
+import os
+import resource
+
+DEFAULT_CORPUS_PATH = "../../../sales-conversations-data/train.jsonl"
+
+FALLBACK_CONVERSATIONS = [
+    [
+        "Customer: Hi, I run a small bakery and I'm looking at financing options.",
+        "Salesman: Great, what are you hoping to use the funds for?",
+        "Customer: New ovens mostly, but I'm worried about the rates.",
+        "Salesman: Understood. Equipment financing usually has the lowest rates.",
+        "Customer: How fast could I get approved?",
+        "Salesman: Often within a day or two with three months of bank statements.",
+    ],
+    [
+        "Customer: I'm not really interested, I already have a loan.",
+        "Salesman: That's fine, many clients consolidate or add a line of credit.",
+        "Customer: What would a line of credit cost me?",
+        "Salesman: It depends on revenue and time in business. Can I ask a few questions?",
+    ],
+]
+
+def iter_corpus_conversations(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            turns = [record[key] for key in sorted(record, key=lambda k: int(k) if k.isdigit() else 1 << 30)
+                     if key.isdigit() and record[key]]
+            if len(turns) >= 2:
+                yield turns
+
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Peak rather than current RSS, in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
@@ -0,0 +1,89 @@
+# src/components/on-call-coaching/profiler.py
+"""
+Opt-in sampling profiler that can be started and stopped while the server runs.
+
+A background thread periodically snapshots the stacks of all other threads and
+counts them in collapsed-stack format ("frame;frame;frame count"), which
+flamegraph.pl and speedscope read directly.
+"""
+import sys
+import threading
+import time
+from collections import Counter
+
+DEFAULT_INTERVAL_SECONDS = 0.005
+# Sampling periods accepted at runtime; shorter ones would keep a core busy walking stacks
+MIN_INTERVAL_SECONDS = 0.001
+MAX_INTERVAL_SECONDS = 1.0
+# Distinct stacks kept; rarer stacks beyond this are dropped
+MAX_STACKS = 10000
+
+
+class SamplingProfiler:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._stacks = Counter()
+        self._samples = 0
+        self._interval = DEFAULT_INTERVAL_SECONDS
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=DEFAULT_INTERVAL_SECONDS, reset=True):
+        with self._lock:
+            if self.running:
+                return False
+            if reset:
+                self._stacks.clear()
+                self._samples = 0
+            self._interval = interval
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return False
+        self._stop.set()
+        thread.join()
+        return True
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self._interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    key = ";".join(reversed(stack))
+                    if key in self._stacks or len(self._stacks) < MAX_STACKS:
+                        self._stacks[key] += 1
+                self._samples += 1
+
+    def collapsed(self):
+        """Collected samples in collapsed-stack format, most frequent first."""
+        with self._lock:
+            return "\n".join(f"{stack} {count}" for stack, count in self._stacks.most_common()) + "\n"
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": self.running,
+                "interval_ms": self._interval * 1000,
+                "samples": self._samples,
+                "stacks": len(self._stacks),
+            }
@@ -0,0 +1,154 @@
+# src/components/on-call-coaching/prompt.py
+"""
+Token-budgeted prompt assembly for talking point generation.
+
+Sections are filled in priority order until the budget is spent:
+
+1. the fixed instructions
+2. the last keep_turns turns, verbatim
+3. the rolling summary of earlier turns, capped at a share of the budget
+4. retrieved catalogue chunks, most relevant first, the last one trimmed to fit
+5. older turns that are not in the summary yet, newest first
+"""
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+DEFAULT_TOKEN_BUDGET = 2000
+DEFAULT_KEEP_TURNS = 6
+# Fraction of the budget the rolling summary may take
+SUMMARY_BUDGET_SHARE = 0.2
+# Conservative characters-per-token ratio for English text with Llama/Gemma-style tokenizers
+CHARS_PER_TOKEN = 3.5
+
+PROMPT_HEAD = (
+    "You are a sales agent for this business. "
+    "Given the following real-time sales conversation and relevant product or service catalogue context, "
+    "suggest the next talking points for the sales rep. "
+    "Prioritize addressing the latest customer message and use the context to inform your suggestions.\n\n"
+    "Product/Service Catalogue Context:\n"
+)
+PROMPT_CONVERSATION = "\n\nConversation so far:\n"
+PROMPT_TAIL = (
+    "\n\nWhat should the sales rep say next? Provide 3 simple, up to 5-6 word talking points "
+    "in response to the customer's latest message. Make sure to keep it short and concise."
+)
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text to roughly max_tokens, on a word boundary."""
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    return cut[:cut.rfind(" ")] if " " in cut else cut
+
+def format_turn(turn):
+    return f"{turn['role'].capitalize()}: {turn['content']}"
+
+def build_prompt(context_hits, turns, summary="", token_budget=DEFAULT_TOKEN_BUDGET,
+                 keep_turns=DEFAULT_KEEP_TURNS):
+    """
+    Assemble the prompt within token_budget.
+
+    context_hits are (document, relevance score) pairs, turns are the turns not
+    covered by summary, oldest first. Returns (prompt, stats).
+    """
+    remaining = token_budget - estimate_tokens(PROMPT_HEAD + PROMPT_CONVERSATION + PROMPT_TAIL)
+
+    # Where the verbatim window starts; slicing turns[-keep_turns:] would keep every turn for keep_turns=0
+    split = max(len(turns) - keep_turns, 0)
+    # Recent turns are kept verbatim; if even they overflow, the oldest go first
+    recent = [format_turn(turn) for turn in turns[split:]]
+    while len(recent) > 1 and sum(estimate_tokens(line) + 1 for line in recent) > remaining:
+        recent.pop(0)
+    if recent and estimate_tokens(recent[-1]) > remaining:
+        recent[-1] = truncate_to_tokens(recent[-1], max(remaining, 0))
+    remaining -= sum(estimate_tokens(line) + 1 for line in recent)
+
+    earlier = ""
+    if summary and remaining > 0:
+        summary_text = truncate_to_tokens(summary, min(remaining, int(token_budget * SUMMARY_BUDGET_SHARE)))
+        earlier = f"Earlier in the call:\n{summary_text}\n\n"
+        remaining -= estimate_tokens(earlier)
+
+    chunks = []
+    for document, _ in sorted(context_hits, key=lambda hit: hit[1], reverse=True):
+        cost = estimate_tokens(document) + 1
+        if cost <= remaining:
+            chunks.append(document)
+            remaining -= cost
+        elif remaining > 50:
+            # Room for a meaningful part of the next most relevant chunk
+            chunks.append(truncate_to_tokens(document, remaining - 1))
+            remaining = 0
+            break
+        else:
+            break
+
+    older = []
+    for turn in reversed(turns[:split]):
+        line = format_turn(turn)
+        if estimate_tokens(line) + 1 > remaining:
+            break
+        older.insert(0, line)
+        remaining -= estimate_tokens(line) + 1
+
+    prompt = (
+        PROMPT_HEAD
+        + "\n\n".join(chunks)
+        + PROMPT_CONVERSATION
+        + earlier
+        + "\n".join(older + recent)
+        + PROMPT_TAIL
+    )
+    stats = {
+        "prompt_tokens": estimate_tokens(prompt),
+        "context_chunks": len(chunks),
+        "dropped_chunks": len(context_hits) - len(chunks),
+        "turns": len(older) + len(recent),
+        "dropped_turns": len(turns) - len(older) - len(recent),
+        "summary_tokens": estimate_tokens(earlier),
+    }
+    return prompt, stats
+
+
+class PromptSizeTracker:
+    """Keeps recent prompt sizes to report percentiles."""
+
+    def __init__(self, window=1000):
+        self._estimated = deque(maxlen=window)
+        self._actual = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def record(self, estimated_tokens, actual_tokens=None):
+        with self._lock:
+            self._count += 1
+            self._estimated.append(estimated_tokens)
+            if actual_tokens is not None:
+                self._actual.append(actual_tokens)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self._count,
+                "estimated": _percentiles(self._estimated),
+                "actual": _percentiles(self._actual),
+            }
+
+
+def _percentiles(values):
+    if not values:
+        return {}
+    values = np.asarray(values)
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p99": float(np.percentile(values, 99)),
+        "max": int(values.max()),
+    }
@@ -0,0 +1,218 @@
+# src/components/on-call-coaching/retrieval.py
+"""
+Query construction and retrieval backends for the product catalogue.
+
+Backends share one interface, query(query_embedding, top_k), returning
+(document, score) pairs best first, where score is cosine similarity:
+
+- "chroma": the persistent Chroma collection
+- "numpy": exact dot-product search over the exported, memory-mapped matrix
+- "hnsw": approximate search with hnswlib (optional dependency) for large catalogues
+
+The numpy backend can read the vectors stored as float16 or int8 (with a
+float32 scale per row) instead of float32, halving or quartering its memory.
+"""
+import json
+import os
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+BACKENDS = ("chroma", "numpy", "hnsw")
+# Files written next to the Chroma store by build-index for the in-process backends
+EMBEDDINGS_FILE = "embeddings.npy"
+DOCUMENTS_FILE = "documents.json"
+HNSW_FILE = "hnsw.bin"
+VECTOR_DTYPES = ("float32", "float16", "int8")
+# Stored vectors per dtype; int8 rows are scaled by INT8_SCALES_FILE
+VECTOR_FILES = {
+    "float32": EMBEDDINGS_FILE,
+    "float16": "embeddings.float16.npy",
+    "int8": "embeddings.int8.npy",
+}
+INT8_SCALES_FILE = "embeddings.int8.scales.npy"
+# Rows converted to float32 at a time when scoring float16 or int8 vectors
+SCORE_BLOCK_ROWS = 8192
+
+# Each step back in the conversation multiplies a turn's weight by this factor
+DEFAULT_DECAY = 0.7
+# Extra weight on the latest turn, on top of the decay schedule
+DEFAULT_LATEST_WEIGHT = 3.0
+
+
+def weighted_query_embedding(turn_embeddings, decay=DEFAULT_DECAY, latest_weight=DEFAULT_LATEST_WEIGHT):
+    """
+    Combine per-turn embeddings (oldest first) into one unit-length query vector.
+
+    Turns are weighted by exponential decay from the latest turn, and the latest
+    turn gets latest_weight times its decayed weight.
+    """
+    matrix = np.asarray(turn_embeddings, dtype=np.float32)
+    weights = decay ** np.arange(len(matrix) - 1, -1, -1, dtype=np.float32)
+    weights[-1] *= latest_weight
+    query = weights @ matrix / weights.sum()
+    norm = np.linalg.norm(query)
+    return query / norm if norm > 0 else query
+
+def quantize_vectors(matrix, dtype):
+    """Convert a normalized float32 matrix to a stored dtype. Returns (matrix, per-row scales or None)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if dtype == "float32":
+        return matrix, None
+    if dtype == "float16":
+        return matrix.astype(np.float16), None
+    if dtype == "int8":
+        # Symmetric per-row scaling keeps each row's largest component at +-127
+        scales = np.abs(matrix).max(axis=1) / 127 if len(matrix) else np.zeros(0, np.float32)
+        scales = np.where(scales > 0, scales, 1).astype(np.float32)
+        return np.round(matrix / scales[:, None]).astype(np.int8), scales
+    raise ValueError(f"Unknown vector dtype {dtype!r}, expected one of {', '.join(VECTOR_DTYPES)}")
+
+
+class ChromaRetriever:
+    """Queries a Chroma collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def query(self, query_embedding, top_k=3):
+        results = self.collection.query(
+            query_embeddings=[np.asarray(query_embedding, dtype=np.float32).tolist()],
+            n_results=top_k
+        )
+        # Chroma reports squared L2 distance; for unit vectors cosine = 1 - d / 2
+        return [(document, 1.0 - distance / 2)
+                for document, distance in zip(results['documents'][0], results['distances'][0])]
+
+
+class NumpyRetriever:
+    """Exact top-k by dot product over a normalized float32, float16 or scaled int8 matrix."""
+
+    def __init__(self, matrix, documents, scales=None):
+        self.matrix = matrix
+        self.documents = documents
+        self.scales = scales
+
+    @classmethod
+    def load(cls, index_dir, dtype="float32"):
+        path = os.path.join(index_dir, VECTOR_FILES[dtype])
+        scales = None
+        if os.path.exists(path):
+            # Memory-mapped, so forked workers share the page cache instead of copying vectors
+            matrix = np.load(path, mmap_mode='r')
+            if dtype == "int8":
+                scales = np.load(os.path.join(index_dir, INT8_SCALES_FILE))
+        else:
+            # Exported before this dtype was written; convert in memory
+            matrix, scales = quantize_vectors(np.load(os.path.join(index_dir, EMBEDDINGS_FILE)), dtype)
+        with open(os.path.join(index_dir, DOCUMENTS_FILE), 'r', encoding='utf-8') as f:
+            documents = json.load(f)
+        return cls(matrix, documents, scales)
+
+    @property
+    def nbytes(self):
+        return self.matrix.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def scores(self, query_embedding):
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if self.matrix.dtype == np.float32:
+            return self.matrix @ query
+        # No BLAS kernels for float16/int8; convert a block at a time to bound the temporary copy
+        scores = np.empty(len(self.matrix), dtype=np.float32)
+        for start in range(0, len(self.matrix), SCORE_BLOCK_ROWS):
+            block = self.matrix[start:start + SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def query(self, query_embedding, top_k=3):
+        if not self.documents:
+            return []
+        scores = self.scores(query_embedding)
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.documents[i], float(scores[i])) for i in top]
+
+
+class HnswRetriever:
+    """Approximate top-k with an hnswlib inner-product index."""
+
+    def __init__(self, index, documents):
+        self.index = index
+        self.documents = documents
+
+    @classmethod
+    def build(cls, matrix, documents, ef_construction=200, m=16):
+        if hnswlib is None:
+            raise RuntimeError("The hnsw retriever backend requires hnswlib (pip install hnswlib)")
+        index = hnswlib.Index(space='ip', dim=matrix.shape[1])
+        index.init_index(max_elements=max(len(matrix), 1), ef_construction=ef_construction, M=m)
+        if len(matrix):
+            index.add_items(np.asarray(matrix), np.arange(len(matrix)))
+        return cls(index, documents)
+
+    @classmethod
+    def load(cls, index_dir):
+        numpy_index = NumpyRetriever.load(index_dir)
+        path = os.path.join(index_dir, HNSW_FILE)
+        if hnswlib is None or not os.path.exists(path):
+            return cls.build(numpy_index.matrix, numpy_index.documents)
+        index = hnswlib.Index(space='ip', dim=numpy_index.matrix.shape[1])
+        index.load_index(path, max_elements=len(numpy_index.documents))
+        return cls(index, numpy_index.documents)
+
+    def query(self, query_embedding, top_k=3):
+        if not self.documents:
+            return []
+        k = min(top_k, len(self.documents))
+        self.index.set_ef(max(50, 2 * k))
+        labels, distances = self.index.knn_query(np.asarray(query_embedding, dtype=np.float32), k=k)
+        # hnswlib's inner-product distance is 1 - dot product
+        return [(self.documents[i], 1.0 - float(d)) for i, d in zip(labels[0], distances[0])]
+
+
+def _save_array(path, array):
+    with open(path + ".tmp", 'wb') as f:
+        np.save(f, array)
+    os.replace(path + ".tmp", path)
+
+def export_vectors(collection, index_dir):
+    """Write the collection's vectors and documents for the in-process backends."""
+    records = collection.get(include=["embeddings", "documents"])
+    matrix = np.asarray(records["embeddings"], dtype=np.float32).reshape(len(records["ids"]), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms > 0, norms, 1)
+
+    for dtype, filename in VECTOR_FILES.items():
+        stored, scales = quantize_vectors(matrix, dtype)
+        _save_array(os.path.join(index_dir, filename), stored)
+        if scales is not None:
+            _save_array(os.path.join(index_dir, INT8_SCALES_FILE), scales)
+
+    documents_path = os.path.join(index_dir, DOCUMENTS_FILE)
+    with open(documents_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(records["documents"], f, ensure_ascii=False)
+    os.replace(documents_path + ".tmp", documents_path)
+
+    if hnswlib is not None and len(matrix):
+        hnsw_path = os.path.join(index_dir, HNSW_FILE)
+        HnswRetriever.build(matrix, records["documents"]).index.save_index(hnsw_path + ".tmp")
+        os.replace(hnsw_path + ".tmp", hnsw_path)
+
+def open_retriever(backend, index_dir, collection=None, vector_dtype="float32"):
+    """Create the retriever for a backend name from BACKENDS."""
+    if vector_dtype != "float32" and backend != "numpy":
+        raise ValueError(f"Vector dtype {vector_dtype} is only supported by the numpy retriever backend")
+    if backend == "chroma":
+        return ChromaRetriever(collection)
+    if backend == "numpy":
+        return NumpyRetriever.load(index_dir, dtype=vector_dtype)
+    if backend == "hnsw":
+        return HnswRetriever.load(index_dir)
+    raise ValueError(f"Unknown retriever backend {backend!r}, expected one of {', '.join(BACKENDS)}")
@@ -1,13 +1,11 @@
 # src/components/on-call-coaching/script.py
-from flask import Flask, request, Response, jsonify
+from flask import Flask, request, Response, jsonify, stream_with_context
+import hmac
 import json
-import PyPDF2
-import chromadb
-from sentence_transformers import SentenceTransformer
-from chromadb.utils import embedding_functions
-from groq import Groq
-from twilio.rest import Client
-import instructor
+import threading
+import time
+import uuid
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from pydantic import BaseModel
 from typing import List
 from datetime import datetime
@@ -15,6 +13,25 @@ from flask_cors import CORS
 from dotenv import load_dotenv
 import os
 from urllib.parse import quote
+from sessions import SessionStore
+from worker import UtteranceWorker
+from catalogue import CATALOGUE_EXTENSIONS, DEFAULT_CATALOGUE_NAME, chunk_id, is_valid_catalogue_name
+from catalogue_registry import DEFAULT_POLL_SECONDS, CatalogueRegistry
+from llm_cache import DEFAULT_KEY_TURNS, DEFAULT_MAX_ENTRIES, DEFAULT_TTL_SECONDS, TalkingPointCache, context_key, exact_key
+from streaming import DEFAULT_SERVER_THREADS, TalkingPointBroker
+from prompt import DEFAULT_KEEP_TURNS, DEFAULT_TOKEN_BUDGET, PromptSizeTracker, build_prompt, format_turn
+from summarizer import RollingSummarizer
+from metrics import StageMetrics, render_gauges
+from profiler import DEFAULT_INTERVAL_SECONDS, MAX_INTERVAL_SECONDS, MIN_INTERVAL_SECONDS, SamplingProfiler
+from speculation import DEFAULT_SIMILARITY_THRESHOLD, DEFAULT_STABILITY_THRESHOLD, SpeculationTracker
+from retrieval import DEFAULT_DECAY, DEFAULT_LATEST_WEIGHT, weighted_query_embedding
+from warmup import Warmup
+from embedding import load_encoder
+from batching import DEFAULT_MAX_BATCH, DEFAULT_WINDOW_SECONDS, MicroBatcher
+from llm_client import DEFAULT_MAX_CONCURRENCY, LLMPool
+from logs import log
+from twiml import NO_CUSTOMER_NUMBER, StreamTemplate, dial_status_response
+from twilio_control import DEFAULT_API_BASE_URL, DEFAULT_CALLS_PER_SECOND, DEFAULT_MAX_CONNECTIONS, TwilioControl
 
 load_dotenv() 
 
@@ -35,19 +52,83 @@ TWILIO_NUMBER = os.getenv("TWILIO_NUMBER")
 if not all([TWILIO_SID, TWILIO_AUTH_TOKEN, TWILIO_NUMBER]):
     raise ValueError("Twilio credentials are not set in the .env file")
 
-twilio_client = Client(TWILIO_SID, TWILIO_AUTH_TOKEN)
+# Public URL Twilio uses to reach this server's webhooks
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "https://shiny-journey-4px597q46ph5794-5001.app.github.dev").rstrip("/")
+# /stream TwiML, with everything but the per-call values escaped once
+stream_template = StreamTemplate(PUBLIC_BASE_URL, TWILIO_NUMBER)
+
+# Calls REST API over pooled keep-alive connections; dials are paced to the account's CPS limit.
+# TWILIO_API_BASE_URL points it at a local mock (mock_twilio.py) for testing.
+twilio_control = TwilioControl(
+    TWILIO_SID, TWILIO_AUTH_TOKEN,
+    base_url=os.getenv("TWILIO_API_BASE_URL", DEFAULT_API_BASE_URL),
+    calls_per_second=float(os.getenv("TWILIO_CPS", str(DEFAULT_CALLS_PER_SECOND))),
+    max_connections=int(os.getenv("TWILIO_MAX_CONNECTIONS", str(DEFAULT_MAX_CONNECTIONS))),
+    # Shared by every worker process on the host and kept across restarts; empty keeps keys per process
+    idempotency_db=os.getenv("TWILIO_IDEMPOTENCY_DB", ".twilio_idempotency.sqlite3") or None,
+)
+# Calls accepted per /make_calls request
+MAX_BATCH_CALLS = int(os.getenv("MAX_BATCH_CALLS", "500"))
+# How long /make_call holds its request thread waiting for the dial's turn under the CPS limit
+MAKE_CALL_TIMEOUT_SECONDS = float(os.getenv("MAKE_CALL_TIMEOUT_SECONDS", "10"))
+
+# The Groq and model libraries are slow to import, so they are loaded on first use
 
 # === Product Catalogue Embedding and Retrieval Logic ===
-# Load SBERT for embedding
-sbert = SentenceTransformer('all-MiniLM-L6-v2')
-
-# Initialize ChromaDB
-chroma_client = chromadb.Client()
-collection = chroma_client.get_or_create_collection(name="product_catalogue")
-
-# Initialize Groq client with instructor
-groq_client = Groq()
-groq_client = instructor.from_groq(groq_client)
+# SBERT for embedding, loaded by warm-up (or before forking under gunicorn)
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+# "torch", or "onnx" / "onnx-int8" to run the ONNX export without loading torch
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Intra-op threads for the embedding runtime; unset uses the runtime default (all cores)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0")) or None
+# Local directory with tokenizer.json and the .onnx file, instead of downloading them
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR")
+sbert = None
+
+def load_embedding_model():
+    global sbert
+    if sbert is None:
+        log.info("loading_embedding_model", model=EMBEDDING_MODEL_NAME, backend=EMBEDDING_BACKEND)
+        sbert = load_encoder(EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, threads=EMBEDDING_THREADS,
+                             model_dir=EMBEDDING_ONNX_DIR)
+    return sbert
+
+# Latency histograms per pipeline stage, exported at /metrics
+metrics = StageMetrics()
+
+# When instructor received the raw LLM response on this thread, to split LLM time from parsing
+_llm_timing = threading.local()
+
+def _record_llm_response(*args, **kwargs):
+    _llm_timing.response_at = time.perf_counter()
+
+# Groq client with instructor
+groq_client = None
+
+def get_groq_client():
+    global groq_client
+    if groq_client is None:
+        import instructor
+        from groq import Groq
+        # Retries are handled by the pool below, so the SDK's own are turned off
+        client = instructor.from_groq(Groq(max_retries=0))
+        client.on("completion:response", _record_llm_response)
+        groq_client = client
+    return groq_client
+
+# Every LLM request from every call shares one concurrency cap, rate limit and retry policy
+llm = LLMPool(
+    get_groq_client,
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", str(DEFAULT_MAX_CONCURRENCY))),
+    # Unset means no client-side limit; set it to the account's requests-per-minute quota
+    requests_per_minute=float(os.environ["LLM_REQUESTS_PER_MINUTE"]) if os.getenv("LLM_REQUESTS_PER_MINUTE") else None,
+)
+
+# Sampling profiler, controllable at runtime via /profiler/* when enabled
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+profiler = SamplingProfiler()
+
+LLM_MODEL = "gemma2-9b-it"
 
 # Pydantic model for structured talking points
 class TalkingPoints(BaseModel):
@@ -55,107 +136,303 @@ class TalkingPoints(BaseModel):
     reasoning: str
     timestamp: datetime = None
 
-# Path to the product catalogue (static for now)
-PRODUCT_CATALOGUE_PATH = "UCS Product Guide 2025.pdf"  # Change as needed
-
-# Conversation history (global, for demo; in production, use per-session)
-conversation = []
-
-# Global variable to store latest talking points
-latest_talking_points = None
-
-# --- Utility Functions from main.py ---
-def read_file(filepath):
-    if filepath.endswith('.pdf'):
-        return read_pdf(filepath)
-    else:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return f.read()
-
-def read_pdf(path):
-    text = ""
-    with open(path, 'rb') as f:
-        reader = PyPDF2.PdfReader(f)
-        for page in reader.pages:
-            text += page.extract_text()
-    return text
-
-def chunk_text(text, chunk_size=500):
-    words = text.split()
-    return [' '.join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
-
-def embed_and_store(chunks):
-    for i, chunk in enumerate(chunks):
-        embedding = sbert.encode(chunk).tolist()
-        collection.add(
-            documents=[chunk],
-            embeddings=[embedding],
-            ids=[f"chunk_{i}"]
-        )
-
-def retrieve_context(conversation, top_k=3):
-    all_messages = " ".join([msg['content'] for msg in conversation])
+# Pydantic model for the rolling summary of older conversation turns
+class ConversationSummary(BaseModel):
+    summary: str
+
+# Path to the default product catalogue, used by calls that do not pick one
+PRODUCT_CATALOGUE_PATH = os.getenv("PRODUCT_CATALOGUE_PATH", "UCS Product Guide 2025.pdf")
+# Per-client catalogues, one file per catalogue named by its stem ("acme.pdf" is "acme").
+# The directory is watched, so catalogues can be added, replaced or deleted at runtime.
+CATALOGUE_DIR = os.getenv("CATALOGUE_DIR")
+CATALOGUE_POLL_SECONDS = float(os.getenv("CATALOGUE_POLL_SECONDS", str(DEFAULT_POLL_SECONDS)))
+# Persistent vector indexes, one per catalogue, built with `python catalogue.py build-index`
+CATALOGUE_INDEX_DIR = os.getenv("CATALOGUE_INDEX_DIR", ".catalogue_index")
+# Bearer token for the /catalogues admin endpoints, which are disabled when unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# Retrieval backend: "chroma", "numpy" (exact, memory-mapped) or "hnsw" (approximate)
+RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", "chroma")
+# Stored vector precision for the numpy backend: "float32", "float16" or "int8"
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")
+# Weighting of conversation turns in the retrieval query
+QUERY_DECAY = float(os.getenv("QUERY_DECAY", str(DEFAULT_DECAY)))
+QUERY_LATEST_WEIGHT = float(os.getenv("QUERY_LATEST_WEIGHT", str(DEFAULT_LATEST_WEIGHT)))
+
+# Hard token budget for the talking point prompt, and turns always kept verbatim
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", str(DEFAULT_TOKEN_BUDGET)))
+PROMPT_KEEP_TURNS = int(os.getenv("PROMPT_KEEP_TURNS", str(DEFAULT_KEEP_TURNS)))
+SUMMARY_MAX_WORDS = 120
+
+# Speculative generation from stable partial customer transcripts (opt-in)
+SPECULATION_ENABLED = os.getenv("SPECULATION_ENABLED", "false").lower() == "true"
+
+# Per-call conversation history and talking points, keyed by Twilio CallSid
+sessions = SessionStore()
+
+# Talking points are cached per tenant, since generation runs at temperature 0
+LLM_CACHE_TURNS = int(os.getenv("LLM_CACHE_TURNS", str(DEFAULT_KEY_TURNS)))
+llm_cache = TalkingPointCache(
+    max_entries=int(os.getenv("LLM_CACHE_SIZE", str(DEFAULT_MAX_ENTRIES))),
+    ttl_seconds=float(os.getenv("LLM_CACHE_TTL", str(DEFAULT_TTL_SECONDS))),
+    # Unset disables the semantic tier, e.g. 0.95 reuses near-identical latest utterances
+    semantic_threshold=float(os.environ["LLM_CACHE_SEMANTIC_THRESHOLD"]) if os.getenv("LLM_CACHE_SEMANTIC_THRESHOLD") else None,
+)
+
+# Pushes talking points to dashboard subscribers over Server-Sent Events. Each open stream holds
+# a request thread, so streams are capped below GUNICORN_THREADS to leave threads for the Twilio
+# webhooks; idle stream threads are cheap, so the default thread count serves a few hundred
+# dashboards and GUNICORN_THREADS is raised to serve more.
+STREAM_RESERVED_THREADS = int(os.getenv("STREAM_RESERVED_THREADS", "8"))
+STREAM_MAX_SUBSCRIBERS = int(os.getenv(
+    "STREAM_MAX_SUBSCRIBERS", str(max(1, int(os.getenv("GUNICORN_THREADS", str(DEFAULT_SERVER_THREADS))) - STREAM_RESERVED_THREADS))
+))
+# Seconds a refused dashboard is told to wait before trying to stream again
+STREAM_RETRY_AFTER_SECONDS = 30
+broker = TalkingPointBroker(max_streams=STREAM_MAX_SUBSCRIBERS)
+
+# Tokens per talking point request, for tracking prompt size percentiles
+prompt_sizes = PromptSizeTracker()
+
+speculation = SpeculationTracker(
+    stability_threshold=float(os.getenv("SPECULATION_STABILITY", str(DEFAULT_STABILITY_THRESHOLD))),
+    similarity_threshold=float(os.getenv("SPECULATION_SIMILARITY", str(DEFAULT_SIMILARITY_THRESHOLD))),
+)
+
+# Encodes from concurrent calls that arrive within the window run as one batched encode
+encode_batcher = MicroBatcher(
+    lambda texts: sbert.encode(texts, batch_size=len(texts), convert_to_numpy=True, normalize_embeddings=True),
+    window_seconds=float(os.getenv("ENCODE_BATCH_WINDOW_MS", str(DEFAULT_WINDOW_SECONDS * 1000))) / 1000,
+    max_batch=int(os.getenv("ENCODE_MAX_BATCH", str(DEFAULT_MAX_BATCH))),
+)
+
+def encode_turns(texts):
+    # Includes the time spent waiting for the batch window
+    with metrics.span("query_encode"):
+        return encode_batcher.encode(texts)
+
+def retrieve_context(session, top_k=3, pending_turn=None):
+    # Each turn is encoded once and cached on the session, so a new utterance costs one encode
+    conversation, turn_embeddings = session.turn_embeddings(encode_turns)
+    if pending_turn is not None:
+        # A speculative turn that is not part of the session yet
+        conversation = conversation + [pending_turn]
+        turn_embeddings = list(turn_embeddings) + [encode_turns([pending_turn['content']])[0]]
     if not conversation:
         return []
-    latest_message = conversation[-1]['content']
-    weighted_query = all_messages + " " + (latest_message + " ") * 3
-    query_embedding = sbert.encode(weighted_query.strip()).tolist()
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=top_k
+    query_embedding = weighted_query_embedding(
+        turn_embeddings, decay=QUERY_DECAY, latest_weight=QUERY_LATEST_WEIGHT
     )
-    return results['documents'][0]
+    retriever = catalogues.get(session.tenant)
+    if retriever is None:
+        log.warning("catalogue_not_loaded", catalogue=session.tenant, call_sid=session.call_sid)
+        return []
+    # (document, relevance score) pairs, most relevant first
+    with metrics.span("vector_query"):
+        return retriever.query(query_embedding, top_k=top_k)
 
-def generate_talking_points(context_chunks, conversation):
-    prompt = (
-        "You are a sales agent for this business. "
-        "Given the following real-time sales conversation and relevant product or service catalogue context, "
-        "suggest the next talking points for the sales rep. "
-        "Prioritize addressing the latest customer message and use the context to inform your suggestions.\n\n"
-        "Product/Service Catalogue Context:\n"
-        + "\n\n".join(context_chunks) +
-        "\n\nConversation so far:\n"
-        + "\n".join([f"{msg['role'].capitalize()}: {msg['content']}" for msg in conversation]) +
-        "\n\nWhat should the sales rep say next? Provide 3 simple, up to 5-6 word talking points in response to the customer's latest message. Make sure to keep it short and concise."
-    )
+FALLBACK_REASONING = "Fallback response due to error in structured generation"
+
+def talking_points_payload(talking_points):
+    return {
+        "points": talking_points.points,
+        "reasoning": talking_points.reasoning,
+        "timestamp": getattr(talking_points, 'timestamp', None)
+    }
+
+def publish_talking_points(session, talking_points):
+    """Store a call's latest talking points and push them to its subscribers."""
+    session.talking_points = talking_points
+    broker.publish(session.call_sid, "talking_points", talking_points_payload(talking_points))
+
+def generate_talking_points(context_hits, conversation, summary="", on_partial=None):
+    """
+    Ask the LLM for talking points. If on_partial is given, the response is
+    streamed and on_partial(points) is called whenever the partial points change.
+    """
+    with metrics.span("prompt_build"):
+        prompt, prompt_stats = build_prompt(
+            context_hits, conversation, summary,
+            token_budget=PROMPT_TOKEN_BUDGET, keep_turns=PROMPT_KEEP_TURNS,
+        )
+    actual_tokens = None
     
     try:
-        # Get structured response using instructor
-        talking_points = groq_client.chat.completions.create(
-            model="gemma2-9b-it",
+        completion_args = dict(
+            model=LLM_MODEL,
             messages=[{"role": "user", "content": prompt}],
             response_model=TalkingPoints,
             temperature=0,
             max_tokens=512,
             top_p=1,
         )
+        llm_start = time.perf_counter()
+        if on_partial is None:
+            # Get structured response using instructor
+            _llm_timing.response_at = None
+            talking_points = llm.create(**completion_args)
+            llm_end = time.perf_counter()
+            response_at = _llm_timing.response_at or llm_end
+            metrics.observe("llm", response_at - llm_start)
+            metrics.observe("parse", llm_end - response_at)
+            usage = getattr(getattr(talking_points, '_raw_response', None), 'usage', None)
+            actual_tokens = getattr(usage, 'prompt_tokens', None)
+        else:
+            # Stream partially parsed talking points as the tokens arrive
+            partial = None
+            streamed = []
+            for partial in llm.create_partial(**completion_args):
+                points = [point for point in (partial.points or []) if point]
+                if points != streamed:
+                    streamed = points
+                    on_partial(points)
+            talking_points = TalkingPoints(
+                points=(partial.points or []) if partial else [],
+                reasoning=(partial.reasoning or "") if partial else "",
+            )
+            # Parsing is interleaved with streaming, so it is included in the LLM stage
+            metrics.observe("llm", time.perf_counter() - llm_start)
         
-        print(f"\n--- Suggested Talking Points for Sales Rep ---")
-        print(f"Points: {', '.join(talking_points.points)}")
-        print(f"Reasoning: {talking_points.reasoning}")
+        prompt_sizes.record(prompt_stats["prompt_tokens"], actual_tokens)
+        log.info("talking_points", points=talking_points.points, reasoning=talking_points.reasoning,
+                 prompt_tokens=prompt_stats["prompt_tokens"], reported_tokens=actual_tokens,
+                 context_chunks=prompt_stats["context_chunks"], turns=prompt_stats["turns"])
         
-        # Store the result in the global variable and add a timestamp
-        global latest_talking_points
         talking_points.timestamp = datetime.now()
-        latest_talking_points = talking_points
-        
         return talking_points
         
     except Exception as e:
-        print(f"Error generating talking points: {e}")
+        prompt_sizes.record(prompt_stats["prompt_tokens"])
+        log.error("talking_points_failed", error=str(e))
         # Fallback to simple response
         return TalkingPoints(
             points=["Focus on customer needs", "Highlight key benefits", "Ask qualifying questions"],
-            reasoning="Fallback response due to error in structured generation",
+            reasoning=FALLBACK_REASONING,
             timestamp=datetime.now()
         )
 
-# --- On Startup: Load and Embed Product Catalogue ---
-print("[Startup] Reading product catalogue...")
-full_text = read_file(PRODUCT_CATALOGUE_PATH)
-chunks = chunk_text(full_text)
-print("[Startup] Embedding and storing product catalogue in vector DB...")
-embed_and_store(chunks)
+def cached_talking_points(session, context_hits, conversation, summary="", latest_embedding=None, on_partial=None):
+    """generate_talking_points behind the per-tenant response cache."""
+    chunk_ids = [chunk_id(document) for document, _ in context_hits]
+    key = exact_key(session.tenant, LLM_MODEL, chunk_ids, conversation, LLM_CACHE_TURNS)
+    context_hash = context_key(LLM_MODEL, chunk_ids)
+    cached = llm_cache.get(session.tenant, key, context_hash, latest_embedding)
+    if cached is not None:
+        return cached.model_copy(update={"timestamp": datetime.now()})
+
+    talking_points = generate_talking_points(context_hits, conversation, summary, on_partial=on_partial)
+    if talking_points.reasoning != FALLBACK_REASONING:
+        llm_cache.put(session.tenant, key, talking_points, context_hash, latest_embedding)
+    return talking_points
+
+def summarize_turns(previous_summary, turns):
+    """Fold turns into the running call summary with a short LLM call."""
+    prompt = (
+        "Update the running summary of a sales call with the new lines below. "
+        "Keep the customer's needs, objections, and any figures or commitments. "
+        f"Use at most {SUMMARY_MAX_WORDS} words.\n\n"
+        f"Current summary:\n{previous_summary or '(none)'}\n\n"
+        "New lines:\n" + "\n".join(format_turn(turn) for turn in turns)
+    )
+    result = llm.create(
+        model=LLM_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        response_model=ConversationSummary,
+        temperature=0,
+        max_tokens=256,
+    )
+    return result.summary
+
+# Turns older than the verbatim window are summarized off the hot path
+summarizer = RollingSummarizer(summarize_turns, keep_turns=PROMPT_KEEP_TURNS)
+
+def process_utterance(call_sid, item):
+    """Background job: refresh a call's talking points after a final or speculative utterance."""
+    kind, payload, track = item
+    # Utterances that arrive while the server is still warming up wait for it
+    if not warmup.wait(WARMUP_WAIT_SECONDS):
+        log.warning("talking_points_skipped", reason="not_ready", warmup=warmup.state, call_sid=call_sid)
+        return
+    with metrics.labels(call_sid, track):
+        _process_utterance(call_sid, kind, payload, track)
+
+def _process_utterance(call_sid, kind, payload, track):
+    session = sessions.get(call_sid)
+    if session is None:
+        return
+    if kind == "speculative":
+        if not speculation.mark_running(payload):
+            return
+        pending_turn = {"role": "customer", "content": payload.text}
+        try:
+            summary, conversation = session.prompt_state()
+            context = retrieve_context(session, top_k=3, pending_turn=pending_turn)
+            talking_points = cached_talking_points(session, context, conversation + [pending_turn], summary)
+        except Exception:
+            if speculation.fail(session, payload):
+                # The final adopted this run, so nothing else would refresh the call's talking points
+                submit_utterance(call_sid, "final", payload.text, track)
+            raise
+        if speculation.complete(session, payload, talking_points):
+            publish_talking_points(session, talking_points)
+            log.info("speculative_talking_points_adopted", call_sid=call_sid)
+        return
+
+    # Retrieve relevant context
+    context = retrieve_context(session, top_k=3)
+    # The turn embeddings are cached by retrieve_context, so this does not encode again
+    _, turn_embeddings = session.turn_embeddings(encode_turns)
+    summary, conversation = session.prompt_state()
+    # Generate talking points, streaming partial points to subscribers as they arrive
+    talking_points = cached_talking_points(
+        session, context, conversation, summary,
+        latest_embedding=turn_embeddings[-1] if turn_embeddings else None,
+        on_partial=lambda points: broker.publish(call_sid, "partial", {"points": points}),
+    )
+    publish_talking_points(session, talking_points)
+    log.info("talking_points_stored", call_sid=call_sid)
+
+# Final utterances are processed off the webhook path; bursts per call are coalesced
+utterance_worker = UtteranceWorker(
+    process_utterance,
+    # Mostly waiting on the LLM, so well above the core count; LLM_MAX_CONCURRENCY caps requests
+    max_workers=int(os.getenv("TALKING_POINT_WORKERS", "16")),
+    max_pending=int(os.getenv("TALKING_POINT_MAX_PENDING", "256")),
+)
+
+def submit_utterance(call_sid, kind, payload, track):
+    """Queue background work; finals and speculations wait in separate slots so neither replaces the other."""
+    return utterance_worker.submit(call_sid, (kind, payload, track), slot=kind)
+
+# --- On Startup: Load the Model and Open the Product Catalogue Indexes in the Background ---
+# Retrievers per catalogue, swapped atomically when a catalogue is reloaded
+catalogues = CatalogueRegistry(CATALOGUE_INDEX_DIR, EMBEDDING_MODEL_NAME, RETRIEVER_BACKEND, load_embedding_model,
+                               vector_dtype=VECTOR_DTYPE)
+# How long a background job waits for warm-up before giving up on an utterance
+WARMUP_WAIT_SECONDS = float(os.getenv("WARMUP_WAIT_SECONDS", "60"))
+
+def sync_catalogues():
+    """Load the default catalogue and those in CATALOGUE_DIR, building missing or stale indexes."""
+    if os.path.exists(PRODUCT_CATALOGUE_PATH):
+        catalogues.load(DEFAULT_CATALOGUE_NAME, PRODUCT_CATALOGUE_PATH)
+    if CATALOGUE_DIR:
+        log.info("catalogues_synced", **catalogues.sync(CATALOGUE_DIR, keep=(DEFAULT_CATALOGUE_NAME,)))
+
+def warm_up():
+    model = load_embedding_model()
+    log.info("opening_catalogue_indexes")
+    # Deployments build the indexes ahead of time, so this normally only opens them
+    sync_catalogues()
+    if CATALOGUE_DIR:
+        catalogues.watch(CATALOGUE_DIR, interval=CATALOGUE_POLL_SECONDS, keep=(DEFAULT_CATALOGUE_NAME,))
+    if not catalogues.names():
+        raise RuntimeError(f"No catalogues found at {PRODUCT_CATALOGUE_PATH} or in CATALOGUE_DIR")
+    # The first encode is much slower than the rest; pay for it before the first call
+    model.encode(["warm up"], convert_to_numpy=True, normalize_embeddings=True)
+    get_groq_client()
+    log.info("ready", catalogues=catalogues.names(), retriever=RETRIEVER_BACKEND)
+
+# Started by __main__ below, or by gunicorn.conf.py in each worker
+warmup = Warmup(warm_up)
 
 @app.route("/end_call", methods=["POST"])
 def end_call():
@@ -168,7 +445,7 @@ def end_call():
             return {"error": "Missing call_sid"}, 400
             
         # End the call using Twilio
-        call = twilio_client.calls(call_sid).update(status='completed')
+        twilio_control.end_call(call_sid)
         
         return {
             "success": True,
@@ -184,162 +461,199 @@ def home():
         "message": "Sales Coaching API is running!",
         "endpoints": {
             "GET /": "This home page",
-            "GET /talking_points": "Get latest talking points",
-            "POST /make_call": "Initiate a sales call",
+            "GET /healthz": "Liveness check",
+            "GET /readyz": "Readiness check, 503 until the model and catalogue are loaded",
+            "GET /talking_points?call_sid=": "Get latest talking points for a call",
+            "GET /talking_points/stream?call_sid=": "Server-Sent Events stream of talking points for a call",
+            "POST /make_call": "Initiate a sales call, optionally with a \"catalogue\" name",
+            "POST /make_calls": "Dial a batch of calls at the account's CPS limit",
+            "GET /make_calls/<batch_id>": "Progress of a /make_calls batch",
+            "GET /catalogues": "Loaded product catalogues",
             "POST /stream": "Twilio stream endpoint",
             "POST /transcription": "Twilio transcription webhook",
-            "POST /call_status": "Twilio call status webhook"
+            "POST /call_status": "Twilio call status webhook",
+            "GET /queue_stats": "Talking point queue metrics",
+            "GET /metrics": "Prometheus metrics",
+            "PUT /log_level": "Change the log level at runtime (admin)"
         }
     }, 200
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}, 200
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    """Readiness: the embedding model and catalogue index are loaded."""
+    return {"ready": warmup.ready, "warmup": warmup.stats()}, 200 if warmup.ready else 503
+
 @app.route("/stream", methods=["POST"])
 def stream_twiml():
     """Twilio will hit this endpoint with POST to start the call."""
     
     # Get customer_number from query parameters (not POST values)
     customer_number = request.args.get("customer_number")
-    
-    # Debug print
-    print(f"🔍 Stream endpoint called with customer_number: {customer_number}")
-    print(f"📋 Request args: {dict(request.args)}")
-    print(f"📋 Request values: {dict(request.values)}")
-    
-    # Use your public Codespace URL
-    callback_url = "https://shiny-journey-4px597q46ph5794-5001.app.github.dev/transcription"
-    base_url = "https://shiny-journey-4px597q46ph5794-5001.app.github.dev"
+    catalogue = request.args.get("catalogue")
+    log.debug("stream_requested", customer_number=customer_number, catalogue=catalogue)
 
     if customer_number:
         # This is the leg where we connect to the customer
-        twiml = f"""<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-    <Start>
-        <Transcription statusCallbackUrl="{callback_url}" partialResults="true" track="both_tracks"/>
-    </Start>
-    <Say>Connecting you to the customer now. Please wait.</Say>
-    <Dial callerId="{TWILIO_NUMBER}" timeout="30" action="{base_url}/dial_status" method="POST">
-        <Number>{customer_number}</Number>
-    </Dial>
-</Response>"""
+        twiml = stream_template.render(customer_number, catalogue if is_valid_catalogue_name(catalogue) else None)
     else:
         # No customer number provided
-        twiml = """<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-    <Say>Error: No customer number provided. Please check the configuration.</Say>
-    <Hangup/>
-</Response>"""
+        log.warning("stream_missing_customer_number")
+        twiml = NO_CUSTOMER_NUMBER
 
-    print(f"📞 Generated TwiML: {twiml}")
     return Response(twiml, mimetype="text/xml")
 
 @app.route("/dial_status", methods=["POST"])
 def dial_status():
-    """
-    Handle the result of the dial attempt.
-    This is the UPDATED and CORRECTED function.
-    """
+    """Handle the result of the dial attempt; the responses are prebuilt in twiml.py."""
     dial_call_status = request.form.get("DialCallStatus")
-    
-    # Enhanced logging to see all data from Twilio
-    print(f"📞 Dial Status Callback Received. Status: {dial_call_status}")
-    print(f"📋 Full Form Data from Twilio: {dict(request.form)}")
-
-    # The 'failed' status is the one we need to diagnose
-    if dial_call_status == "failed":
-        error_code = request.form.get("ErrorCode")
-        print(f"❌ Dial failed with ErrorCode: {error_code}")
-
-        # Create a user-friendly message based on common Twilio error codes
-        error_message = "The call to the customer failed. "
-        if error_code == '21211':
-            error_message += "The phone number appears to be invalid. Please check the number and try again."
-        elif error_code == '21217':
-            error_message += "This account does not have permission to call this region. Please enable the correct geographic permissions in your Twilio console."
-        elif error_code == '21614':
-            error_message += "The customer's number is not a verified number for your trial account. You must verify the number in your Twilio console before calling."
-        else:
-            error_message += f"Twilio reported error code {error_code}. Please check the call logs in your Twilio console for more details."
-
-        # Generate TwiML that speaks the detailed error message to the sales agent
-        twiml = f"""<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-    <Say>{error_message}</Say>
-    <Hangup/>
-</Response>"""
-    
-    elif dial_call_status == "completed":
-        twiml = """<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-    <Say>The customer has disconnected. Goodbye.</Say>
-    <Hangup/>
-</Response>"""
-    elif dial_call_status == "busy":
-        twiml = """<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-    <Say>The customer's line is busy. Please try again later.</Say>
-    <Hangup/>
-</Response>"""
-    elif dial_call_status == "no-answer":
-        twiml = """<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-    <Say>The customer did not answer.</Say>
-    <Hangup/>
-</Response>"""
-    else:  # Handles other statuses like 'canceled'
-        twiml = f"""<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-    <Say>Call status was {dial_call_status}. Ending the call now.</Say>
-    <Hangup/>
-</Response>"""
-    
-    return Response(twiml, mimetype="text/xml")
+    error_code = request.form.get("ErrorCode") if dial_call_status == "failed" else None
+
+    if error_code:
+        log.warning("dial_failed", call_sid=request.form.get("CallSid"), error_code=error_code)
+    else:
+        log.info("dial_status", call_sid=request.form.get("CallSid"), status=dial_call_status)
+    if log.enabled("debug"):
+        log.debug("dial_status_form", form=request.form.to_dict())
+
+    return Response(dial_status_response(dial_call_status, error_code), mimetype="text/xml")
+
+def call_request(data):
+    """(Twilio Calls parameters, catalogue, None) for a /make_call body, or (None, None, error body)."""
+    if not isinstance(data, dict) or 'sales_agent_number' not in data or 'customer_number' not in data:
+        return None, None, {"error": "Missing 'sales_agent_number' or 'customer_number' in request body"}
+
+    sales_agent_number = data['sales_agent_number']
+    customer_number = data['customer_number']
+    # Product catalogue used for this call's talking points
+    catalogue = data.get('catalogue') or DEFAULT_CATALOGUE_NAME
+    if not is_valid_catalogue_name(catalogue):
+        return None, None, {"error": f"Invalid catalogue name {catalogue!r}"}
+    if warmup.ready and catalogues.get(catalogue) is None:
+        return None, None, {"error": f"Unknown catalogue {catalogue!r}", "catalogues": catalogues.names()}
+
+    base_url = PUBLIC_BASE_URL
+
+    # === THE FIX IS HERE ===
+    # We must URL-encode the customer number to ensure the '+' is preserved.
+    encoded_customer_number = quote(customer_number)
+    stream_url = f"{base_url}/stream?customer_number={encoded_customer_number}&catalogue={quote(catalogue)}"
+    # =======================
+
+    log.debug("make_call", stream_url=stream_url)
+    return {
+        "To": sales_agent_number,
+        "From": TWILIO_NUMBER,
+        "Url": stream_url,
+        "StatusCallback": f"{base_url}/call_status",
+        "StatusCallbackEvent": ['initiated', 'ringing', 'answered', 'completed'],
+        "StatusCallbackMethod": 'POST',
+    }, catalogue, None
+
+def preflight_response():
+    response = Response()
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Allow-Methods'] = 'POST, OPTIONS'
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Idempotency-Key'
+    return response
+
 @app.route("/make_call", methods=["POST", "OPTIONS"])
 def make_call():
     """
     Endpoint to initiate a call to a specified phone number.
-    This is the UPDATED and CORRECTED function.
+
+    An Idempotency-Key header (or "idempotency_key" in the body) makes retries
+    safe: a repeated key returns the original call instead of dialing again.
+    The request waits up to MAKE_CALL_TIMEOUT_SECONDS for the dial, which is
+    paced by the CPS limit; after that it returns 202 with the key to retry
+    with, and the call is still placed.
     """
     if request.method == "OPTIONS":
         # Handle preflight request
-        response = Response()
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        response.headers['Access-Control-Allow-Methods'] = 'POST, OPTIONS'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
-        return response
+        return preflight_response()
         
     try:
-        data = request.get_json()
-        if not data or 'sales_agent_number' not in data or 'customer_number' not in data:
-            return {"error": "Missing 'sales_agent_number' or 'customer_number' in request body"}, 400
-
-        sales_agent_number = data['sales_agent_number']
-        customer_number = data['customer_number']
-
-        # Use your public Codespace URL
-        base_url = "https://shiny-journey-4px597q46ph5794-5001.app.github.dev"
-        
-        # === THE FIX IS HERE ===
-        # We must URL-encode the customer number to ensure the '+' is preserved.
-        encoded_customer_number = quote(customer_number)
-        stream_url = f"{base_url}/stream?customer_number={encoded_customer_number}"
-        # =======================
-
-        print(f"DEBUG: Initiating call with stream URL: {stream_url}")
-
-        call = twilio_client.calls.create(
-            to=sales_agent_number,
-            from_=TWILIO_NUMBER,
-            url=stream_url,
-            status_callback=f"{base_url}/call_status",
-            status_callback_event=['initiated', 'ringing', 'answered', 'completed'],
-            status_callback_method='POST'
-        )
+        data = request.get_json(silent=True)
+        params, catalogue, error = call_request(data)
+        if error:
+            return error, 400
+
+        idempotency_key = request.headers.get("Idempotency-Key") or data.get("idempotency_key") or uuid.uuid4().hex
+        dial = twilio_control.dial(params, idempotency_key)
+        # Also runs if this request stops waiting before the call is placed
+        dial.add_done_callback(lambda done: done.exception() is None
+                               and sessions.get_or_create(done.result()["sid"], tenant=catalogue))
+        try:
+            # Blocks this request thread, so bounded: a backlog of dials must not hold the webhooks' threads
+            call = dial.result(timeout=MAKE_CALL_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            return jsonify({
+                "success": True,
+                "status": "queued",
+                "idempotency_key": idempotency_key,
+                "message": "The call is queued under the Twilio CPS limit; repeat the request with this idempotency_key for its call_sid"
+            }), 202
 
         return jsonify({
             "success": True,
-            "call_sid": call.sid,
-            "message": f"Call initiated to sales agent {sales_agent_number}, will connect to customer {customer_number}"
+            "call_sid": call["sid"],
+            "catalogue": catalogue,
+            "message": f"Call initiated to sales agent {data['sales_agent_number']}, will connect to customer {data['customer_number']}"
         }), 200
     except Exception as e:
         return jsonify({"error": f"Failed to initiate call: {str(e)}"}), 500
+
+@app.route("/make_calls", methods=["POST", "OPTIONS"])
+def make_calls():
+    """
+    Dial a batch of calls: {"calls": [<make_call body>, ...]}. Returns 202 at
+    once; the calls are placed at the account's CPS limit, and their progress
+    is at GET /make_calls/<batch_id>. Each call may carry an "idempotency_key";
+    an Idempotency-Key header derives one per call from its position.
+    """
+    if request.method == "OPTIONS":
+        return preflight_response()
+
+    data = request.get_json(silent=True) or {}
+    items = data.get("calls")
+    if not isinstance(items, list) or not items:
+        return {"error": "Expected a non-empty 'calls' list in the request body"}, 400
+    if len(items) > MAX_BATCH_CALLS:
+        return {"error": f"At most {MAX_BATCH_CALLS} calls per batch"}, 413
+
+    batch_key = request.headers.get("Idempotency-Key")
+    # Aligned with items: (params, idempotency key) per valid call, the error body per invalid one
+    calls, call_catalogues = [], []
+    for index, item in enumerate(items):
+        params, catalogue, error = call_request(item)
+        if error:
+            calls.append(error)
+        else:
+            calls.append((params, item.get("idempotency_key") or (f"{batch_key}:{index}" if batch_key else None)))
+        call_catalogues.append(catalogue)
+    rejected = [{"index": index, **call} for index, call in enumerate(calls) if isinstance(call, dict)]
+
+    batch = twilio_control.dial_batch(
+        calls, on_done=lambda index, call: sessions.get_or_create(call["sid"], tenant=call_catalogues[index]))
+    log.info("dial_batch", batch_id=batch.batch_id, accepted=len(calls) - len(rejected), rejected=len(rejected))
+    return {
+        "success": True,
+        "batch_id": batch.batch_id,
+        "accepted": len(calls) - len(rejected),
+        "rejected": rejected,
+        "status_url": f"/make_calls/{batch.batch_id}",
+    }, 202
+
+@app.route("/make_calls/<batch_id>", methods=["GET"])
+def make_calls_status(batch_id):
+    """Per-call progress of a /make_calls batch."""
+    batch = twilio_control.batch(batch_id)
+    if batch is None:
+        return {"error": f"Unknown batch {batch_id!r}"}, 404
+    return {"success": True, **batch.to_dict()}, 200
     
 @app.route("/call_status", methods=["POST"])
 def call_status():
@@ -348,20 +662,23 @@ def call_status():
     call_status = request.form.get("CallStatus")
     call_duration = request.form.get("CallDuration")
     
-    print(f"📞 Call Status Update - SID: {call_sid}, Status: {call_status}, Duration: {call_duration}")
+    log.info("call_status", call_sid=call_sid, status=call_status, duration=call_duration)
     
     if call_status == "completed":
-        print(f"✅ Call completed - Duration: {call_duration} seconds")
-    elif call_status == "answered":
-        print(f"📱 Call answered - Starting transcription")
+        sessions.mark_completed(call_sid)
+        broker.close(call_sid)
     
     return Response(status=200)
 
 @app.route("/talking_points", methods=["GET"])
 def get_talking_points():
-    """Retrieve the latest talking points for the sales rep."""
-    global latest_talking_points
-    
+    """Retrieve the latest talking points for the sales rep on a given call."""
+    call_sid = request.args.get("call_sid")
+    if not call_sid:
+        return {"error": "Missing call_sid"}, 400
+
+    session = sessions.get(call_sid)
+    latest_talking_points = session.talking_points if session else None
     if latest_talking_points is None:
         return {
             "error": "No talking points available yet. Start a conversation to generate talking points."
@@ -369,16 +686,195 @@ def get_talking_points():
     
     return {
         "success": True,
-        "talking_points": {
-            "points": latest_talking_points.points,
-            "reasoning": latest_talking_points.reasoning,
-            "timestamp": getattr(latest_talking_points, 'timestamp', None)
-        }
+        "talking_points": talking_points_payload(latest_talking_points)
+    }, 200
+
+@app.route("/talking_points/stream", methods=["GET"])
+def stream_talking_points():
+    """Server-Sent Events stream of a call's talking points."""
+    call_sid = request.args.get("call_sid")
+    if not call_sid:
+        return {"error": "Missing call_sid"}, 400
+
+    # EventSource sends Last-Event-ID when it reconnects
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    if not broker.admit():
+        log.warning("talking_point_stream_refused", call_sid=call_sid, max_streams=broker.max_streams)
+        return ({"error": "Too many open talking point streams; poll /talking_points instead"}, 503,
+                {"Retry-After": str(STREAM_RETRY_AFTER_SECONDS)})
+
+    return Response(
+        stream_with_context(broker.stream(call_sid, last_event_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route("/queue_stats", methods=["GET"])
+def queue_stats():
+    """Backpressure metrics for the background talking point queue."""
+    return {
+        "success": True,
+        "queue": utterance_worker.stats(),
+        "speculation": speculation.stats(),
+        "streams": broker.stats(),
+        "llm_cache": llm_cache.stats(),
+        "prompt_tokens": prompt_sizes.stats(),
+        "summarizer": summarizer.stats(),
+        "latency": metrics.percentiles(),
+        "catalogues": catalogues.stats(),
+        "encode_batches": encode_batcher.stats(),
+        "llm": llm.stats(),
+        "twilio": twilio_control.stats(),
+        "log": log.stats(),
     }, 200
 
+@app.route("/catalogues", methods=["GET"])
+def list_catalogues():
+    """Loaded product catalogues and reload counters."""
+    return {"success": True, **catalogues.stats()}, 200
+
+def admin_error():
+    """An error response unless the request carries the admin token, else None."""
+    if not ADMIN_TOKEN:
+        return {"error": "Admin endpoints are disabled. Set ADMIN_TOKEN to enable them."}, 404
+    supplied = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(supplied.encode(), f"Bearer {ADMIN_TOKEN}".encode()):
+        return {"error": "Unauthorized"}, 401
+    return None
+
+def run_in_background(target, *args):
+    """Index builds can take minutes, so admin requests return before they finish."""
+    threading.Thread(target=target, args=args, name="catalogue-admin", daemon=True).start()
+
+@app.route("/catalogues/reload", methods=["POST"])
+def reload_catalogues():
+    """Re-index changed catalogues now instead of waiting for the watcher."""
+    error = admin_error()
+    if error:
+        return error
+    run_in_background(sync_catalogues)
+    return {"success": True, "message": "Reload started"}, 202
+
+@app.route("/catalogues/<name>", methods=["PUT"])
+def upload_catalogue(name):
+    """Add or replace a catalogue from an uploaded "file" (PDF or text). Indexed in the background."""
+    error = admin_error()
+    if error:
+        return error
+    if not CATALOGUE_DIR:
+        return {"error": "Set CATALOGUE_DIR to manage catalogues at runtime"}, 409
+    if not is_valid_catalogue_name(name) or name == DEFAULT_CATALOGUE_NAME:
+        return {"error": f"Invalid catalogue name {name!r}"}, 400
+    upload = request.files.get("file")
+    extension = os.path.splitext(upload.filename or "")[1].lower() if upload else ""
+    if extension not in CATALOGUE_EXTENSIONS:
+        return {"error": f"Upload a \"file\" with one of the extensions {', '.join(CATALOGUE_EXTENSIONS)}"}, 400
+
+    path = os.path.join(CATALOGUE_DIR, name + extension)
+    # Written under a name the watcher ignores, then renamed, so it never sees a partial file
+    upload.save(path + ".upload")
+    os.replace(path + ".upload", path)
+    for other in CATALOGUE_EXTENSIONS:
+        if other != extension and os.path.exists(os.path.join(CATALOGUE_DIR, name + other)):
+            os.remove(os.path.join(CATALOGUE_DIR, name + other))
+    run_in_background(catalogues.load, name, path)
+    return {"success": True, "message": f"Indexing catalogue {name!r}"}, 202
+
+@app.route("/catalogues/<name>", methods=["DELETE"])
+def delete_catalogue(name):
+    """Stop serving a catalogue and delete its file. Calls using it continue without context."""
+    error = admin_error()
+    if error:
+        return error
+    if not CATALOGUE_DIR or not is_valid_catalogue_name(name) or name == DEFAULT_CATALOGUE_NAME:
+        return {"error": f"Catalogue {name!r} cannot be deleted"}, 400
+    for extension in CATALOGUE_EXTENSIONS:
+        if os.path.exists(os.path.join(CATALOGUE_DIR, name + extension)):
+            os.remove(os.path.join(CATALOGUE_DIR, name + extension))
+    removed = catalogues.remove(name)
+    return {"success": removed}, 200 if removed else 404
+
+@app.route("/log_level", methods=["PUT"])
+def set_log_level():
+    """Change the log level without a restart, e.g. {"level": "debug"} while diagnosing a call."""
+    error = admin_error()
+    if error:
+        return error
+    try:
+        log.set_level((request.get_json(silent=True) or {}).get("level"))
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    return {"success": True, "level": log.level}, 200
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus text exposition of stage latencies and queue counters."""
+    body = (
+        metrics.render()
+        + render_gauges("coaching_queue", "Talking point queue counters.", utterance_worker.stats())
+        + render_gauges("coaching_llm_cache", "Talking point cache counters.", llm_cache.stats())
+        + render_gauges("coaching_speculation", "Speculative generation counters.", speculation.stats())
+        + render_gauges("coaching_streams", "Talking point stream counts.", broker.stats())
+        + render_gauges("coaching_summarizer", "Rolling summarizer counters.", summarizer.stats())
+        + render_gauges("coaching_encode_batches", "Batched query encode counters.", encode_batcher.stats())
+        + render_gauges("coaching_llm", "LLM request pool counters.", llm.stats())
+        + render_gauges("coaching_twilio", "Twilio control plane counters.", twilio_control.stats())
+        + render_gauges("coaching_log", "Queued logger counters.", log.stats())
+    )
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+@app.route("/profiler/start", methods=["POST"])
+def profiler_start():
+    """Start the sampling profiler. Optional ?interval_ms= sets the sampling period."""
+    if not PROFILER_ENABLED:
+        return {"error": "Profiler is disabled. Set PROFILER_ENABLED=true to enable it."}, 404
+    error = admin_error()
+    if error:
+        return error
+    try:
+        interval = float(request.args.get("interval_ms", DEFAULT_INTERVAL_SECONDS * 1000)) / 1000
+    except ValueError:
+        interval = None
+    if interval is None or not MIN_INTERVAL_SECONDS <= interval <= MAX_INTERVAL_SECONDS:
+        return {"error": f"interval_ms must be a number from {MIN_INTERVAL_SECONDS * 1000:g} "
+                         f"to {MAX_INTERVAL_SECONDS * 1000:g}"}, 400
+    started = profiler.start(interval=interval)
+    return {"success": started, "profiler": profiler.stats()}, 200 if started else 409
+
+@app.route("/profiler/stop", methods=["POST"])
+def profiler_stop():
+    """Stop the sampling profiler, keeping the collected samples."""
+    if not PROFILER_ENABLED:
+        return {"error": "Profiler is disabled. Set PROFILER_ENABLED=true to enable it."}, 404
+    error = admin_error()
+    if error:
+        return error
+    profiler.stop()
+    return {"success": True, "profiler": profiler.stats()}, 200
+
+@app.route("/profiler", methods=["GET"])
+def profiler_samples():
+    """Collected samples in collapsed-stack format, for flamegraph tools."""
+    if not PROFILER_ENABLED:
+        return {"error": "Profiler is disabled. Set PROFILER_ENABLED=true to enable it."}, 404
+    error = admin_error()
+    if error:
+        return error
+    return Response(profiler.collapsed(), mimetype="text/plain")
+
 @app.route("/transcription", methods=["POST"])
 def transcription():
     """Twilio will send transcription updates here."""
+    with metrics.labels(request.form.get("CallSid"), request.form.get("Track")), metrics.span("webhook"):
+        handle_transcription_event()
+    return Response(status=200)
+
+def handle_transcription_event():
     event = request.form.get("TranscriptionEvent")
 
     if event == "transcription-content":
@@ -390,30 +886,45 @@ def transcription():
             if transcript:
                 final = request.form.get("Final") == 'true'
                 stability = request.form.get("Stability")
-                prefix = "✅" if final else f"⏳({stability})"
-                print(f"{prefix} [{track}]: {transcript}")
+                log.debug("transcript", call_sid=request.form.get("CallSid"), track=track, final=final,
+                          stability=stability, transcript=transcript)
+                # Determine role based on track
+                if track and track.lower() == "inbound":
+                    role = "customer"
+                elif track and track.lower() == "outbound":
+                    role = "sales_rep"
+                else:
+                    role = "unknown"
+                call_sid = request.form.get("CallSid")
+                catalogue = request.args.get("catalogue")
+                tenant = catalogue if is_valid_catalogue_name(catalogue) else None
                 if final:
-                    # Append to conversation as customer (for demo; you may want to distinguish roles)
-                    # Determine role based on track
-                    if track and track.lower() == "inbound":
-                        role = "customer"
-                    elif track and track.lower() == "outbound":
-                        role = "sales_rep"
-                    else:
-                        role = "unknown"
-                    conversation.append({"role": role, "content": transcript})
-                    # Retrieve relevant context
-                    context = retrieve_context(conversation, top_k=3)
-                    print("\n--- Suggested Talking Points for Sales Rep ---")
-                    # Generate and store talking points
-                    talking_points = generate_talking_points(context, conversation)
-                    print(f"Talking points generated and stored. Access via GET /talking_points")
+                    session = sessions.get_or_create(call_sid, tenant=tenant)
+                    session.add_turn(role, transcript)
+                    summarizer.maybe_schedule(session)
+                    if SPECULATION_ENABLED and role == "customer":
+                        hit, talking_points = speculation.resolve(session, transcript)
+                        if hit:
+                            # Already generated (or running) from a matching partial
+                            if talking_points is not None:
+                                publish_talking_points(session, talking_points)
+                            return
+                    # Acknowledge Twilio right away; talking points are generated in the background
+                    if not submit_utterance(call_sid, "final", transcript, track):
+                        log.warning("talking_points_skipped", reason="queue_full", call_sid=call_sid)
+                elif SPECULATION_ENABLED and role == "customer":
+                    try:
+                        stability = float(stability)
+                    except (TypeError, ValueError):
+                        stability = None
+                    session = sessions.get_or_create(call_sid, tenant=tenant)
+                    speculative = speculation.start(session, transcript, stability)
+                    if speculative is not None:
+                        submit_utterance(call_sid, "speculative", speculative, track)
     elif event in ["transcription-started", "transcription-stopped", "transcription-error"]:
-        print(f"--- {event} ---")
-        for key, value in request.form.items():
-            print(f"  {key}: {value}")
-
-    return Response(status=200)
+        log.info("transcription_event", transcription_event=event, form=request.form.to_dict())
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5001)
\ No newline at end of file
+    warmup.start()
+    # Each open talking point stream holds a request thread
+    app.run(host="0.0.0.0", port=5001, threaded=True)
\ No newline at end of file
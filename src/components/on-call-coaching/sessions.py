@@ -0,0 +1,203 @@
+# src/components/on-call-coaching/sessions.py
+"""Per-call session state for the coaching server, keyed by Twilio CallSid."""
+import threading
+import time
+from collections import OrderedDict, deque
+
+# How many recent turns are kept verbatim for each call
+MAX_TURNS = 20
+# Upper bound on the rolling summary of turns that fell out of the ring buffer
+SUMMARY_MAX_CHARS = 2000
+# How long a session is kept after Twilio reports the call as completed
+COMPLETED_TTL_SECONDS = 300
+# Sessions with no activity for this long are evicted even without a completed status
+IDLE_TTL_SECONDS = 2 * 60 * 60
+# Hard cap on tracked calls; the least recently used session is evicted beyond it
+MAX_SESSIONS = 1000
+# Minimum interval between expiry sweeps
+SWEEP_INTERVAL_SECONDS = 30
+
+
+class CallSession:
+    """Conversation state for a single call."""
+
+    __slots__ = ("call_sid", "tenant", "turns", "summary", "talking_points", "speculation",
+                 "created_at", "last_seen", "expires_at", "_lock",
+                 "_turn_seqs", "_next_seq", "_embeddings", "_summary_upto")
+
+    def __init__(self, call_sid, max_turns=MAX_TURNS, tenant="default"):
+        now = time.monotonic()
+        self.call_sid = call_sid
+        # Isolation boundary for anything shared between calls, such as the LLM cache
+        self.tenant = tenant
+        self.turns = deque(maxlen=max_turns)
+        self.summary = ""
+        self.talking_points = None
+        # In-flight speculative generation from a partial transcript, if any
+        self.speculation = None
+        self.created_at = now
+        self.last_seen = now
+        self.expires_at = None
+        # Turns are appended by webhook threads and read by background workers
+        self._lock = threading.Lock()
+        # Sequence number of each buffered turn, and cached embeddings by sequence number
+        self._turn_seqs = deque(maxlen=max_turns)
+        self._next_seq = 0
+        self._embeddings = {}
+        # The summary covers every turn with a sequence number below this
+        self._summary_upto = 0
+
+    def add_turn(self, role, content):
+        """Append a turn, folding the oldest one into the summary when the buffer is full."""
+        with self._lock:
+            if len(self.turns) == self.turns.maxlen:
+                oldest_seq = self._turn_seqs[0]
+                if oldest_seq >= self._summary_upto:
+                    # Not summarized in time; keep it verbatim in the summary instead of losing it
+                    self._fold_into_summary(self.turns[0])
+                    self._summary_upto = oldest_seq + 1
+                self._embeddings.pop(oldest_seq, None)
+            self.turns.append({"role": role, "content": content})
+            self._turn_seqs.append(self._next_seq)
+            self._next_seq += 1
+            self.last_seen = time.monotonic()
+
+    def _fold_into_summary(self, turn):
+        line = f"{turn['role'].capitalize()}: {turn['content']}"
+        summary = f"{self.summary}\n{line}" if self.summary else line
+        if len(summary) > SUMMARY_MAX_CHARS:
+            # Keep the most recent part of the summary
+            summary = summary[-SUMMARY_MAX_CHARS:]
+            summary = summary[summary.find("\n") + 1:] if "\n" in summary else summary
+        self.summary = summary
+
+    def history(self):
+        """Recent turns as a list of {"role", "content"} dicts, oldest first."""
+        with self._lock:
+            return list(self.turns)
+
+    def prompt_state(self):
+        """Return (summary, turns not covered by the summary), oldest first."""
+        with self._lock:
+            return self.summary, [turn for seq, turn in zip(self._turn_seqs, self.turns)
+                                  if seq >= self._summary_upto]
+
+    def summarization_backlog(self, keep_turns):
+        """
+        Return (summary, turns, upto_seq) for turns that should be folded into
+        the summary: those not summarized yet, except the last keep_turns.
+        """
+        with self._lock:
+            pending = [(seq, turn) for seq, turn in zip(self._turn_seqs, self.turns)
+                       if seq >= self._summary_upto][:-keep_turns or None]
+            if not pending:
+                return self.summary, [], self._summary_upto
+            return self.summary, [turn for _, turn in pending], pending[-1][0] + 1
+
+    def apply_summary(self, summary, upto_seq):
+        """Install a summary covering turns below upto_seq, unless a newer one exists."""
+        with self._lock:
+            if upto_seq <= self._summary_upto:
+                return False
+            self.summary = summary
+            self._summary_upto = upto_seq
+            return True
+
+    def turn_embeddings(self, encode):
+        """
+        Return (turns, embeddings) for the buffered turns, oldest first.
+
+        Embeddings are cached per turn, so encode(list_of_texts) is only called
+        for turns that have not been embedded yet - normally just the latest one.
+        """
+        with self._lock:
+            turns = list(self.turns)
+            seqs = list(self._turn_seqs)
+            missing = [(seq, turn["content"]) for seq, turn in zip(seqs, turns)
+                       if seq not in self._embeddings]
+            cached = {seq: self._embeddings[seq] for seq in seqs if seq in self._embeddings}
+
+        if missing:
+            # Encode outside the lock so webhooks can keep appending turns meanwhile
+            vectors = encode([text for _, text in missing])
+            with self._lock:
+                live = set(self._turn_seqs)
+                for (seq, _), vector in zip(missing, vectors):
+                    cached[seq] = vector
+                    if seq in live:
+                        self._embeddings[seq] = vector
+
+        return turns, [cached[seq] for seq in seqs]
+
+
+class SessionStore:
+    """Thread-safe map of CallSid -> CallSession with bounded size and TTL eviction."""
+
+    def __init__(self, max_sessions=MAX_SESSIONS, completed_ttl=COMPLETED_TTL_SECONDS,
+                 idle_ttl=IDLE_TTL_SECONDS, max_turns=MAX_TURNS):
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_sessions = max_sessions
+        self._completed_ttl = completed_ttl
+        self._idle_ttl = idle_ttl
+        self._max_turns = max_turns
+        self._last_sweep = time.monotonic()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, call_sid):
+        """Return the session for call_sid, or None if it is unknown or expired."""
+        with self._lock:
+            self._maybe_sweep()
+            session = self._sessions.get(call_sid)
+            if session is not None:
+                self._sessions.move_to_end(call_sid)
+            return session
+
+    def get_or_create(self, call_sid, tenant=None):
+        """Return the session for call_sid, creating it for tenant if needed."""
+        with self._lock:
+            self._maybe_sweep()
+            session = self._sessions.get(call_sid)
+            if session is None:
+                session = CallSession(call_sid, max_turns=self._max_turns, tenant=tenant or "default")
+                self._sessions[call_sid] = session
+                while len(self._sessions) > self._max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(call_sid)
+            return session
+
+    def mark_completed(self, call_sid):
+        """Schedule a session for eviction once the completed TTL has passed."""
+        with self._lock:
+            session = self._sessions.get(call_sid)
+            if session is not None:
+                session.expires_at = time.monotonic() + self._completed_ttl
+            self._maybe_sweep()
+
+    def remove(self, call_sid):
+        with self._lock:
+            return self._sessions.pop(call_sid, None)
+
+    def sweep(self):
+        """Evict expired and idle sessions. Returns the number evicted."""
+        with self._lock:
+            return self._sweep(time.monotonic())
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep >= SWEEP_INTERVAL_SECONDS:
+            self._sweep(now)
+
+    def _sweep(self, now):
+        self._last_sweep = now
+        expired = [
+            sid for sid, session in self._sessions.items()
+            if (session.expires_at is not None and session.expires_at <= now)
+            or now - session.last_seen >= self._idle_ttl
+        ]
+        for sid in expired:
+            del self._sessions[sid]
+        return len(expired)
@@ -0,0 +1,155 @@
+# src/components/on-call-coaching/speculation.py
+"""
+Speculative talking point generation from partial transcripts.
+
+When a partial customer transcript is stable enough, generation starts before
+Twilio finalizes the utterance. When the final arrives it either adopts the
+speculative result (if the texts are close enough) or cancels it so the caller
+can regenerate from the final text. An adopted speculation is detached from
+the session, so partials of the next utterance cannot cancel it.
+"""
+import re
+import threading
+from difflib import SequenceMatcher
+
+DEFAULT_STABILITY_THRESHOLD = 0.8
+DEFAULT_SIMILARITY_THRESHOLD = 0.9
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+def text_similarity(a, b):
+    """Similarity in [0, 1] between two utterances, ignoring case and punctuation."""
+    return SequenceMatcher(None, _WORD.findall(a.lower()), _WORD.findall(b.lower())).ratio()
+
+
+class Speculation:
+    """A speculative generation for one partial utterance."""
+
+    __slots__ = ("text", "state", "adopted", "cancelled", "talking_points")
+
+    def __init__(self, text):
+        self.text = text
+        # queued -> running -> done
+        self.state = "queued"
+        self.adopted = False
+        self.cancelled = False
+        self.talking_points = None
+
+
+class SpeculationTracker:
+    """Decides when to speculate, reconciles finals, and counts hits and waste."""
+
+    def __init__(self, stability_threshold=DEFAULT_STABILITY_THRESHOLD,
+                 similarity_threshold=DEFAULT_SIMILARITY_THRESHOLD):
+        self.stability_threshold = stability_threshold
+        self.similarity_threshold = similarity_threshold
+        self._lock = threading.Lock()
+        self._counters = {
+            "started": 0,
+            "hits": 0,
+            "misses": 0,
+            # Matched a final before it started, so the final was generated instead
+            "not_started": 0,
+            "wasted_llm_calls": 0,
+        }
+
+    def start(self, session, text, stability):
+        """
+        Begin a speculation for a partial transcript if it qualifies.
+
+        Returns the new Speculation to queue, or None if the partial is not stable
+        enough or the current speculation already covers it.
+        """
+        if stability is None or stability < self.stability_threshold:
+            return None
+        with self._lock:
+            current = session.speculation
+            if current is not None and not current.cancelled:
+                if text_similarity(current.text, text) >= self.similarity_threshold:
+                    return None
+                self._cancel(current)
+            speculation = Speculation(text)
+            session.speculation = speculation
+            self._counters["started"] += 1
+            return speculation
+
+    def mark_running(self, speculation):
+        """Called by the worker before generating. Returns False if it was cancelled."""
+        with self._lock:
+            if speculation.cancelled:
+                return False
+            speculation.state = "running"
+            return True
+
+    def complete(self, session, speculation, talking_points):
+        """
+        Record a finished speculative generation.
+
+        Returns True if the final utterance already adopted it, in which case the
+        caller should publish talking_points for the call.
+        """
+        with self._lock:
+            speculation.state = "done"
+            speculation.talking_points = talking_points
+            if speculation.cancelled:
+                self._counters["wasted_llm_calls"] += 1
+                return False
+            return speculation.adopted
+
+    def fail(self, session, speculation):
+        """
+        Record a speculative generation that raised.
+
+        Returns True if the final utterance already adopted it, in which case the
+        caller must generate from the final text instead.
+        """
+        with self._lock:
+            speculation.state = "done"
+            if session.speculation is speculation:
+                session.speculation = None
+            if speculation.adopted:
+                return True
+            speculation.cancelled = True
+            return False
+
+    def resolve(self, session, final_text):
+        """
+        Reconcile a final utterance with the call's speculation.
+
+        Returns (hit, talking_points). On a hit, talking_points is the finished
+        speculative result, or None if it is running and will be published by
+        complete(). Otherwise the speculation is cancelled and the caller should
+        generate from the final text: on a miss, and on a match that has not
+        started running, since generating from the final is then no slower.
+        """
+        with self._lock:
+            speculation = session.speculation
+            if speculation is None or speculation.cancelled:
+                return False, None
+            session.speculation = None
+            if text_similarity(speculation.text, final_text) < self.similarity_threshold:
+                self._cancel(speculation)
+                self._counters["misses"] += 1
+                return False, None
+            if speculation.state == "queued":
+                self._cancel(speculation)
+                self._counters["not_started"] += 1
+                return False, None
+            self._counters["hits"] += 1
+            speculation.adopted = True
+            return True, speculation.talking_points
+
+    def _cancel(self, speculation):
+        speculation.cancelled = True
+        if speculation.state == "done":
+            # The LLM call already finished and its result is being thrown away
+            self._counters["wasted_llm_calls"] += 1
+
+    def stats(self):
+        with self._lock:
+            resolved = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / resolved, 3) if resolved else 0.0,
+            }
@@ -0,0 +1,185 @@
+# src/components/on-call-coaching/streaming.py
+"""
+Server-Sent Events fan-out of talking points, per call.
+
+Each call has a channel holding a short replay buffer of recent events with
+increasing ids. Subscribers get their own bounded queue; on reconnect they pass
+the last event id they saw and the buffered events after it are replayed.
+
+Every open stream holds a request thread for as long as the client stays
+connected, so the number of open streams can be capped below the server's
+thread count; callers check admit() before streaming and refuse beyond it.
+A stream thread spends its life blocked on its queue and costs about 20 KB of
+memory, so the server is sized with enough threads for hundreds of streams
+rather than moving streams onto an event loop and a second port.
+"""
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+# Recent events kept per call for Last-Event-ID replay
+REPLAY_BUFFER_SIZE = 50
+# Events a slow subscriber may fall behind by before it is disconnected
+SUBSCRIBER_QUEUE_SIZE = 100
+# Seconds between heartbeat comments on an idle stream
+HEARTBEAT_SECONDS = 15
+# Client reconnect delay advertised to EventSource, in milliseconds
+RETRY_MILLISECONDS = 3000
+# Gunicorn threads per worker unless GUNICORN_THREADS says otherwise: a few
+# hundred dashboards plus the Twilio webhooks
+DEFAULT_SERVER_THREADS = 256
+# Channels with no subscribers and no events for this long are dropped
+IDLE_TTL_SECONDS = 2 * 60 * 60
+SWEEP_INTERVAL_SECONDS = 60
+
+# Sentinel put on a subscriber queue to end its stream
+_CLOSE = object()
+
+
+class _Channel:
+    __slots__ = ("events", "next_id", "subscribers", "closed", "last_activity")
+
+    def __init__(self):
+        self.events = deque(maxlen=REPLAY_BUFFER_SIZE)
+        self.next_id = 1
+        self.subscribers = set()
+        self.closed = False
+        self.last_activity = time.monotonic()
+
+
+class TalkingPointBroker:
+    """Publishes events to every subscriber of a call, with replay on reconnect."""
+
+    def __init__(self, max_streams=None):
+        self.max_streams = max_streams
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self._open_streams = 0
+        self._rejected = 0
+
+    def publish(self, call_sid, event, data):
+        """Send an event to the call's subscribers. Returns the event id."""
+        with self._lock:
+            self._maybe_sweep()
+            channel = self._channel(call_sid)
+            event_id = channel.next_id
+            channel.next_id += 1
+            message = (event_id, event, json.dumps(data, default=str))
+            channel.events.append(message)
+            channel.last_activity = time.monotonic()
+            for subscriber in list(channel.subscribers):
+                try:
+                    subscriber.put_nowait(message)
+                except queue.Full:
+                    # Too slow to keep up; drop it and let EventSource reconnect with Last-Event-ID
+                    channel.subscribers.discard(subscriber)
+                    self._force_close(subscriber)
+            return event_id
+
+    def close(self, call_sid):
+        """Send a final "end" event and close every stream for the call."""
+        self.publish(call_sid, "end", {"call_sid": call_sid})
+        with self._lock:
+            channel = self._channels.get(call_sid)
+            if channel is None:
+                return
+            channel.closed = True
+            for subscriber in channel.subscribers:
+                self._force_close(subscriber)
+            channel.subscribers.clear()
+
+    def subscribe(self, call_sid, last_event_id=None):
+        """Register a subscriber, preloaded with buffered events newer than last_event_id."""
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE + REPLAY_BUFFER_SIZE)
+        with self._lock:
+            self._maybe_sweep()
+            channel = self._channel(call_sid)
+            for message in channel.events:
+                if last_event_id is None or message[0] > last_event_id:
+                    subscriber.put_nowait(message)
+            if channel.closed:
+                subscriber.put_nowait(_CLOSE)
+            else:
+                channel.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, call_sid, subscriber):
+        with self._lock:
+            channel = self._channels.get(call_sid)
+            if channel is not None:
+                channel.subscribers.discard(subscriber)
+                channel.last_activity = time.monotonic()
+
+    def admit(self):
+        """False, and counted as rejected, if max_streams streams are already open."""
+        with self._lock:
+            if self.max_streams is not None and self._open_streams >= self.max_streams:
+                self._rejected += 1
+                return False
+            return True
+
+    def stream(self, call_sid, last_event_id=None, heartbeat=HEARTBEAT_SECONDS):
+        """Generator of SSE-formatted text for one subscriber."""
+        with self._lock:
+            self._open_streams += 1
+        subscriber = self.subscribe(call_sid, last_event_id)
+        try:
+            yield f"retry: {RETRY_MILLISECONDS}\n\n"
+            while True:
+                try:
+                    message = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+                if message is _CLOSE:
+                    return
+                event_id, event, data = message
+                yield f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+        finally:
+            self.unsubscribe(call_sid, subscriber)
+            with self._lock:
+                self._open_streams -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "channels": len(self._channels),
+                "subscribers": sum(len(channel.subscribers) for channel in self._channels.values()),
+                "open_streams": self._open_streams,
+                "max_streams": self.max_streams or 0,
+                "rejected": self._rejected,
+            }
+
+    def _channel(self, call_sid):
+        channel = self._channels.get(call_sid)
+        if channel is None:
+            channel = self._channels[call_sid] = _Channel()
+        return channel
+
+    @staticmethod
+    def _force_close(subscriber):
+        # Make room if needed so the close sentinel always fits
+        while True:
+            try:
+                subscriber.put_nowait(_CLOSE)
+                return
+            except queue.Full:
+                try:
+                    subscriber.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep < SWEEP_INTERVAL_SECONDS:
+            return
+        self._last_sweep = now
+        idle = [
+            sid for sid, channel in self._channels.items()
+            if not channel.subscribers and now - channel.last_activity >= IDLE_TTL_SECONDS
+        ]
+        for sid in idle:
+            del self._channels[sid]
@@ -0,0 +1,63 @@
+# src/components/on-call-coaching/summarizer.py
+"""Background, incremental summarization of older conversation turns."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from logs import log
+from prompt import DEFAULT_KEEP_TURNS
+
+# Only summarize once this many turns have aged out of the verbatim window
+DEFAULT_MIN_BATCH = 2
+
+
+class RollingSummarizer:
+    """
+    Folds turns older than the last keep_turns into each session's summary.
+
+    summarize(previous_summary, turns) returns the updated summary text; it runs
+    on a small thread pool, at most once at a time per call.
+    """
+
+    def __init__(self, summarize, keep_turns=DEFAULT_KEEP_TURNS, min_batch=DEFAULT_MIN_BATCH, max_workers=1):
+        self._summarize = summarize
+        self.keep_turns = keep_turns
+        self._min_batch = min_batch
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summarizer")
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self._counters = {"scheduled": 0, "applied": 0, "failed": 0}
+        self._max_depth_seen = 0
+
+    def maybe_schedule(self, session):
+        """Queue a summary update if enough turns have aged out. Cheap to call on every turn."""
+        _, turns, _ = session.summarization_backlog(self.keep_turns)
+        if len(turns) < self._min_batch:
+            return False
+        with self._lock:
+            if session.call_sid in self._in_flight:
+                return False
+            self._in_flight.add(session.call_sid)
+            self._counters["scheduled"] += 1
+            self._max_depth_seen = max(self._max_depth_seen, len(self._in_flight))
+        self._executor.submit(self._run, session)
+        return True
+
+    def _run(self, session):
+        try:
+            summary, turns, upto_seq = session.summarization_backlog(self.keep_turns)
+            if turns:
+                updated = self._summarize(summary, turns)
+                applied = session.apply_summary(updated, upto_seq)
+                with self._lock:
+                    self._counters["applied"] += int(applied)
+        except Exception as e:
+            log.error("summary_failed", call_sid=session.call_sid, error=str(e))
+            with self._lock:
+                self._counters["failed"] += 1
+        finally:
+            with self._lock:
+                self._in_flight.discard(session.call_sid)
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "in_flight": len(self._in_flight), "max_depth_seen": self._max_depth_seen}
@@ -0,0 +1,78 @@
+# src/components/on-call-coaching/test_embedding.py
+"""ONNX embeddings must score like the SentenceTransformer model they replace."""
+import numpy as np
+import pytest
+
+from embedding import OnnxEncoder, load_encoder
+from retrieval import NumpyRetriever
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+DOCUMENTS = [
+    "The premium plan includes priority support and a dedicated account manager.",
+    "Annual billing is discounted by fifteen percent compared with monthly billing.",
+    "The helmet shell is made from carbon fibre and weighs under 300 grams.",
+]
+QUERY = "Is there a discount if we pay for the whole year up front?"
+
+
+class FakeEncoding:
+    def __init__(self, length):
+        self.ids = list(range(1, length + 1))
+        self.attention_mask = [1] * length
+        self.type_ids = [0] * length
+
+
+class FakeTokenizer:
+    def enable_truncation(self, max_length):
+        pass
+
+    def enable_padding(self):
+        pass
+
+    def encode_batch(self, sentences):
+        return [FakeEncoding(4) for _ in sentences]
+
+
+class FakeNode:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeSession:
+    """Hidden states far from unit length, like an unnormalized transformer output."""
+
+    def get_inputs(self):
+        return [FakeNode("input_ids"), FakeNode("attention_mask")]
+
+    def run(self, outputs, inputs):
+        batch, length = inputs["input_ids"].shape
+        return [np.full((batch, length, 8), 3.0, dtype=np.float32) + inputs["input_ids"][:, :, None]]
+
+
+def test_onnx_encoder_returns_unit_vectors_by_default():
+    encoder = OnnxEncoder(FakeSession(), FakeTokenizer())
+    vectors = encoder.encode(["one", "two"], convert_to_numpy=True)
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-6)
+    raw = encoder.encode(["one"], normalize_embeddings=False)
+    assert np.linalg.norm(raw[0]) > 1.0
+
+
+def test_onnx_scores_match_torch():
+    pytest.importorskip("sentence_transformers")
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("tokenizers")
+    results = {}
+    for backend in ("torch", "onnx"):
+        encoder = load_encoder(MODEL_NAME, backend)
+        # As embed_and_store and the query path call it
+        matrix = np.asarray(encoder.encode(DOCUMENTS, convert_to_numpy=True, normalize_embeddings=True),
+                            dtype=np.float32)
+        query = encoder.encode([QUERY], convert_to_numpy=True, normalize_embeddings=True)[0]
+        # And with the encoder's defaults, which must not change the scores either
+        default_matrix = np.asarray(encoder.encode(DOCUMENTS, convert_to_numpy=True), dtype=np.float32)
+        np.testing.assert_allclose(np.linalg.norm(default_matrix, axis=1), 1.0, rtol=1e-4)
+        results[backend] = NumpyRetriever(matrix, DOCUMENTS).query(query, top_k=len(DOCUMENTS))
+
+    assert [document for document, _ in results["onnx"]] == [document for document, _ in results["torch"]]
+    np.testing.assert_allclose([score for _, score in results["onnx"]],
+                               [score for _, score in results["torch"]], atol=1e-3)
@@ -0,0 +1,73 @@
+# src/components/on-call-coaching/test_llm_cache.py
+"""Talking point cache: tenant isolation, TTL expiry, LRU eviction and the semantic tier."""
+import time
+
+import numpy as np
+
+from llm_cache import TalkingPointCache, context_key, exact_key
+
+MODEL = "gemma2-9b-it"
+CHUNKS = ["chunk-a", "chunk-b"]
+TURNS = [
+    {"role": "sales_rep", "content": "Thanks for taking the call."},
+    {"role": "customer", "content": "How much is the Premium plan?"},
+]
+
+
+def test_keys_ignore_case_punctuation_and_chunk_order():
+    spoken = [{"role": "customer", "content": "how much is the premium plan"}]
+    written = [{"role": "customer", "content": "How much is the Premium plan?"}]
+
+    assert exact_key("acme", MODEL, CHUNKS, spoken) == exact_key("acme", MODEL, CHUNKS[::-1], written)
+    assert context_key(MODEL, CHUNKS) == context_key(MODEL, CHUNKS[::-1])
+
+
+def test_tenants_never_share_entries():
+    cache = TalkingPointCache()
+    acme, globex = exact_key("acme", MODEL, CHUNKS, TURNS), exact_key("globex", MODEL, CHUNKS, TURNS)
+    cache.put("acme", acme, "acme points")
+
+    assert acme != globex
+    assert cache.get("globex", globex) is None
+    # Even a colliding key is not served to another tenant
+    assert cache.get("globex", acme) is None
+    assert cache.get("acme", acme) == "acme points"
+
+
+def test_entries_expire_after_the_ttl():
+    cache = TalkingPointCache(ttl_seconds=0.05)
+    key = exact_key("acme", MODEL, CHUNKS, TURNS)
+    cache.put("acme", key, "points")
+    assert cache.get("acme", key) == "points"
+    time.sleep(0.1)
+
+    assert cache.get("acme", key) is None
+    stats = cache.stats()
+    assert stats["expirations"] == 1
+    assert stats["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TalkingPointCache(max_entries=2)
+    for key in ("a", "b"):
+        cache.put("acme", key, key)
+    cache.get("acme", "a")
+    cache.put("acme", "c", "c")
+
+    assert cache.get("acme", "b") is None
+    assert cache.get("acme", "a") == "a"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_semantic_tier_stays_within_tenant_and_context():
+    cache = TalkingPointCache(semantic_threshold=0.95)
+    context = context_key(MODEL, CHUNKS)
+    embedding = np.array([1.0, 0.0, 0.0])
+    cache.put("acme", "key-1", "points", context=context, embedding=embedding)
+    near = np.array([0.99, 0.05, 0.0])
+
+    assert cache.get("acme", "key-2", context=context, embedding=near) == "points"
+    assert cache.get("globex", "key-2", context=context, embedding=near) is None
+    assert cache.get("acme", "key-2", context=context_key(MODEL, ["chunk-c"]), embedding=near) is None
+    assert cache.get("acme", "key-2", context=context, embedding=np.array([0.0, 1.0, 0.0])) is None
+    assert cache.stats()["semantic_hits"] == 1
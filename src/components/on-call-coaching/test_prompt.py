@@ -0,0 +1,28 @@
+# src/components/on-call-coaching/test_prompt.py
+"""Each turn must appear in the prompt at most once, whatever the verbatim window."""
+import pytest
+
+from prompt import build_prompt
+
+TURNS = [
+    {"role": "customer", "content": f"customer message number {index}"} if index % 2 == 0
+    else {"role": "sales_rep", "content": f"sales rep reply number {index}"}
+    for index in range(8)
+]
+
+
+@pytest.mark.parametrize("keep_turns", [0, 1, 6, 8, 20])
+def test_turns_are_not_duplicated(keep_turns):
+    prompt, stats = build_prompt([("Catalogue chunk.", 0.9)], TURNS, keep_turns=keep_turns)
+    for turn in TURNS:
+        assert prompt.count(turn["content"]) == 1
+    assert stats["turns"] == len(TURNS)
+    assert stats["dropped_turns"] == 0
+
+
+def test_keep_turns_zero_fills_older_turns_within_budget():
+    # Without a verbatim window every turn competes for the budget, newest first
+    prompt, stats = build_prompt([], TURNS, token_budget=200, keep_turns=0)
+    assert stats["turns"] + stats["dropped_turns"] == len(TURNS)
+    assert TURNS[-1]["content"] in prompt
+    assert stats["dropped_turns"] == 0 or TURNS[0]["content"] not in prompt
@@ -0,0 +1,79 @@
+# src/components/on-call-coaching/test_sessions.py
+"""Per-call sessions: the turn ring buffer, summary rollover and eviction."""
+import time
+
+import sessions
+from sessions import CallSession, SessionStore
+
+
+def add_turns(session, count, start=0):
+    for index in range(start, start + count):
+        session.add_turn("customer" if index % 2 == 0 else "sales_rep", f"turn {index}")
+
+
+def test_ring_buffer_keeps_the_latest_turns():
+    session = CallSession("CA1", max_turns=4)
+    add_turns(session, 6)
+
+    assert [turn["content"] for turn in session.history()] == ["turn 2", "turn 3", "turn 4", "turn 5"]
+
+
+def test_turns_dropped_unsummarized_roll_into_the_summary():
+    session = CallSession("CA1", max_turns=4)
+    add_turns(session, 6)
+
+    assert session.summary == "Customer: turn 0\nSales_rep: turn 1"
+    _, turns = session.prompt_state()
+    # Each turn is either in the summary or verbatim, never both
+    assert [turn["content"] for turn in turns] == ["turn 2", "turn 3", "turn 4", "turn 5"]
+
+
+def test_applied_summary_covers_its_backlog():
+    session = CallSession("CA1", max_turns=4)
+    add_turns(session, 4)
+    _, backlog, upto_seq = session.summarization_backlog(keep_turns=1)
+    assert [turn["content"] for turn in backlog] == ["turn 0", "turn 1", "turn 2"]
+
+    assert session.apply_summary("Talked about pricing.", upto_seq)
+    # A late summary covering fewer turns does not replace a newer one
+    assert not session.apply_summary("Stale.", upto_seq - 1)
+    summary, turns = session.prompt_state()
+    assert summary == "Talked about pricing."
+    assert [turn["content"] for turn in turns] == ["turn 3"]
+
+    # Summarized turns leave the buffer without being folded in a second time
+    add_turns(session, 3, start=4)
+    assert session.summary == "Talked about pricing."
+
+
+def test_rollover_keeps_the_summary_bounded(monkeypatch):
+    monkeypatch.setattr(sessions, "SUMMARY_MAX_CHARS", 50)
+    session = CallSession("CA1", max_turns=2)
+    add_turns(session, 20)
+
+    assert len(session.summary) <= 50
+    # The most recent folded turns are the ones kept
+    assert session.summary.endswith("turn 17")
+
+
+def test_store_evicts_least_recently_used_beyond_the_cap():
+    store = SessionStore(max_sessions=2)
+    store.get_or_create("CA1")
+    store.get_or_create("CA2")
+    store.get("CA1")
+    store.get_or_create("CA3")
+
+    assert store.get("CA2") is None
+    assert store.get("CA1") is not None and store.get("CA3") is not None
+
+
+def test_completed_sessions_expire_after_their_ttl():
+    store = SessionStore(completed_ttl=0.05)
+    store.get_or_create("CA1", tenant="acme")
+    store.get_or_create("CA2")
+    store.mark_completed("CA1")
+    time.sleep(0.1)
+
+    assert store.sweep() == 1
+    assert store.get("CA1") is None
+    assert store.get("CA2").tenant == "default"
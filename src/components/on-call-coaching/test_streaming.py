@@ -0,0 +1,46 @@
+# src/components/on-call-coaching/test_streaming.py
+"""Talking point streams: hundreds of thread-held subscribers, and the cap on them."""
+import threading
+
+from streaming import DEFAULT_SERVER_THREADS, TalkingPointBroker
+
+SUBSCRIBERS = 300
+
+
+def test_every_stream_receives_a_publish():
+    broker = TalkingPointBroker()
+    received = []
+    started = threading.Barrier(SUBSCRIBERS + 1)
+
+    def watch():
+        stream = broker.stream("CA1", heartbeat=5)
+        next(stream)  # retry: line, sent once the subscriber is registered
+        started.wait(timeout=10)
+        received.append(next(stream))
+        stream.close()
+
+    threads = [threading.Thread(target=watch, daemon=True) for _ in range(SUBSCRIBERS)]
+    for thread in threads:
+        thread.start()
+    started.wait(timeout=10)
+    assert broker.stats()["open_streams"] == SUBSCRIBERS
+
+    broker.publish("CA1", "talking_points", {"points": ["Mention the annual discount"]})
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert len(received) == SUBSCRIBERS
+    assert all("annual discount" in message for message in received)
+    assert broker.stats()["open_streams"] == 0
+
+
+def test_streams_beyond_the_cap_are_refused():
+    broker = TalkingPointBroker(max_streams=DEFAULT_SERVER_THREADS - 8)
+    streams = [broker.stream("CA1") for _ in range(broker.max_streams)]
+    for stream in streams:
+        next(stream)
+
+    assert not broker.admit()
+    assert broker.stats()["rejected"] == 1
+    streams.pop().close()
+    assert broker.admit()
@@ -0,0 +1,162 @@
+# src/components/on-call-coaching/test_twilio_control.py
+"""The Twilio control plane against mock_twilio: pacing, connection reuse and never dialing twice."""
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from mock_twilio import MockTwilio
+from twilio_control import IdempotencyStore, TwilioControl, TwilioError
+
+ACCOUNT = "ACtest"
+TOKEN = "secret"
+CALL = {"To": "+15550001111", "From": "+15550002222", "Url": "http://example.test/stream"}
+
+
+@pytest.fixture
+def mock():
+    server = MockTwilio(auth_token=TOKEN, cps=10).start()
+    yield server
+    server.stop()
+
+
+def control(mock_or_url, **kwargs):
+    url = getattr(mock_or_url, "url", mock_or_url)
+    return TwilioControl(ACCOUNT, TOKEN, base_url=url, **kwargs)
+
+
+def test_dials_are_paced_to_the_cps_limit(mock):
+    twilio = control(mock, calls_per_second=10, max_connections=4)
+    start = time.monotonic()
+    futures = [twilio.dial(dict(CALL)) for _ in range(15)]
+    sids = [future.result(timeout=10)["sid"] for future in futures]
+    elapsed = time.monotonic() - start
+
+    assert len(set(sids)) == 15
+    # 15 dials spaced 0.1 s apart, and never rejected by the mock's own CPS limit
+    assert elapsed >= 1.3
+    assert mock.stats()["rejected"] == 0
+    assert twilio.stats()["rate_limited"] == 0
+
+
+def test_keep_alive_connections_are_reused(mock):
+    twilio = control(mock, calls_per_second=100, max_connections=2)
+    for _ in range(10):
+        twilio.create_call(**CALL)
+    twilio.end_call("CA1")
+
+    assert mock.stats()["connections"] <= 2
+    assert twilio.stats()["connections_opened"] <= 2
+    assert twilio.stats()["requests"] == 11
+
+
+def test_rate_limited_dials_are_retried_without_redialing():
+    mock = MockTwilio(auth_token=TOKEN, cps=2).start()
+    try:
+        # Unpaced, so the mock answers some creations with Twilio's 429, which Twilio did not act on
+        # Jittered backoff may retry early, so allow enough retries to outlast the mock's bucket
+        twilio = control(mock, calls_per_second=None, max_connections=4, max_retries=10)
+        futures = [twilio.dial(dict(CALL)) for _ in range(4)]
+        sids = [future.result(timeout=30)["sid"] for future in futures]
+    finally:
+        mock.stop()
+
+    assert mock.stats()["rejected"] > 0
+    assert twilio.stats()["retries"] >= mock.stats()["rejected"]
+    assert len(mock.creates()) == len(set(sids)) == 4
+
+
+def test_repeated_idempotency_key_dials_once(mock):
+    twilio = control(mock, calls_per_second=100)
+    first = twilio.dial(dict(CALL), idempotency_key="retry-me")
+    second = twilio.dial(dict(CALL), idempotency_key="retry-me")
+
+    assert first.result(timeout=5)["sid"] == second.result(timeout=5)["sid"]
+    assert len(mock.creates()) == 1
+
+
+def test_idempotency_keys_are_shared_across_processes(mock, tmp_path):
+    # Two controls on one store stand in for two gunicorn workers
+    db = str(tmp_path / "idempotency.sqlite3")
+    slow = MockTwilio(auth_token=TOKEN, latency_seconds=0.3).start()
+    try:
+        first, second = control(slow, idempotency_db=db), control(slow, idempotency_db=db)
+        in_flight = first.dial(dict(CALL), idempotency_key="shared")
+        time.sleep(0.05)
+        # Still being placed by the other worker, so this waits for its result
+        waiting = second.dial(dict(CALL), idempotency_key="shared")
+        assert waiting.result(timeout=5)["sid"] == in_flight.result(timeout=5)["sid"]
+        # And a restarted worker still knows the key
+        restarted = control(slow, idempotency_db=db)
+        assert restarted.dial(dict(CALL), idempotency_key="shared").result(timeout=5)["sid"] == in_flight.result()["sid"]
+    finally:
+        slow.stop()
+
+    assert len(slow.creates()) == 1
+
+
+def test_failed_dial_releases_its_shared_key(mock, tmp_path):
+    db = str(tmp_path / "idempotency.sqlite3")
+    unauthorized = TwilioControl(ACCOUNT, "wrong", base_url=mock.url, idempotency_db=db)
+    with pytest.raises(TwilioError) as error:
+        unauthorized.dial(dict(CALL), idempotency_key="fails").result(timeout=5)
+    assert error.value.status == 401
+
+    assert IdempotencyStore(db).claim("fails") == ("new", None)
+
+
+def test_call_creation_is_not_resent_on_a_dropped_connection():
+    """A server that advertises keep-alive, then drops each connection after one response."""
+    received = []
+    listener = socket.create_server(("127.0.0.1", 0))
+    listener.settimeout(5)
+
+    def serve():
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                return
+            data = b""
+            while b"\r\n\r\n" not in data:
+                data += connection.recv(65536)
+            head, _, body = data.partition(b"\r\n\r\n")
+            length = int(next(line.split(b":")[1] for line in head.split(b"\r\n")
+                              if line.lower().startswith(b"content-length")))
+            while len(body) < length:
+                body += connection.recv(65536)
+            received.append(head.split(b" ")[1].decode())
+            payload = json.dumps({"sid": f"CA{len(received)}", "status": "queued"}).encode()
+            connection.sendall(b"HTTP/1.1 201 Created\r\nContent-Type: application/json\r\n"
+                               b"Content-Length: %d\r\n\r\n" % len(payload) + payload)
+            time.sleep(0.05)
+            connection.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    twilio = control(f"http://127.0.0.1:{listener.getsockname()[1]}", calls_per_second=100, max_connections=1)
+    try:
+        twilio.create_call(**CALL)
+        time.sleep(0.2)
+        # The closed idle connection is noticed before use, so this dial opens a fresh one
+        twilio.create_call(**CALL)
+        assert twilio.stats()["reconnects"] == 1
+
+        # If the drop is only noticed mid-request, a creation is not repeated, a hang-up is
+        time.sleep(0.2)
+        pool = twilio._pool
+        probe = pool._idle_connection
+        pool._idle_connection = lambda: (pool._idle.get_nowait(), True)
+        with pytest.raises(OSError):
+            twilio.create_call(**CALL)
+        assert len(received) == 2
+
+        pool._idle_connection = probe
+        twilio.create_call(**CALL)
+        time.sleep(0.2)
+        pool._idle_connection = lambda: (pool._idle.get_nowait(), True)
+        assert twilio.end_call("CA3")["sid"] == "CA4"
+        assert len(received) == 4
+    finally:
+        listener.close()
@@ -0,0 +1,54 @@
+# src/components/on-call-coaching/test_twiml.py
+"""Prebuilt TwiML: same documents as building them per request, with request values escaped."""
+import xml.etree.ElementTree as ET
+
+from twiml import NO_CUSTOMER_NUMBER, StreamTemplate, dial_status_response
+
+BASE_URL = "https://coach.example.com"
+CALLER_ID = "+15550000000"
+
+
+def test_stream_twiml_matches_the_per_request_document():
+    twiml = StreamTemplate(BASE_URL, CALLER_ID).render("+15551234567", "acme")
+
+    assert twiml.decode("utf-8") == f"""<?xml version="1.0" encoding="UTF-8"?>
+<Response>
+    <Start>
+        <Transcription statusCallbackUrl="{BASE_URL}/transcription?catalogue=acme" partialResults="true" track="both_tracks"/>
+    </Start>
+    <Say>Connecting you to the customer now. Please wait.</Say>
+    <Dial callerId="{CALLER_ID}" timeout="30" action="{BASE_URL}/dial_status" method="POST">
+        <Number>+15551234567</Number>
+    </Dial>
+</Response>"""
+
+
+def test_stream_twiml_without_a_catalogue():
+    root = ET.fromstring(StreamTemplate(BASE_URL, CALLER_ID).render("+15551234567"))
+
+    assert root.find("Start/Transcription").get("statusCallbackUrl") == f"{BASE_URL}/transcription"
+
+
+def test_request_values_are_escaped():
+    number = '+1555</Number><Dial>"&'
+    root = ET.fromstring(StreamTemplate(BASE_URL, 'Sales "&" <Team>').render(number))
+
+    assert root.find("Dial/Number").text == number
+    assert root.find("Dial").get("callerId") == 'Sales "&" <Team>'
+    assert len(root.findall("Dial")) == 1
+
+
+def test_dial_status_responses():
+    def said(twiml):
+        root = ET.fromstring(twiml)
+        assert root.find("Hangup") is not None
+        return root.find("Say").text
+
+    assert said(dial_status_response("completed")) == "The customer has disconnected. Goodbye."
+    assert said(dial_status_response("failed", "21211")).startswith("The call to the customer failed. The phone number")
+    assert "error code 99999" in said(dial_status_response("failed", "99999"))
+    assert said(dial_status_response("<canceled>")) == "Call status was <canceled>. Ending the call now."
+    assert said(NO_CUSTOMER_NUMBER).startswith("Error: No customer number provided.")
+    # Prebuilt and cached responses are reused, not rebuilt
+    assert dial_status_response("busy") is dial_status_response("busy")
+    assert dial_status_response("canceled") is dial_status_response("canceled")
@@ -0,0 +1,80 @@
+# src/components/on-call-coaching/test_worker.py
+"""The utterance worker: one run at a time per call, newest item per slot, bounded calls."""
+import threading
+
+from worker import UtteranceWorker
+
+
+class BlockingHandler:
+    """Records (call_sid, item) and holds each call's first run until released."""
+
+    def __init__(self):
+        self.handled = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, call_sid, item):
+        with self._lock:
+            self.handled.append((call_sid, item))
+        self.started.set()
+        self.release.wait(timeout=5)
+
+
+def test_waiting_items_are_coalesced_per_slot():
+    handler = BlockingHandler()
+    worker = UtteranceWorker(handler, max_workers=2)
+    worker.submit("CA1", "final 1", slot="final")
+    assert handler.started.wait(timeout=5)
+
+    # The call is busy, so these wait; each slot keeps only its newest item
+    worker.submit("CA1", "partial 1", slot="partial")
+    worker.submit("CA1", "final 2", slot="final")
+    worker.submit("CA1", "final 3", slot="final")
+    worker.submit("CA1", "partial 2", slot="partial")
+    handler.release.set()
+
+    assert worker.drain(timeout=5)
+    # Waiting slots run in the order of their newest submission
+    assert handler.handled == [("CA1", "final 1"), ("CA1", "final 3"), ("CA1", "partial 2")]
+    stats = worker.stats()
+    assert stats["coalesced"] == 2
+    assert stats["processed"] == 3
+    assert stats["active_calls"] == stats["pending_calls"] == 0
+    worker.shutdown()
+
+
+def test_calls_beyond_max_pending_are_rejected():
+    handler = BlockingHandler()
+    worker = UtteranceWorker(handler, max_workers=1, max_pending=2)
+    assert worker.submit("CA1", "a")
+    assert worker.submit("CA2", "b")
+    assert not worker.submit("CA3", "c")
+    # A busy call still accepts items; they do not add to the number of calls
+    assert worker.submit("CA1", "d")
+
+    assert not worker.drain(timeout=0.05)
+    handler.release.set()
+    assert worker.drain(timeout=5)
+    assert worker.stats()["rejected"] == 1
+    assert sorted(item for _, item in handler.handled) == ["a", "b", "d"]
+    worker.shutdown()
+
+
+def test_a_failing_item_does_not_stop_the_call():
+    handled = []
+
+    def handler(call_sid, item):
+        handled.append(item)
+        if item == "bad":
+            raise RuntimeError("boom")
+
+    worker = UtteranceWorker(handler)
+    worker.submit("CA1", "bad")
+    assert worker.drain(timeout=5)
+    worker.submit("CA1", "good")
+    assert worker.drain(timeout=5)
+
+    assert handled == ["bad", "good"]
+    assert worker.stats()["failed"] == 1
+    worker.shutdown()
@@ -0,0 +1,531 @@
+# src/components/on-call-coaching/twilio_control.py
+"""
+Pooled, rate-limited access to the Twilio Calls REST API.
+
+Call creation and hang-up go straight to the REST endpoints over a small pool
+of keep-alive connections, so a burst of dials reuses a few TLS sessions
+instead of opening one per request. Outbound calls are spaced to the
+account's calls-per-second limit on the client side, and each dial may carry
+an idempotency key: a retried request with the same key gets the first
+request's result rather than a second call. With an IdempotencyStore the keys
+are kept in a SQLite file, so a retry that reaches another worker process on
+the host, or arrives after a restart, is not dialed again either. Keys are
+not shared across hosts, and Twilio's Calls API has no idempotency of its own.
+
+The API base URL is configurable, so everything here can be exercised
+against mock_twilio.py instead of api.twilio.com.
+"""
+import base64
+import http.client
+import itertools
+import json
+import os
+import queue
+import random
+import selectors
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+from logs import log
+
+DEFAULT_API_BASE_URL = "https://api.twilio.com"
+API_VERSION = "2010-04-01"
+# Twilio's default outbound calls-per-second limit for an account
+DEFAULT_CALLS_PER_SECOND = 1.0
+DEFAULT_MAX_CONNECTIONS = 8
+DEFAULT_TIMEOUT_SECONDS = 15.0
+DEFAULT_MAX_RETRIES = 3
+# Dials kept per idempotency key, so a retry within this window is not dialed again
+DEFAULT_IDEMPOTENCY_TTL_SECONDS = 24 * 3600
+DEFAULT_MAX_IDEMPOTENCY_KEYS = 10000
+# How long a retry waits for a dial with its key that another process is placing
+DEFAULT_IDEMPOTENCY_WAIT_SECONDS = 15 * 60
+IDEMPOTENCY_POLL_SECONDS = 0.1
+# Batches kept for GET /make_calls/<batch_id>, oldest dropped first
+DEFAULT_MAX_BATCHES = 100
+# Safe to repeat for any request: Twilio did not act on it
+RETRYABLE_STATUSES = {429}
+# Also safe to repeat for a status update, which is idempotent
+RETRYABLE_UPDATE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TwilioError(Exception):
+    """A failed Twilio REST request, with Twilio's error code when it sent one."""
+
+    def __init__(self, status, message, code=None, retry_after=None):
+        super().__init__(f"Twilio returned {status}: {message}")
+        self.status = status
+        self.code = code
+        self.message = message
+        self.retry_after = retry_after
+
+
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections to one host, each used by one request at a time."""
+
+    def __init__(self, base_url, size=DEFAULT_MAX_CONNECTIONS, timeout=DEFAULT_TIMEOUT_SECONDS):
+        parts = urlsplit(base_url)
+        self._connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self._host = parts.hostname
+        self._port = parts.port
+        self._timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "connections_opened": 0, "reconnects": 0}
+
+    def request(self, method, path, body=None, headers=None, idempotent=False):
+        """
+        (status, headers, body bytes). Idle connections the server has already
+        closed are discarded before use. If a reused connection still drops
+        mid-request, only an idempotent request is retried on a fresh one: a
+        call creation may have reached Twilio, so repeating it could dial twice.
+        """
+        with self._slots:
+            connection, reused = self._idle_connection()
+            with self._lock:
+                self._counters["requests"] += 1
+            try:
+                status, response_headers, data = self._send(connection, method, path, body, headers)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                if not (reused and idempotent):
+                    raise
+                # Most likely closed while it sat idle, and safe to repeat either way
+                with self._lock:
+                    self._counters["reconnects"] += 1
+                connection = self._open()
+                try:
+                    status, response_headers, data = self._send(connection, method, path, body, headers)
+                except Exception:
+                    connection.close()
+                    raise
+            except Exception:
+                connection.close()
+                raise
+            if response_headers.get("connection", "").lower() == "close":
+                connection.close()
+            else:
+                self._idle.put(connection)
+            return status, response_headers, data
+
+    def _idle_connection(self):
+        """(connection, reused), skipping idle connections the server has closed."""
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return self._open(), False
+            # An idle keep-alive socket is only readable once the server has closed it
+            if connection.sock is not None and not _readable(connection.sock):
+                return connection, True
+            connection.close()
+            with self._lock:
+                self._counters["reconnects"] += 1
+
+    def _open(self):
+        with self._lock:
+            self._counters["connections_opened"] += 1
+        return self._connection_class(self._host, self._port, timeout=self._timeout)
+
+    @staticmethod
+    def _send(connection, method, path, body, headers):
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        data = response.read()
+        return response.status, {key.lower(): value for key, value in response.getheaders()}, data
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "idle_connections": self._idle.qsize()}
+
+
+class IdempotencyStore:
+    """
+    Idempotency keys in a SQLite file shared by the processes on a host. A key
+    has no resource while its dial runs and the call resource once it is
+    placed; a failed dial deletes its key so it can be retried.
+    """
+
+    def __init__(self, path, ttl_seconds=DEFAULT_IDEMPOTENCY_TTL_SECONDS):
+        self.path = path
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._connection = None
+        # SQLite connections must not be used across fork; each process opens its own
+        self._pid = None
+
+    def _db(self):
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS dials (key TEXT PRIMARY KEY, resource TEXT, created_at REAL NOT NULL)")
+            self._pid = os.getpid()
+        return self._connection
+
+    def claim(self, key):
+        """("new", None) if this process must dial, ("done", resource), or ("pending", None) if another is dialing."""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM dials WHERE created_at < ?", (now - self._ttl,))
+            if db.execute("INSERT OR IGNORE INTO dials (key, created_at) VALUES (?, ?)", (key, now)).rowcount:
+                return "new", None
+            row = db.execute("SELECT resource FROM dials WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            # Failed and deleted in between
+            return self.claim(key)
+        return ("done", json.loads(row[0])) if row[0] is not None else ("pending", None)
+
+    def complete(self, key, resource):
+        with self._lock:
+            self._db().execute("UPDATE dials SET resource = ? WHERE key = ?", (json.dumps(resource), key))
+
+    def forget(self, key):
+        with self._lock:
+            self._db().execute("DELETE FROM dials WHERE key = ? AND resource IS NULL", (key,))
+
+    def wait(self, key, timeout=DEFAULT_IDEMPOTENCY_WAIT_SECONDS):
+        """The resource of a dial another process is placing; TwilioError if it fails or outlasts timeout."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                row = self._db().execute("SELECT resource FROM dials WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                raise TwilioError(409, "The dial with this idempotency key failed; it can be retried")
+            if row[0] is not None:
+                return json.loads(row[0])
+            time.sleep(IDEMPOTENCY_POLL_SECONDS)
+        raise TwilioError(409, "A dial with this idempotency key is still in progress")
+
+
+class IdempotencyCache:
+    """
+    Futures of dials by idempotency key. A repeated key gets the original
+    future, whether it is still in flight or done. Failed dials are forgotten,
+    so the caller can retry them. With a store, keys claimed by other
+    processes are honoured too.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_IDEMPOTENCY_TTL_SECONDS, max_entries=DEFAULT_MAX_IDEMPOTENCY_KEYS,
+                 store=None):
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._store = store
+        self._lock = threading.Lock()
+        # key -> (future, created_at), oldest first
+        self._entries = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0, "shared_hits": 0}
+
+    def claim(self, key):
+        """(future, True) for a new key, which the caller must complete, or (existing future, False)."""
+        now = time.monotonic()
+        with self._lock:
+            while self._entries and (len(self._entries) >= self._max_entries
+                                     or now - next(iter(self._entries.values()))[1] > self._ttl):
+                self._entries.popitem(last=False)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._counters["hits"] += 1
+                return entry[0], False
+            state, resource = self._store.claim(key) if self._store is not None else ("new", None)
+            future = Future()
+            self._entries[key] = (future, now)
+            if state == "new":
+                self._counters["misses"] += 1
+            else:
+                self._counters["shared_hits"] += 1
+        if state == "done":
+            future.set_result(resource)
+        elif state == "pending":
+            threading.Thread(target=self._wait_for_other, args=(key, future), name="twilio-idempotency",
+                             daemon=True).start()
+        future.add_done_callback(lambda done: (done.cancelled() or done.exception() is not None)
+                                 and self._forget(key, done))
+        return future, state == "new"
+
+    def finish(self, key, resource=None):
+        """
+        Record the outcome of a dial this process claimed, before its future
+        is resolved, so a retry that follows at once sees it. None means it failed.
+        """
+        if resource is None:
+            with self._lock:
+                self._entries.pop(key, None)
+        if self._store is None:
+            return
+        try:
+            if resource is None:
+                self._store.forget(key)
+            else:
+                self._store.complete(key, resource)
+        except sqlite3.Error as e:
+            # The caller still gets its result; only other processes miss this key
+            log.error("idempotency_store_failed", key=key, error=str(e))
+
+    def _wait_for_other(self, key, future):
+        try:
+            future.set_result(self._store.wait(key))
+        except Exception as e:
+            future.set_exception(e)
+
+    def _forget(self, key, future):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is future:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "keys": len(self._entries)}
+
+
+class DialBatch:
+    """Progress of one /make_calls request."""
+
+    def __init__(self, batch_id, size):
+        self.batch_id = batch_id
+        self.created_at = time.time()
+        self._lock = threading.Lock()
+        self._results = [{"status": "queued"} for _ in range(size)]
+
+    def set(self, index, result):
+        with self._lock:
+            self._results[index] = result
+
+    def to_dict(self):
+        with self._lock:
+            results = [dict(result, index=index) for index, result in enumerate(self._results)]
+        counts = {}
+        for result in results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        return {
+            "batch_id": self.batch_id,
+            "created_at": self.created_at,
+            "done": counts.get("queued", 0) == 0,
+            "counts": counts,
+            "calls": results,
+        }
+
+
+class TwilioControl:
+    """
+    Creates and ends calls for one Twilio account. Dials are run on a thread
+    pool, so a batch returns at once and proceeds at the configured
+    calls-per-second rate.
+    """
+
+    def __init__(self, account_sid, auth_token, base_url=DEFAULT_API_BASE_URL,
+                 calls_per_second=DEFAULT_CALLS_PER_SECOND, max_connections=DEFAULT_MAX_CONNECTIONS,
+                 timeout=DEFAULT_TIMEOUT_SECONDS, max_retries=DEFAULT_MAX_RETRIES,
+                 idempotency_ttl=DEFAULT_IDEMPOTENCY_TTL_SECONDS, max_batches=DEFAULT_MAX_BATCHES,
+                 idempotency_db=None):
+        self._calls_path = f"/{API_VERSION}/Accounts/{account_sid}/Calls"
+        credentials = base64.b64encode(f"{account_sid}:{auth_token}".encode()).decode()
+        self._headers = {
+            "Authorization": f"Basic {credentials}",
+            "Accept": "application/json",
+            "Content-Type": "application/x-www-form-urlencoded",
+        }
+        self._pool = ConnectionPool(base_url, size=max_connections, timeout=timeout)
+        self._interval = 1.0 / calls_per_second if calls_per_second else 0.0
+        self._max_retries = max_retries
+        # Without idempotency_db, keys only dedupe retries that reach this process
+        store = IdempotencyStore(idempotency_db, ttl_seconds=idempotency_ttl) if idempotency_db else None
+        self._idempotency = IdempotencyCache(ttl_seconds=idempotency_ttl, store=store)
+        # Dials mostly wait on the rate limit, so one thread per connection is enough
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="twilio-dial")
+        self._lock = threading.Lock()
+        self._next_dial = 0.0
+        self._max_batches = max_batches
+        self._batches = OrderedDict()
+        self._queued = 0
+        self._counters = {"dials": 0, "dial_failures": 0, "hangups": 0, "hangup_failures": 0, "retries": 0,
+                          "rate_limited": 0, "batches": 0}
+        self._rate_wait_seconds_total = 0.0
+
+    # --- Calls ---
+    def create_call(self, idempotency_key=None, **params):
+        """
+        Create a call and return Twilio's call resource as a dict. params are
+        Twilio's Calls parameters (To, From, Url, StatusCallback, ...); list
+        values are sent as repeated fields.
+        """
+        return self.dial(params, idempotency_key).result()
+
+    def dial(self, params, idempotency_key=None):
+        """Queue a call and return a Future of its call resource."""
+        if idempotency_key is None:
+            future, new = Future(), True
+        else:
+            future, new = self._idempotency.claim(idempotency_key)
+        if new:
+            with self._lock:
+                self._queued += 1
+            self._executor.submit(self._run_dial, future, params, idempotency_key)
+        return future
+
+    def dial_batch(self, calls, on_done=None):
+        """
+        Queue (params, idempotency_key) pairs in order. An entry that is a dict
+        instead is an error found by the caller, recorded as rejected so batch
+        positions match the request. on_done(index, resource) runs for each
+        dial that succeeds. Returns the DialBatch tracking them.
+        """
+        batch = DialBatch(uuid.uuid4().hex, len(calls))
+        with self._lock:
+            self._batches[batch.batch_id] = batch
+            while len(self._batches) > self._max_batches:
+                self._batches.popitem(last=False)
+            self._counters["batches"] += 1
+        for index, call in enumerate(calls):
+            if isinstance(call, dict):
+                batch.set(index, {"status": "rejected", **call})
+                continue
+            params, idempotency_key = call
+            future = self.dial(params, idempotency_key)
+            future.add_done_callback(lambda done, index=index, to=params.get("To"):
+                                     self._record_batch_result(batch, index, to, done, on_done))
+        return batch
+
+    def _record_batch_result(self, batch, index, to, future, on_done):
+        error = future.exception()
+        if error is not None:
+            batch.set(index, {"status": "failed", "to": to, "error": str(error)})
+            return
+        resource = future.result()
+        result = {"status": "dialed", "to": to, "call_sid": resource.get("sid")}
+        try:
+            if on_done is not None:
+                on_done(index, resource)
+        except Exception as e:
+            # The call was placed regardless; a failing callback must not leave the entry queued
+            log.error("dial_batch_callback_failed", batch_id=batch.batch_id, index=index,
+                      call_sid=resource.get("sid"), error=str(e))
+            result["callback_error"] = str(e)
+        finally:
+            batch.set(index, result)
+
+    def batch(self, batch_id):
+        with self._lock:
+            return self._batches.get(batch_id)
+
+    def _run_dial(self, future, params, idempotency_key):
+        if not future.set_running_or_notify_cancel():
+            if idempotency_key is not None:
+                self._idempotency.finish(idempotency_key)
+            return
+        try:
+            resource = self._request("POST", f"{self._calls_path}.json", params, RETRYABLE_STATUSES,
+                                     rate_limited=True)
+        except BaseException as e:
+            with self._lock:
+                self._counters["dial_failures"] += 1
+                self._queued -= 1
+            if idempotency_key is not None:
+                self._idempotency.finish(idempotency_key)
+            future.set_exception(e)
+            return
+        with self._lock:
+            self._counters["dials"] += 1
+            self._queued -= 1
+        if idempotency_key is not None:
+            self._idempotency.finish(idempotency_key, resource)
+        future.set_result(resource)
+
+    def end_call(self, call_sid):
+        """Hang up a call; returns the updated call resource."""
+        try:
+            resource = self._request("POST", f"{self._calls_path}/{call_sid}.json", {"Status": "completed"},
+                                     RETRYABLE_UPDATE_STATUSES, idempotent=True)
+        except Exception:
+            with self._lock:
+                self._counters["hangup_failures"] += 1
+            raise
+        with self._lock:
+            self._counters["hangups"] += 1
+        return resource
+
+    # --- Transport ---
+    def _request(self, method, path, params, retryable_statuses, rate_limited=False, idempotent=False):
+        """
+        A call creation is not idempotent: after a connection error it may
+        have been placed, so it is never repeated here and the error reaches
+        the caller, who can check the account's calls before dialing again.
+        """
+        body = urlencode([(key, item) for key, value in params.items() if value is not None
+                          for item in (value if isinstance(value, (list, tuple)) else [value])]).encode()
+        for attempt in itertools.count():
+            if rate_limited:
+                self._wait_for_dial_slot()
+            try:
+                status, headers, data = self._pool.request(method, path, body=body, headers=self._headers,
+                                                           idempotent=idempotent)
+            except OSError:
+                if not idempotent or attempt >= self._max_retries:
+                    raise
+                self._sleep_before_retry(attempt, None)
+                continue
+            if status < 300:
+                return json.loads(data) if data else {}
+            error = _twilio_error(status, headers, data)
+            if status == 429:
+                with self._lock:
+                    self._counters["rate_limited"] += 1
+            if status not in retryable_statuses or attempt >= self._max_retries:
+                raise error
+            self._sleep_before_retry(attempt, error.retry_after)
+
+    def _wait_for_dial_slot(self):
+        """Space dials 1 / calls_per_second apart across all threads."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_dial)
+            self._next_dial = start + self._interval
+            self._rate_wait_seconds_total += start - now
+        if start > now:
+            time.sleep(start - now)
+
+    def _sleep_before_retry(self, attempt, retry_after):
+        with self._lock:
+            self._counters["retries"] += 1
+        # Full jitter, but never sooner than Twilio asked
+        delay = random.uniform(0, min(8.0, 0.5 * 2 ** attempt))
+        time.sleep(max(delay, retry_after or 0.0))
+
+    def stats(self):
+        with self._lock:
+            dials = self._counters["dials"] + self._counters["dial_failures"]
+            return {
+                **self._counters,
+                "queued": self._queued,
+                "avg_rate_wait_ms": round(1000 * self._rate_wait_seconds_total / dials, 3) if dials else 0.0,
+                **self._pool.stats(),
+                **{f"idempotency_{key}": value for key, value in self._idempotency.stats().items()},
+            }
+
+
+def _readable(sock):
+    """Zero-timeout read probe; a selector, since select() fails for descriptors of 1024 and above."""
+    with selectors.DefaultSelector() as selector:
+        selector.register(sock, selectors.EVENT_READ)
+        return bool(selector.select(0))
+
+
+def _twilio_error(status, headers, data):
+    try:
+        payload = json.loads(data)
+    except ValueError:
+        payload = {}
+    try:
+        retry_after = float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        retry_after = None
+    message = payload.get("message") or data.decode("utf-8", "replace")[:200] or http.client.responses.get(status, "")
+    return TwilioError(status, message, code=payload.get("code"), retry_after=retry_after)
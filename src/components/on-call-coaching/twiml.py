@@ -0,0 +1,88 @@
+# src/components/on-call-coaching/twiml.py
+"""
+TwiML responses for the call-control webhooks, built once instead of per request.
+
+Twilio waits on these webhooks during call setup, so the static responses are
+encoded to bytes at import, and the few that depend on the request are filled
+into pre-escaped templates or cached. Every value from a request or the
+environment is XML-escaped.
+"""
+from functools import lru_cache
+from xml.sax.saxutils import escape, quoteattr
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+# Distinct (status, error code) and catalogue values are few; the cap bounds spoofed ones
+CACHE_SIZE = 256
+
+
+def say_and_hangup(message):
+    """A response that speaks message and hangs up, as UTF-8 bytes."""
+    return (f"{XML_HEADER}<Response>\n    <Say>{escape(message)}</Say>\n    <Hangup/>\n</Response>").encode("utf-8")
+
+NO_CUSTOMER_NUMBER = say_and_hangup("Error: No customer number provided. Please check the configuration.")
+
+DIAL_STATUS_RESPONSES = {
+    "completed": say_and_hangup("The customer has disconnected. Goodbye."),
+    "busy": say_and_hangup("The customer's line is busy. Please try again later."),
+    "no-answer": say_and_hangup("The customer did not answer."),
+}
+
+DIAL_FAILED_PREFIX = "The call to the customer failed. "
+# Common Twilio error codes for a failed dial, explained to the sales agent
+DIAL_ERROR_MESSAGES = {
+    "21211": "The phone number appears to be invalid. Please check the number and try again.",
+    "21217": "This account does not have permission to call this region. Please enable the correct geographic permissions in your Twilio console.",
+    "21614": "The customer's number is not a verified number for your trial account. You must verify the number in your Twilio console before calling.",
+}
+DIAL_FAILED_RESPONSES = {
+    code: say_and_hangup(DIAL_FAILED_PREFIX + message) for code, message in DIAL_ERROR_MESSAGES.items()
+}
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _dial_failed(error_code):
+    return say_and_hangup(
+        f"{DIAL_FAILED_PREFIX}Twilio reported error code {error_code}. "
+        "Please check the call logs in your Twilio console for more details."
+    )
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _dial_other(status):
+    # Handles other statuses like 'canceled'
+    return say_and_hangup(f"Call status was {status}. Ending the call now.")
+
+def dial_status_response(status, error_code=None):
+    """TwiML for a /dial_status callback with DialCallStatus status."""
+    if status == "failed":
+        return DIAL_FAILED_RESPONSES.get(error_code) or _dial_failed(error_code)
+    return DIAL_STATUS_RESPONSES.get(status) or _dial_other(status)
+
+
+class StreamTemplate:
+    """
+    TwiML that starts transcription and dials the customer. Everything but the
+    transcription callback and the customer number is fixed per process and
+    escaped once.
+    """
+
+    def __init__(self, base_url, caller_id):
+        self._transcription_url = f"{base_url}/transcription"
+        self._before_callback = f'{XML_HEADER}<Response>\n    <Start>\n        <Transcription statusCallbackUrl='
+        self._before_number = (
+            ' partialResults="true" track="both_tracks"/>\n'
+            '    </Start>\n'
+            '    <Say>Connecting you to the customer now. Please wait.</Say>\n'
+            f'    <Dial callerId={quoteattr(caller_id or "")} timeout="30" '
+            f'action={quoteattr(f"{base_url}/dial_status")} method="POST">\n'
+            '        <Number>'
+        )
+        self._after_number = '</Number>\n    </Dial>\n</Response>'
+        self.callback = lru_cache(maxsize=CACHE_SIZE)(self._callback)
+
+    def _callback(self, catalogue):
+        # The catalogue rides along on transcription callbacks so it survives a restart
+        url = f"{self._transcription_url}?catalogue={catalogue}" if catalogue else self._transcription_url
+        return self._before_callback + quoteattr(url) + self._before_number
+
+    def render(self, customer_number, catalogue=None):
+        """Response bytes; catalogue must already be validated."""
+        return (self.callback(catalogue) + escape(customer_number) + self._after_number).encode("utf-8")
@@ -0,0 +1,67 @@
+# src/components/on-call-coaching/warmup.py
+"""
+Background initialization of the server's heavy resources.
+
+The embedding model and catalogue index take seconds to load, so they are
+loaded on a background thread after the server starts listening. Liveness
+only needs the process to answer; readiness waits for the warm-up to finish.
+"""
+import threading
+import time
+
+from logs import log
+
+
+class Warmup:
+    """Runs load() once on a background thread and tracks its progress."""
+
+    def __init__(self, load, name="warmup"):
+        self._load = load
+        self._name = name
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = None
+        self.state = "pending"
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def start(self):
+        """Start loading in the background. Returns False if already started."""
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self.state = "loading"
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self):
+        try:
+            self._load()
+            self.state = "ready"
+        except Exception as e:
+            log.error("warmup_failed", error=str(e))
+            self.error = str(e)
+            self.state = "failed"
+        finally:
+            self.finished_at = time.time()
+            self._done.set()
+
+    def wait(self, timeout=None):
+        """Block until warm-up has finished. Returns True if it succeeded."""
+        self._done.wait(timeout)
+        return self.ready
+
+    def stats(self):
+        finished_at = self.finished_at
+        return {
+            "state": self.state,
+            "error": self.error,
+            "load_seconds": round(finished_at - self.started_at, 3) if finished_at and self.started_at else None,
+        }
@@ -0,0 +1,109 @@
+# src/components/on-call-coaching/worker.py
+"""Background processing of final utterances, off the Twilio webhook path."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from logs import log
+
+# Number of calls that can be processed concurrently
+DEFAULT_MAX_WORKERS = 4
+# Maximum number of calls with queued or running work before new calls are rejected
+DEFAULT_MAX_PENDING = 256
+
+
+class UtteranceWorker:
+    """
+    Runs handler(call_sid, item) on a thread pool, at most once at a time per call.
+
+    If new items arrive for a call while its handler is running, only the newest
+    one per slot is kept and processed when the current run finishes; older ones
+    in the same slot are coalesced away. Waiting items run in the order their
+    newest submission arrived. The number of calls with outstanding work is
+    bounded, and submit() returns False instead of queueing once the bound is
+    reached.
+    """
+
+    def __init__(self, handler, max_workers=DEFAULT_MAX_WORKERS, max_pending=DEFAULT_MAX_PENDING):
+        self._handler = handler
+        self._max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="utterance")
+        self._lock = threading.Lock()
+        # Notified when the last call with outstanding work finishes
+        self._idle = threading.Condition(self._lock)
+        # call_sid -> {slot: newest item in that slot}, waiting for the current run of that call to finish
+        self._pending = {}
+        # call_sids that have a run scheduled or in progress
+        self._active = set()
+        self._counters = {
+            "submitted": 0,
+            "coalesced": 0,
+            "rejected": 0,
+            "processed": 0,
+            "failed": 0,
+        }
+        self._max_depth_seen = 0
+        self._wait_seconds_total = 0.0
+
+    def submit(self, call_sid, item, slot=None):
+        """
+        Queue item for call_sid, replacing a waiting item in the same slot.
+        Returns False if rejected due to backpressure.
+        """
+        with self._lock:
+            self._counters["submitted"] += 1
+            if call_sid in self._active:
+                slots = self._pending.setdefault(call_sid, {})
+                if slots.pop(slot, None) is not None:
+                    self._counters["coalesced"] += 1
+                slots[slot] = (item, time.monotonic())
+                return True
+            if len(self._active) >= self._max_pending:
+                self._counters["rejected"] += 1
+                return False
+            self._active.add(call_sid)
+            self._max_depth_seen = max(self._max_depth_seen, len(self._active))
+        self._executor.submit(self._run, call_sid, item, time.monotonic())
+        return True
+
+    def _run(self, call_sid, item, queued_at):
+        while True:
+            with self._lock:
+                self._wait_seconds_total += time.monotonic() - queued_at
+            try:
+                self._handler(call_sid, item)
+                outcome = "processed"
+            except Exception as e:
+                log.error("utterance_failed", call_sid=call_sid, error=str(e))
+                outcome = "failed"
+            with self._lock:
+                self._counters[outcome] += 1
+                slots = self._pending.get(call_sid)
+                if not slots:
+                    self._pending.pop(call_sid, None)
+                    self._active.discard(call_sid)
+                    if not self._active:
+                        self._idle.notify_all()
+                    return
+                item, queued_at = slots.pop(next(iter(slots)))
+
+    def drain(self, timeout=None):
+        """Wait until no call has queued or running work. Returns False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._active, timeout)
+
+    def stats(self):
+        """Queue depth and throughput counters for monitoring backpressure."""
+        with self._lock:
+            runs = self._counters["processed"] + self._counters["failed"]
+            return {
+                **self._counters,
+                "active_calls": len(self._active),
+                "pending_calls": len(self._pending),
+                "max_pending": self._max_pending,
+                "max_depth_seen": self._max_depth_seen,
+                "avg_wait_ms": round(1000 * self._wait_seconds_total / runs, 2) if runs else 0.0,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -1,48 +1,290 @@
 #!/usr/bin/env python3
+"""
+Upload the Together AI formatted conversations as Parquet shards.
 
-from datasets import Dataset, DatasetDict
-from huggingface_hub import HfApi
+The JSONL is streamed into fixed-size shards, so memory is bounded by one
+shard. Each shard is named by position and identified by the SHA-256 of its
+input lines; a re-run rebuilds and uploads only the shards whose hash
+changed. Progress is saved after every shard, so an interrupted upload
+resumes where it stopped.
+
+    python upload_to_hf.py                                  # Hugging Face Hub
+    python upload_to_hf.py --endpoint http://localhost:8080 # local hub stand-in
+    python upload_to_hf.py --local-dir /data/published      # plain directory
+"""
+import argparse
+import hashlib
 import json
 import os
+import shutil
+
+# orjson is several times faster than json when it is installed
+try:
+    import orjson
+
+    def loads(line):
+        return orjson.loads(line)
+
+    def dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)
+except ImportError:
+    def loads(line):
+        return json.loads(line)
+
+    def dumps(obj):
+        return json.dumps(obj, indent=2, sort_keys=True).encode('utf-8')
+
+INPUT_PATH = 'sales-conversations-data/train_together_format.jsonl'
+STAGING_DIR = 'sales-conversations-data/hf-shards'
+REPO_ID = "consuelo-sales-conversations"
+SPLIT = 'train'
+DEFAULT_SHARD_ROWS = 50000
+MANIFEST_FILE = 'manifest.json'
+# Upload progress per target, kept next to the staged shards
+STATE_FILE = 'upload_state.json'
+# Part of every shard hash; bump when the Parquet layout changes
+SHARD_FORMAT_VERSION = 1
 
-def upload_dataset():
-    print("Loading the formatted dataset...")
-    
-    # Load the Together AI formatted data
-    conversations = []
-    with open('sales-conversations-data/train_together_format.jsonl', 'r') as f:
+# ============================================================================
+# SHARDS
+# ============================================================================
+
+def iter_shards(input_path, shard_rows):
+    """(index, lines, sha256) per shard of shard_rows input lines; blank lines are skipped."""
+    index, lines = 0, []
+    with open(input_path, 'rb') as f:
         for line in f:
-            conversations.append(json.loads(line))
-    
-    print(f"Loaded {len(conversations)} conversations")
-    
-    # Create a Hugging Face dataset
-    dataset = Dataset.from_list(conversations)
-    
-    # Create a DatasetDict with train split
-    dataset_dict = DatasetDict({
-        'train': dataset
-    })
-    
-    print("Dataset prepared for upload:")
-    print(dataset_dict)
-    
-    # Upload to Hugging Face Hub
-    repo_id = "consuelo-sales-conversations"
-    
+            if not line.strip():
+                continue
+            lines.append(line.rstrip(b'\r\n'))
+            if len(lines) == shard_rows:
+                yield index, lines, shard_hash(lines)
+                index, lines = index + 1, []
+    if lines:
+        yield index, lines, shard_hash(lines)
+
+def shard_hash(lines):
+    digest = hashlib.sha256(f"v{SHARD_FORMAT_VERSION}\n".encode())
+    for line in lines:
+        digest.update(line)
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+def shard_path(index):
+    """Path in the target; the data/<split>-* layout is picked up by load_dataset."""
+    return f"data/{SPLIT}-{index:05d}.parquet"
+
+def write_shard(lines, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # An explicit schema keeps every shard identical, even one without a given field
+    schema = pa.schema([("messages", pa.list_(pa.struct([("role", pa.string()), ("content", pa.string())])))])
+    table = pa.Table.from_pylist([loads(line) for line in lines], schema=schema)
+    tmp_path = path + '.tmp'
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+
+def stage_shards(input_path, staging_dir, shard_rows):
+    """
+    Write changed shards to staging_dir; return the manifest of all shards.
+    A staged shard is reused when its recorded hash still matches its input.
+    """
+    staged = read_json(os.path.join(staging_dir, MANIFEST_FILE)) or {}
+    staged_hashes = {shard['path']: shard['sha256'] for shard in staged.get('shards', [])}
+    shards = []
+    rebuilt = 0
+    for index, lines, sha256 in iter_shards(input_path, shard_rows):
+        path = shard_path(index)
+        local_path = os.path.join(staging_dir, path)
+        if staged_hashes.get(path) != sha256 or not os.path.exists(local_path):
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            write_shard(lines, local_path)
+            rebuilt += 1
+        shards.append({'path': path, 'sha256': sha256, 'rows': len(lines)})
+
+    # Drop staged shards past the end of a shrunken input
+    current = {shard['path'] for shard in shards}
+    for path in staged_hashes:
+        if path not in current and os.path.exists(os.path.join(staging_dir, path)):
+            os.remove(os.path.join(staging_dir, path))
+
+    manifest = {
+        'format_version': SHARD_FORMAT_VERSION,
+        'split': SPLIT,
+        'shard_rows': shard_rows,
+        'rows': sum(shard['rows'] for shard in shards),
+        'shards': shards,
+    }
+    write_json(os.path.join(staging_dir, MANIFEST_FILE), manifest)
+    print(f"Staged {len(shards)} shards ({manifest['rows']} conversations), {rebuilt} rebuilt")
+    return manifest
+
+def read_json(path):
+    try:
+        with open(path, 'rb') as f:
+            return loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+def write_json(path, obj):
+    with open(path + '.tmp', 'wb') as f:
+        f.write(dumps(obj))
+    os.replace(path + '.tmp', path)
+
+# ============================================================================
+# TARGETS
+# ============================================================================
+
+class DirectoryTarget:
+    """A local directory laid out like the dataset repo."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.name = f"dir:{self.root}"
+
+    def prepare(self):
+        os.makedirs(self.root, exist_ok=True)
+
+    def read(self, path):
+        try:
+            with open(os.path.join(self.root, path), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def upload(self, local_path, path):
+        destination = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copyfile(local_path, destination + '.tmp')
+        os.replace(destination + '.tmp', destination)
+
+    def delete(self, path):
+        try:
+            os.remove(os.path.join(self.root, path))
+        except FileNotFoundError:
+            pass
+
+    def url(self):
+        return self.root
+
+
+class HubTarget:
+    """A dataset repo on the Hugging Face Hub, or on a compatible local endpoint."""
+
+    def __init__(self, repo_id, endpoint=None, private=False):
+        from huggingface_hub import HfApi
+
+        self.repo_id = repo_id
+        self.private = private
+        self.api = HfApi(endpoint=endpoint)
+        self.name = f"hub:{self.api.endpoint}/{repo_id}"
+
+    def prepare(self):
+        self.api.create_repo(self.repo_id, repo_type='dataset', private=self.private, exist_ok=True)
+
+    def read(self, path):
+        from huggingface_hub.utils import EntryNotFoundError
+
+        try:
+            with open(self.api.hf_hub_download(self.repo_id, path, repo_type='dataset'), 'rb') as f:
+                return f.read()
+        except EntryNotFoundError:
+            return None
+
+    def upload(self, local_path, path):
+        self.api.upload_file(path_or_fileobj=local_path, path_in_repo=path, repo_id=self.repo_id,
+                             repo_type='dataset', commit_message=f"Upload {path}")
+
+    def delete(self, path):
+        from huggingface_hub.utils import EntryNotFoundError
+
+        try:
+            self.api.delete_file(path, repo_id=self.repo_id, repo_type='dataset',
+                                 commit_message=f"Delete {path}")
+        except EntryNotFoundError:
+            pass
+
+    def url(self):
+        return f"{self.api.endpoint}/datasets/{self.repo_id}"
+
+# ============================================================================
+# UPLOAD
+# ============================================================================
+
+def sync_to_target(manifest, staging_dir, target):
+    """Upload shards whose hash the target does not have yet, then the manifest."""
+    state_path = os.path.join(staging_dir, STATE_FILE)
+    state = read_json(state_path) or {}
+    target.prepare()
+    uploaded = state.get(target.name)
+    if uploaded is None:
+        # No local record for this target: trust its published manifest
+        published = target.read(MANIFEST_FILE)
+        uploaded = {shard['path']: shard['sha256'] for shard in loads(published)['shards']} if published else {}
+
+    changed = [shard for shard in manifest['shards'] if uploaded.get(shard['path']) != shard['sha256']]
+    print(f"{len(changed)} of {len(manifest['shards'])} shards to upload to {target.name}")
+    for number, shard in enumerate(changed, 1):
+        target.upload(os.path.join(staging_dir, shard['path']), shard['path'])
+        # Saved after every shard so an interrupted run resumes here
+        uploaded[shard['path']] = shard['sha256']
+        state[target.name] = uploaded
+        write_json(state_path, state)
+        print(f"  [{number}/{len(changed)}] {shard['path']} ({shard['rows']} rows)")
+
+    current = {shard['path'] for shard in manifest['shards']}
+    for path in sorted(set(uploaded) - current):
+        target.delete(path)
+        del uploaded[path]
+        state[target.name] = uploaded
+        write_json(state_path, state)
+        print(f"  deleted stale shard {path}")
+
+    # Last, so the published manifest only ever lists shards that are in place
+    manifest_path = os.path.join(staging_dir, MANIFEST_FILE)
+    with open(manifest_path, 'rb') as f:
+        if target.read(MANIFEST_FILE) != f.read():
+            target.upload(manifest_path, MANIFEST_FILE)
+    return len(changed)
+
+def upload_dataset(input_path=INPUT_PATH, repo_id=REPO_ID, local_dir=None, endpoint=None,
+                   shard_rows=DEFAULT_SHARD_ROWS, staging_dir=STAGING_DIR, private=False):
+    print("Sharding the formatted dataset...")
+    os.makedirs(staging_dir, exist_ok=True)
+    manifest = stage_shards(input_path, staging_dir, shard_rows)
+
+    target = DirectoryTarget(local_dir) if local_dir else HubTarget(repo_id, endpoint=endpoint, private=private)
     try:
-        print(f"Uploading to Hugging Face Hub as {repo_id}...")
-        dataset_dict.push_to_hub(repo_id, private=False)
-        print(f"✅ Successfully uploaded to: https://huggingface.co/datasets/{repo_id}")
-        
+        sync_to_target(manifest, staging_dir, target)
+        print(f"✅ Successfully uploaded to: {target.url()}")
+
     except Exception as e:
         print(f"❌ Error uploading: {e}")
-        print("\n🔑 You need to authenticate with Hugging Face first:")
-        print("Run: huggingface-cli login")
-        print("Or set HF_TOKEN environment variable")
+        print("Uploaded shards are recorded; run again to resume.")
+        if not local_dir:
+            print("\n🔑 You need to authenticate with Hugging Face first:")
+            print("Run: huggingface-cli login")
+            print("Or set HF_TOKEN environment variable")
         return False
-    
+
     return True
 
+def main():
+    parser = argparse.ArgumentParser(description="Upload the formatted conversations as Parquet shards")
+    parser.add_argument("--input", default=INPUT_PATH)
+    destination = parser.add_mutually_exclusive_group()
+    destination.add_argument("--repo-id", default=REPO_ID, help="Dataset repo on the hub")
+    destination.add_argument("--local-dir", help="Publish to this directory instead of a hub")
+    parser.add_argument("--endpoint", default=os.environ.get("HF_ENDPOINT"),
+                        help="Hub URL, e.g. a local stand-in (default: HF_ENDPOINT or huggingface.co)")
+    parser.add_argument("--shard-rows", type=int, default=DEFAULT_SHARD_ROWS, help="Conversations per shard")
+    parser.add_argument("--staging-dir", default=STAGING_DIR)
+    parser.add_argument("--private", action="store_true")
+    args = parser.parse_args()
+    ok = upload_dataset(args.input, repo_id=args.repo_id, local_dir=args.local_dir, endpoint=args.endpoint,
+                        shard_rows=args.shard_rows, staging_dir=args.staging_dir, private=args.private)
+    raise SystemExit(0 if ok else 1)
+
 if __name__ == "__main__":
-    upload_dataset()
\ No newline at end of file
+    main()